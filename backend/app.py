@@ -1,23 +1,46 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from routes.suppliers import suppliers_bp
 from routes.orders import orders_bp
 from routes.inventory import inventory_bp
 from routes.help import help_bp  # ✅ import help blueprint
+from routes.metrics import metrics_bp
+from routes.events import events_bp
+from utils import admission, metrics
+from utils.constants import TRUSTED_PROXY_HOPS
 
-app = Flask(__name__)
-CORS(app)
 
-# Register blueprints with route prefixes
-app.register_blueprint(suppliers_bp, url_prefix="/api/suppliers")
-app.register_blueprint(orders_bp, url_prefix="/api/orders")
-app.register_blueprint(inventory_bp, url_prefix="/api/inventory")
-app.register_blueprint(help_bp, url_prefix="/api/help")  # ✅ Register here
+def create_app(config=None):
+    """Build the Flask app. The datastore client is created lazily on first use."""
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
+    hops = app.config.setdefault("TRUSTED_PROXY_HOPS", TRUSTED_PROXY_HOPS)
+    if hops:
+        # request.remote_addr is then the client as seen by the first trusted proxy
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    CORS(app)
+    metrics.init_app(app)
+    admission.init_app(app)  # after metrics, so rejected requests are counted too
 
-@app.errorhandler(404)
-def page_not_found(e):
-    return jsonify({"error": "This route does not exist."}), 404
+    # Register blueprints with route prefixes
+    app.register_blueprint(suppliers_bp, url_prefix="/api/suppliers")
+    app.register_blueprint(orders_bp, url_prefix="/api/orders")
+    app.register_blueprint(inventory_bp, url_prefix="/api/inventory")
+    app.register_blueprint(help_bp, url_prefix="/api/help")  # ✅ Register here
+    app.register_blueprint(events_bp, url_prefix="/api/events")
+    app.register_blueprint(metrics_bp)  # Prometheus scrapes /metrics
+
+    @app.errorhandler(404)
+    def page_not_found(e):
+        return jsonify({"error": "This route does not exist."}), 404
+
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,92 @@
+"""Rebuild order analytics rollups from the orders collection.
+
+    python backfill_rollups.py --dry-run
+    python backfill_rollups.py --chunk-size 1000
+
+Streams orders in document id order, one query per chunk, and adds them up
+in memory (one entry per vendor/supplier and day/week, not per order);
+then replaces every rollup document and deletes rollups no order counts
+towards any more. Orders placed or accepted while it runs may be counted
+twice or missed, so run it while order writes are paused.
+"""
+import argparse
+import sys
+
+from utils.constants import BULK_IMPORT_BATCH_SIZE
+from utils.order_rollups import ROLLUP_COLLECTION, accumulate
+
+
+def iter_orders(db, chunk_size):
+    """Every order document, read chunk_size at a time."""
+    query = db.collection("orders").order_by("__name__")
+    after = None
+    while True:
+        chunk = query.start_after({"__name__": after}) if after else query
+        docs = list(chunk.limit(chunk_size).stream())
+        yield from docs
+        if len(docs) < chunk_size:
+            return
+        after = docs[-1].id
+
+
+def build_rollups(db, chunk_size):
+    """({rollup_id: rollup}, counts) computed from the stored orders."""
+    rollups = {}
+    counts = {"orders": 0, "skipped": 0}
+    for doc in iter_orders(db, chunk_size):
+        order = doc.to_dict()
+        try:
+            accumulate(rollups, order, "placed", order["timestamp"])
+            if order.get("status") == "accepted":
+                accumulate(rollups, order, "accepted", order.get("accepted_at") or order["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            counts["skipped"] += 1
+            continue
+        counts["orders"] += 1
+    return rollups, counts
+
+
+def backfill(db, dry_run=False, chunk_size=500, batch_size=BULK_IMPORT_BATCH_SIZE):
+    """Replace all rollups with ones rebuilt from orders; returns counts."""
+    rollups, counts = build_rollups(db, chunk_size)
+    stale = [doc.reference for doc in db.collection(ROLLUP_COLLECTION).stream() if doc.id not in rollups]
+    counts.update(rollups=len(rollups), deleted=len(stale))
+    if dry_run:
+        return counts
+
+    batch = db.batch()
+    pending = 0
+    writes = [(db.collection(ROLLUP_COLLECTION).document(doc_id), rollup) for doc_id, rollup in rollups.items()]
+    writes += [(ref, None) for ref in stale]
+    for ref, rollup in writes:
+        if rollup is None:
+            batch.delete(ref)
+        else:
+            batch.set(ref, rollup)
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--chunk-size", type=int, default=500, help="orders read per query")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from firebase_config import db
+
+    counts = backfill(db, dry_run=args.dry_run, chunk_size=args.chunk_size, batch_size=args.batch_size)
+    prefix = "would write" if args.dry_run else "wrote"
+    print(f"{prefix} {counts['rollups']} rollups from {counts['orders']} orders "
+          f"({counts['skipped']} orders skipped, {counts['deleted']} stale rollups deleted)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
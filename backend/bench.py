@@ -0,0 +1,261 @@
+"""Route benchmarks against a seeded synthetic marketplace.
+
+    python bench.py --suppliers 10000 --vendors 500 --requests 200
+    python bench.py --suppliers 10000 --output before.json
+    python bench.py --suppliers 10000 --compare before.json
+    python bench.py --suppliers 200 --items-per-supplier 1000 --basket-size 50 --scenarios place,accept
+    python bench.py --startup --scenarios ""
+
+Runs on a local datastore (PROXIMART_DB=memory unless --backend says
+otherwise) through Flask's test client, so numbers measure the app and
+storage layer without network noise. The same seed and sizes generate the
+same data on every commit.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils.synthetic_data import ITEM_NAMES, MarketplaceGenerator
+
+SCENARIOS = ["nearby", "all", "all_filtered", "history", "place", "accept"]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+app.test_client().get("/api/suppliers/all?limit=1")
+print(json.dumps([imported - started, time.perf_counter() - imported]))
+"""
+
+
+def measure_startup(backend, runs=5):
+    """Median cold import time of `app` and time to its first request, each in a fresh interpreter."""
+    env = dict(os.environ, PROXIMART_DB=backend)
+    here = os.path.dirname(os.path.abspath(__file__))
+    imports, first_requests = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], capture_output=True, text=True,
+                                cwd=here, env=env, check=True).stdout
+        import_seconds, first_request_seconds = json.loads(output.strip().splitlines()[-1])
+        imports.append(import_seconds)
+        first_requests.append(first_request_seconds)
+    return {
+        "runs": runs,
+        "import_ms": round(statistics.median(imports) * 1000, 1),
+        "first_request_ms": round(statistics.median(first_requests) * 1000, 1),
+    }
+
+
+class Workload:
+    """Builds request specs for each scenario from the seeded data."""
+
+    def __init__(self, client, db, generator, rng, basket_size=3):
+        self.client = client
+        self.basket_size = basket_size
+        self.db = db
+        self.generator = generator
+        self.rng = rng
+        self.placed_orders = []
+
+    def random_location(self):
+        return self.generator.location(self.rng)
+
+    def random_supplier(self):
+        supplier_id = self.generator.supplier_id(self.rng.randrange(self.generator.suppliers))
+        return supplier_id, self.db.collection("suppliers").document(supplier_id).get().to_dict()
+
+    def random_vendor(self):
+        return self.generator.vendor_id(self.rng.randrange(self.generator.vendors))
+
+    def nearby(self):
+        location = self.random_location()
+        return "GET", f"/api/suppliers/nearby?lat={location['lat']}&lon={location['lon']}&limit=20", None
+
+    def all(self):
+        return "GET", "/api/suppliers/all?limit=50", None
+
+    def all_filtered(self):
+        item = self.rng.choice(ITEM_NAMES)
+        return "GET", f"/api/suppliers/all?items={item}&min_quantity=100&max_price=200&limit=20", None
+
+    def history(self):
+        return "GET", f"/api/orders/history?vendor_id={self.random_vendor()}&limit=20", None
+
+    def place(self):
+        supplier_id, supplier = self.random_supplier()
+        in_stock = [item for item in supplier["items"] if item["quantity"] > 0] or supplier["items"]
+        items = [{"name": item["name"], "quantity": 1, "supplier_id": supplier_id}
+                 for item in self.rng.sample(in_stock, min(self.basket_size, len(in_stock)))]
+        return "POST", "/api/orders/place", {"vendor_id": self.random_vendor(), "items": items}
+
+    def record_place(self, response):
+        for order in (response.get_json() or {}).get("orders", []):
+            self.placed_orders.append((order["order_id"], order["supplier_id"]))
+
+    def accept(self):
+        if not self.placed_orders:
+            self.record_place(self.client.post("/api/orders/place", json=self.place()[2]))
+        order_id, supplier_id = self.placed_orders.pop()
+        return "POST", "/api/orders/accept", {"order_id": order_id, "supplier_id": supplier_id}
+
+
+def run_scenario(client, workload, name, requests, warmup):
+    build = getattr(workload, name)
+    record = getattr(workload, f"record_{name}", None)
+
+    def send():
+        method, url, body = build()
+        started = time.perf_counter()
+        response = client.open(url, method=method, json=body)
+        latency = time.perf_counter() - started
+        if record:
+            record(response)
+        return latency, response.status_code
+
+    for _ in range(warmup):
+        send()
+
+    latencies, errors, elapsed = [], 0, 0.0
+    for _ in range(requests):
+        latency, status = send()
+        latencies.append(latency)
+        elapsed += latency
+        errors += status >= 400
+    return summarize(latencies, elapsed, errors)
+
+
+def print_results(results, baseline=None):
+    header = f"{'scenario':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}"
+    if baseline:
+        header += f"{'p50 Δ':>10}{'p95 Δ':>10}{'p99 Δ':>10}"
+    print(header)
+    for name, stats in results["scenarios"].items():
+        line = (f"{name:<14}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                f"{stats['throughput_rps']:>10}{stats['errors']:>8}")
+        before = (baseline or {}).get("scenarios", {}).get(name)
+        if before:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                change = (stats[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+                line += f"{change:>+9.1f}%"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suppliers", type=int, default=1000)
+    parser.add_argument("--vendors", type=int, default=100)
+    parser.add_argument("--orders-per-vendor", type=int, default=20)
+    parser.add_argument("--items-per-supplier", type=int, default=12)
+    parser.add_argument("--basket-size", type=int, default=3, help="items per placed order")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default=os.environ.get("PROXIMART_DB", "memory"))
+    parser.add_argument("--startup", action="store_true", help="also measure cold import and first-request time")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results from an earlier run to diff against")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # The datastore is picked at import time, so configure it before importing the app
+    os.environ["PROXIMART_DB"] = args.backend
+    if args.backend == "sqlite" and "PROXIMART_SQLITE_PATH" not in os.environ:
+        os.environ["PROXIMART_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="proximart-bench-"), "bench.db")
+
+    startup = measure_startup(args.backend) if args.startup else None
+
+    from app import create_app
+    from firebase_config import db
+
+    # One client replaying requests back to back is exactly what admission
+    # control is there to slow down, so the benchmark app runs without it
+    app = create_app({"ADMISSION_CONTROL": False})
+
+    generator = MarketplaceGenerator(seed=args.seed, suppliers=args.suppliers, vendors=args.vendors,
+                                     orders_per_vendor=args.orders_per_vendor,
+                                     items_per_supplier=args.items_per_supplier)
+    started = time.perf_counter()
+    counts = generator.populate(db)
+    print(f"seeded {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    client = app.test_client()
+    workload = Workload(client, db, generator, random.Random(args.seed), basket_size=args.basket_size)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "seed": args.seed,
+        "sizes": {**counts, "items_per_supplier": args.items_per_supplier, "basket_size": args.basket_size},
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "scenarios": {},
+    }
+    if startup:
+        results["startup"] = startup
+    for name in scenarios:
+        results["scenarios"][name] = run_scenario(client, workload, name, args.requests, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline.get("sizes"), baseline.get("seed")) != (results["sizes"], args.seed):
+            print("warning: baseline was run with different sizes or seed", file=sys.stderr)
+
+    if startup:
+        print(f"startup: import {startup['import_ms']} ms, first request {startup['first_request_ms']} ms "
+              f"(median of {startup['runs']} cold starts)")
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,98 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+from threading import Lock
 
-# Load credentials from JSON file
-cred = credentials.Certificate("firebase_key.json")
-firebase_admin.initialize_app(cred)
+from storage.traced_store import TracedStore
+from utils.metrics import record_datastore_call
 
-# Firestore database instance
-db = firestore.client()
\ No newline at end of file
+# Storage backend: "firestore" (default), "memory" or "sqlite"
+DB_BACKEND = os.environ.get("PROXIMART_DB", "firestore").lower()
+SQLITE_PATH = os.environ.get("PROXIMART_SQLITE_PATH", "proximart.db")
+FIREBASE_KEY_PATH = os.environ.get("FIREBASE_KEY_PATH", "firebase_key.json")
+
+
+def init_firebase():
+    """Load credentials and register the firebase app once.
+
+    Opens no connections, so it is safe to run in a master process before
+    forking workers.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        # Load credentials from JSON file
+        return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_KEY_PATH))
+
+
+def create_db(backend=DB_BACKEND):
+    if backend == "memory":
+        from storage.local_store import LocalStore
+        return LocalStore.in_memory()
+
+    if backend == "sqlite":
+        from storage.local_store import LocalStore
+        return LocalStore.sqlite(SQLITE_PATH)
+
+    from firebase_admin import firestore
+    from storage.firestore_store import FirestoreStore
+
+    init_firebase()
+    return FirestoreStore(firestore.client())
+
+
+class LazyStore:
+    """Creates the store on first use and shares it across the process.
+
+    Importing the routes therefore costs nothing and needs no credentials;
+    the client (and its gRPC channel) is built by whichever request or
+    warm-up touches it first.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._store = None
+        self._lock = Lock()
+
+    def get(self):
+        store = self._store
+        if store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._factory()
+                store = self._store
+        return store
+
+    @property
+    def created(self):
+        return self._store is not None
+
+    def reset(self):
+        """Drop the store so the next use creates a fresh one (e.g. after fork)."""
+        with self._lock:
+            self._store = None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def warm_up(backend=DB_BACKEND):
+    """Pre-fork warm-up: import the backend's modules and load credentials.
+
+    Workers inherit the loaded modules, so they only build their own
+    client on first use; gRPC channels and SQLite connections are not
+    fork-safe and are never shared.
+    """
+    if backend in ("memory", "sqlite"):
+        import storage.local_store
+        return
+    import storage.firestore_store
+    from firebase_admin import firestore
+    init_firebase()
+
+
+lazy_db = LazyStore(create_db)
+
+# Database instance shared by all routes; calls are timed for /metrics
+db = TracedStore(lazy_db, record_datastore_call)
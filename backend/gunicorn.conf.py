@@ -0,0 +1,36 @@
+import os
+
+# gunicorn -c gunicorn.conf.py
+wsgi_app = "app:app"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+# Change events (/api/events) reach every worker through the datastore
+# event bus, so the worker count follows the CPUs
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+# Threaded, so open event streams (at most EVENTS_MAX_STREAMS) hold a
+# thread each and the remaining threads serve everything else
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# Import the app (and the datastore modules) once in the master so forked
+# workers start with everything already loaded
+preload_app = True
+
+
+def on_starting(server):
+    from firebase_config import warm_up
+    warm_up()
+
+
+def post_fork(server, worker):
+    # Connections must not cross a fork: each worker builds its own client
+    from firebase_config import lazy_db
+    lazy_db.reset()
+    # Event ids from the master's epoch must not be taken as this worker's,
+    # and its relay thread did not survive the fork
+    from utils.events import event_bus
+    event_bus.reset()
+
+
+def worker_exit(server, worker):
+    # Commit orders still waiting in the write-behind queue before exiting
+    from utils.write_behind import order_writes
+    order_writes.close()
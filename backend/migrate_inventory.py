@@ -0,0 +1,113 @@
+"""Fold old inventory documents into one vendor_inventory document per vendor.
+
+    python migrate_inventory.py --dry-run
+    python migrate_inventory.py
+    python migrate_inventory.py --delete-old
+
+Reads the "inventory" collection, which holds per-item documents
+({vendor_id, name, price, quantity, threshold}) and per-vendor
+{"items": [...]} documents written by older order acceptance, and merges
+them into vendor_inventory/<vendor_id>. Per-item documents win over array
+entries of the same name, and names already in the target document are
+left alone, so the migration can be re-run safely. Migrated vendors get
+their low-stock view rebuilt on the next lookup.
+"""
+import argparse
+import sys
+
+from utils.constants import BULK_IMPORT_BATCH_SIZE
+from utils.low_stock import LOW_STOCK_COLLECTION
+
+OLD_COLLECTION = "inventory"
+
+
+def collect_old_inventory(db):
+    """{vendor_id: {name: item}} and the old document refs, from the old collection."""
+    per_item = {}
+    from_arrays = {}
+    refs = []
+    for doc in db.collection(OLD_COLLECTION).stream():
+        data = doc.to_dict() or {}
+        refs.append(doc.reference)
+        if isinstance(data.get("items"), list):
+            # Vendor document keyed by vendor_id (written by accept_order)
+            for item in data["items"]:
+                name = str(item.get("name", "")).strip().lower()
+                if name:
+                    from_arrays.setdefault(doc.id, {}).setdefault(name, {**item, "name": name})
+        elif data.get("vendor_id") and data.get("name"):
+            name = str(data["name"]).strip().lower()
+            per_item.setdefault(data["vendor_id"], {}).setdefault(name, {"id": doc.id, **data, "name": name})
+
+    inventories = {}
+    for vendor_id in set(per_item) | set(from_arrays):
+        items = {**from_arrays.get(vendor_id, {}), **per_item.get(vendor_id, {})}
+        inventories[vendor_id] = {
+            name: {"id": item.get("id") or f"{vendor_id}_{name}", "vendor_id": vendor_id, **item}
+            for name, item in items.items()
+        }
+    return inventories, refs
+
+
+def migrate(db, dry_run=False, delete_old=False, batch_size=BULK_IMPORT_BATCH_SIZE):
+    """Merge old inventory into vendor_inventory; returns counts of what was (or would be) done."""
+    from utils.conditional import new_version
+    from utils.vendor_inventory import inventory_ref, read_inventory
+
+    inventories, old_refs = collect_old_inventory(db)
+    counts = {"vendors": 0, "items": 0, "skipped": 0, "deleted": 0}
+    batch = db.batch()
+    pending = 0
+
+    def write(op):
+        nonlocal batch, pending
+        if dry_run:
+            return
+        op(batch)
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    for vendor_id, items in sorted(inventories.items()):
+        existing = read_inventory(vendor_id)
+        new_items = {name: item for name, item in items.items() if name not in existing}
+        counts["skipped"] += len(items) - len(new_items)
+        if not new_items:
+            continue
+        counts["vendors"] += 1
+        counts["items"] += len(new_items)
+        write(lambda b: b.set(inventory_ref(vendor_id), {"vendor_id": vendor_id, "items": new_items, **new_version()},
+                              merge=True))
+        # Drop the completed flag so the view is rebuilt from the migrated items
+        write(lambda b: b.set(db.collection(LOW_STOCK_COLLECTION).document(vendor_id),
+                              {"vendor_id": vendor_id, "complete": False, **new_version()}, merge=True))
+
+    if delete_old:
+        for ref in old_refs:
+            write(lambda b: b.delete(ref))
+            counts["deleted"] += 1
+
+    if pending:
+        batch.commit()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--delete-old", action="store_true", help="delete the old inventory documents afterwards")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from firebase_config import db
+
+    counts = migrate(db, dry_run=args.dry_run, delete_old=args.delete_old, batch_size=args.batch_size)
+    prefix = "would migrate" if args.dry_run else "migrated"
+    print(f"{prefix} {counts['items']} items for {counts['vendors']} vendors "
+          f"({counts['skipped']} already present, {counts['deleted']} old documents deleted)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
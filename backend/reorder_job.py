@@ -0,0 +1,75 @@
+"""Compute reorder suggestions for every vendor.
+
+    python reorder_job.py --dry-run
+    python reorder_job.py --chunk-size 200
+
+Streams vendor inventory documents in id order, one query per chunk, and
+writes each vendor's suggestions to reorder_suggestions/<vendor_id>
+({"vendor_id", "generated_at", "suggestions"}, served by
+GET /api/inventory/reorder/<vendor_id>/latest) in batches, so memory use
+is bounded by the chunk size rather than the number of vendors. Rates come
+from the rolling usage kept on each item, so no order history is read.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from utils.constants import BULK_IMPORT_BATCH_SIZE, REORDER_SUGGESTIONS_COLLECTION, VENDOR_INVENTORY_COLLECTION
+from utils.reorder import reorder_suggestions
+
+
+def iter_vendor_inventories(db, chunk_size):
+    """(vendor_id, {name: item}) for every vendor, read chunk_size documents at a time."""
+    query = db.collection(VENDOR_INVENTORY_COLLECTION).order_by("__name__")
+    after = None
+    while True:
+        chunk = query.start_after({"__name__": after}) if after else query
+        docs = list(chunk.limit(chunk_size).stream())
+        for doc in docs:
+            yield doc.id, (doc.to_dict() or {}).get("items") or {}
+        if len(docs) < chunk_size:
+            return
+        after = docs[-1].id
+
+
+def run(db, dry_run=False, chunk_size=200, batch_size=BULK_IMPORT_BATCH_SIZE, now=None):
+    """Write suggestions for every vendor; returns counts."""
+    now = now or datetime.utcnow()
+    counts = {"vendors": 0, "with_suggestions": 0, "suggestions": 0}
+    batch = db.batch()
+    pending = 0
+    for vendor_id, items in iter_vendor_inventories(db, chunk_size):
+        suggestions = reorder_suggestions(items, now)
+        counts["vendors"] += 1
+        counts["with_suggestions"] += bool(suggestions)
+        counts["suggestions"] += len(suggestions)
+        if dry_run:
+            continue
+        batch.set(db.collection(REORDER_SUGGESTIONS_COLLECTION).document(vendor_id),
+                  {"vendor_id": vendor_id, "generated_at": now.isoformat(), "suggestions": suggestions})
+        pending += 1
+        if pending >= batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="compute without writing")
+    parser.add_argument("--chunk-size", type=int, default=200, help="vendor inventories read per query")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from firebase_config import db
+
+    counts = run(db, dry_run=args.dry_run, chunk_size=args.chunk_size, batch_size=args.batch_size)
+    print(f"{counts['suggestions']} suggestions for {counts['with_suggestions']} of {counts['vendors']} vendors"
+          f"{' (dry run)' if args.dry_run else ''}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from utils.constants import (EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_STREAMS, EVENTS_MAX_STREAM_SECONDS,
+                             EVENTS_POLL_SECONDS)
+from utils.events import event_bus, vendor_channel
+
+events_bp = Blueprint("events", __name__)
+
+# Each open stream or long poll holds a worker thread; past this many the
+# rest are turned away so other routes always have threads left
+stream_slots = threading.BoundedSemaphore(EVENTS_MAX_STREAMS)
+
+
+def event_json(event):
+    return {"id": event.id, "type": event.type, "data": event.data}
+
+
+def format_sse(event):
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, default=str)}\n\n"
+
+
+def seconds_arg(name, default):
+    """A non-negative float query parameter capped at `default`; raises ValueError."""
+    value = float(request.args.get(name, default))
+    if value < 0:
+        raise ValueError(name)
+    return min(value, default)
+
+
+# ✅ Live order and stock events for a vendor (Server-Sent Events, or a long poll with ?mode=poll)
+# Served from the process's event bus: an idle stream adds no datastore reads of its own
+@events_bp.route("/vendor/<vendor_id>", methods=["GET"])
+def vendor_events(vendor_id):
+    channel = vendor_channel(vendor_id)
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or None
+    try:
+        if request.args.get("mode") == "poll":
+            wait = seconds_arg("timeout", EVENTS_POLL_SECONDS)
+        else:
+            max_seconds = seconds_arg("max_seconds", EVENTS_MAX_STREAM_SECONDS)
+    except ValueError:
+        return jsonify({"error": "timeout and max_seconds must be non-negative numbers"}), 400
+
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many open event streams, please retry shortly"}), 503, {"Retry-After": "5"}
+
+    # Long poll: whatever arrived (or was missed since last_event_id), waiting up to `wait` for it
+    if request.args.get("mode") == "poll":
+        try:
+            with event_bus.subscribe(channel, last_event_id) as subscription:
+                events = subscription.drain(wait)
+        finally:
+            stream_slots.release()
+        return jsonify({
+            "events": [event_json(event) for event in events],
+            "last_event_id": events[-1].id if events else last_event_id,
+        }), 200
+
+    # Subscribe before answering so nothing published meanwhile is missed;
+    # the stream ends after max_seconds and EventSource reconnects with
+    # Last-Event-ID, picking up anything published in between
+    subscription = event_bus.subscribe(channel, last_event_id)
+    finished = threading.Event()
+
+    def finish():
+        # From the generator or, if the body was never started, when the response is closed
+        if not finished.is_set():
+            finished.set()
+            subscription.close()
+            stream_slots.release()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + max_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event = subscription.get(timeout=min(EVENTS_HEARTBEAT_SECONDS, remaining))
+                if event is not None:
+                    yield format_sse(event)
+                elif subscription.closed:
+                    return
+                elif deadline > time.monotonic():
+                    yield ": keep-alive\n\n"
+        finally:
+            finish()
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(finish)
+    return response
@@ -1,13 +1,19 @@
 # routes/help.py
 from flask import Blueprint, jsonify
 
+from utils.conditional import conditional, content_version
+
 help_bp = Blueprint("help", __name__)
 
+FAQS = [
+    {"question": "How do I register as a supplier?", "answer": "Use /api/suppliers/add"},
+    {"question": "How do I place an order?", "answer": "Use /api/orders/place with buyer_name, items, etc."},
+    {"question": "How are nearby suppliers found?", "answer": "Based on item match and location within radius."},
+]
+# Static: the ETag is a hash of the content, the same in every worker and after restarts
+FAQS_VERSION = content_version(FAQS)
+
 @help_bp.route("/faqs", methods=["GET"])
+@conditional(lambda: FAQS_VERSION)
 def get_faqs():
-    faqs = [
-        {"question": "How do I register as a supplier?", "answer": "Use /api/suppliers/add"},
-        {"question": "How do I place an order?", "answer": "Use /api/orders/place with buyer_name, items, etc."},
-        {"question": "How are nearby suppliers found?", "answer": "Based on item match and location within radius."},
-    ]
-    return jsonify({"faqs": faqs})
+    return jsonify({"faqs": FAQS})
@@ -1,8 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
 from firebase_config import db
+from utils.constants import BULK_IMPORT_BATCH_SIZE, DEFAULT_RADIUS_KM, REORDER_SUGGESTIONS_COLLECTION
+from utils.errors import ApiError
+from utils.conditional import document_response
+from utils.low_stock import read_low_stock_view
+from utils.reorder import reorder_suggestions
+from routes.suppliers import plan_nearby
+from utils.vendor_inventory import (inventory_committed, inventory_ref, item_key, items_from_doc, list_items,
+                                    new_item, read_inventory, save_items, version_keys)
 
 inventory_bp = Blueprint("inventory", __name__)
 
+
+def parse_item(data):
+    """Validate and normalise name/price/quantity/threshold; returns (item, error)."""
+    if not all(field in data for field in ["name", "price", "quantity"]):
+        return None, "Missing required fields"
+
+    try:
+        item = {
+            "name": str(data["name"]).strip().lower(),
+            "price": float(data["price"]),
+            "quantity": int(data["quantity"]),
+            "threshold": int(data.get("threshold", 0))
+        }
+    except (TypeError, ValueError):
+        return None, "Price must be float, quantity and threshold must be integers"
+
+    if not item["name"]:
+        return None, "Item name cannot be empty"
+    return item, None
+
+
+def parse_update(data):
+    """Validate the price/quantity/threshold fields of a partial update; returns (update_data, error)."""
+    update_data = {}
+
+    if "price" in data:
+        try:
+            update_data["price"] = float(data["price"])
+        except ValueError:
+            return None, "Price must be a float"
+
+    if "quantity" in data:
+        try:
+            quantity = int(data["quantity"])
+            if quantity < 0:
+                return None, "Quantity cannot be negative"
+            update_data["quantity"] = quantity
+        except ValueError:
+            return None, "Quantity must be an integer"
+
+    if "threshold" in data:
+        try:
+            threshold = int(data["threshold"])
+            if threshold < 0:
+                return None, "Threshold cannot be negative"
+            update_data["threshold"] = threshold
+        except ValueError:
+            return None, "Threshold must be an integer"
+
+    if not update_data:
+        return None, "No valid fields to update"
+    return update_data, None
+
+
+def iter_upload_rows(stream, fmt):
+    """Yield (row_number, row_dict_or_None) from a CSV or NDJSON body, one line at a time."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            # Empty CSV cells count as missing (e.g. an optional threshold)
+            yield row_number, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+        return
+
+    row_number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row_number, row if isinstance(row, dict) else None
+
 # ✅ Test route
 @inventory_bp.route("/", methods=["GET"])
 def test_inventory():
@@ -18,51 +105,108 @@ def add_inventory():
     if not all(field in data for field in required_fields):
         return jsonify({"error": "Missing required fields"}), 400
 
-    name = data["name"].strip().lower()
     vendor_id = data["vendor_id"].strip()
 
+    item, error = parse_item(data)
+    if error:
+        return jsonify({"error": error}), 400
+    name = item["name"]
+
+    # Read the vendor's inventory document and add the item in one transaction
+    def add(transaction):
+        if name in read_inventory(vendor_id, transaction=transaction):
+            raise ApiError("Item already exists for this vendor", 400)
+        return save_items(vendor_id, {}, {name: new_item(vendor_id, item)}, writer=transaction)
+
     try:
-        price = float(data["price"])
-        quantity = int(data["quantity"])
-        threshold = int(data.get("threshold", 0))
-    except ValueError:
-        return jsonify({"error": "Price must be float, quantity and threshold must be integers"}), 400
-
-    # Check for duplicate
-    existing_items = db.collection("inventory") \
-        .where("vendor_id", "==", vendor_id) \
-        .where("name", "==", name) \
-        .limit(1).stream()
-
-    if any(existing_items):
-        return jsonify({"error": "Item already exists for this vendor"}), 400
-
-    doc_ref = db.collection("inventory").document()
-    item_data = {
-        "id": doc_ref.id,
-        "vendor_id": vendor_id,
-        "name": name,
-        "price": price,
-        "quantity": quantity,
-        "threshold": threshold
-    }
-
-    doc_ref.set(item_data)
+        after = db.run_transaction(add)
+    except ApiError as e:
+        return jsonify({"error": e.message}), e.status
+    inventory_committed(vendor_id, {}, after)
+    item_data = after[name]
 
     return jsonify({"message": "Inventory item added", "item": item_data}), 201
 
 
+# ✅ Bulk import inventory items from a streamed CSV or NDJSON body
+@inventory_bp.route("/bulk_import", methods=["POST"])
+def bulk_import_inventory():
+    vendor_id = request.args.get("vendor_id", "").strip()
+    if not vendor_id:
+        return jsonify({"error": "vendor_id query parameter is required"}), 400
+
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "csv" if (request.mimetype or "").endswith("csv") else "ndjson"
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+
+    # One read for everything the vendor already has
+    existing_names = set(read_inventory(vendor_id))
+
+    results = []
+    counts = {"added": 0, "duplicate": 0, "invalid": 0}
+    batch = db.batch()
+    pending = {}
+
+    def commit(batch, pending):
+        # Each chunk is one merge write to the vendor's inventory document
+        after = save_items(vendor_id, {}, pending, writer=batch)
+        batch.commit()
+        inventory_committed(vendor_id, {}, after)
+
+    try:
+        for row_number, row in iter_upload_rows(request.stream, fmt):
+            if row is None:
+                item, error = None, "Row is not a valid JSON object"
+            else:
+                item, error = parse_item(row)
+
+            if error:
+                status = "invalid"
+            elif item["name"] in existing_names:
+                status, error = "duplicate", "Item already exists for this vendor"
+            else:
+                status = "added"
+                existing_names.add(item["name"])
+                pending[item["name"]] = new_item(vendor_id, item)
+                if len(pending) >= BULK_IMPORT_BATCH_SIZE:
+                    commit(batch, pending)
+                    batch = db.batch()
+                    pending = {}
+
+            counts[status] += 1
+            result = {"row": row_number, "status": status}
+            if item:
+                result["name"] = item["name"]
+            if error:
+                result["error"] = error
+            results.append(result)
+    except (UnicodeDecodeError, csv.Error) as e:
+        if pending:
+            commit(batch, pending)
+        return jsonify({"error": f"Could not read upload after row {len(results)}: {e}",
+                        "vendor_id": vendor_id, **counts, "results": results}), 400
+
+    if pending:
+        commit(batch, pending)
+
+    return jsonify({"message": "Bulk import finished", "vendor_id": vendor_id, **counts, "results": results}), 200
+
+
 # ✅ Get all inventory items for a given vendor
+# ETag/Last-Modified come from the version stored on the document, so every worker agrees;
+# a revalidation matching the shared version table is answered without a read
 @inventory_bp.route("/vendor/<vendor_id>", methods=["GET"])
 def get_inventory(vendor_id):
     vendor_id = vendor_id.strip()
 
-    inventory_docs = db.collection("inventory") \
-        .where("vendor_id", "==", vendor_id).stream()
-
-    items = [doc.to_dict() for doc in inventory_docs]
+    def read():
+        doc = inventory_ref(vendor_id).get()
+        return doc.to_dict() if doc.exists else {}
 
-    return jsonify({"inventory": items}), 200
+    return document_response(version_keys(vendor_id)[0], read,
+                             lambda data: (jsonify({"inventory": list_items(data.get("items") or {})}), 200))
 
 
 # ✅ Update inventory by item name and vendor_id
@@ -77,47 +221,24 @@ def update_inventory_by_name():
     vendor_id = data["vendor_id"].strip()
     name = data["name"].strip().lower()
 
-    query = db.collection("inventory") \
-              .where("vendor_id", "==", vendor_id) \
-              .where("name", "==", name) \
-              .limit(1).stream()
-
-    item_doc = next(query, None)
-
-    if not item_doc:
-        return jsonify({"error": "Item not found"}), 404
-
-    item_ref = db.collection("inventory").document(item_doc.id)
-    update_data = {}
-
-    if "price" in data:
-        try:
-            update_data["price"] = float(data["price"])
-        except ValueError:
-            return jsonify({"error": "Price must be a float"}), 400
+    update_data, error = parse_update(data)
 
-    if "quantity" in data:
-        try:
-            quantity = int(data["quantity"])
-            if quantity < 0:
-                return jsonify({"error": "Quantity cannot be negative"}), 400
-            update_data["quantity"] = quantity
-        except ValueError:
-            return jsonify({"error": "Quantity must be an integer"}), 400
+    # Read the item from the vendor's inventory document and write it back
+    # (with its low-stock view entry) in one transaction
+    def update(transaction):
+        before = read_inventory(vendor_id, transaction=transaction).get(name)
+        if not before:
+            raise ApiError("Item not found", 404)
+        if error:
+            raise ApiError(error, 400)
+        after = save_items(vendor_id, {name: before}, {name: {**before, **update_data}}, writer=transaction)
+        return {name: before}, after
 
-    if "threshold" in data:
-        try:
-            threshold = int(data["threshold"])
-            if threshold < 0:
-                return jsonify({"error": "Threshold cannot be negative"}), 400
-            update_data["threshold"] = threshold
-        except ValueError:
-            return jsonify({"error": "Threshold must be an integer"}), 400
-
-    if not update_data:
-        return jsonify({"error": "No valid fields to update"}), 400
-
-    item_ref.update(update_data)
+    try:
+        before, after = db.run_transaction(update)
+    except ApiError as e:
+        return jsonify({"error": e.message}), e.status
+    inventory_committed(vendor_id, before, after)
     return jsonify({"message": "Inventory updated", "updated_fields": update_data}), 200
 
 
@@ -133,17 +254,18 @@ def delete_inventory_by_item():
     vendor_id = data["vendor_id"].strip()
     name = data["name"].strip().lower()
 
-    # Search for the item
-    query = db.collection("inventory") \
-        .where("vendor_id", "==", vendor_id) \
-        .where("name", "==", name).limit(1).stream()
-
-    item = next(query, None)
+    def delete(transaction):
+        item = read_inventory(vendor_id, transaction=transaction).get(name)
+        if not item:
+            raise ApiError(f"Item '{name}' not found for vendor '{vendor_id}'", 404)
+        save_items(vendor_id, {name: item}, {}, writer=transaction)
+        return {name: item}
 
-    if not item:
-        return jsonify({"error": f"Item '{name}' not found for vendor '{vendor_id}'"}), 404
-
-    db.collection("inventory").document(item.id).delete()
+    try:
+        before = db.run_transaction(delete)
+    except ApiError as e:
+        return jsonify({"error": e.message}), e.status
+    inventory_committed(vendor_id, before, {})
 
     return jsonify({"message": f"Item '{name}' deleted successfully for vendor '{vendor_id}'"}), 200
 
@@ -152,16 +274,42 @@ def delete_inventory_by_item():
 def get_stock_alerts(vendor_id):
     vendor_id = vendor_id.strip()
 
-    items = db.collection("inventory").where("vendor_id", "==", vendor_id).stream()
+    # Served from the incrementally maintained low-stock view
+    return document_response(version_keys(vendor_id)[1], lambda: read_low_stock_view(vendor_id),
+                             lambda view: (jsonify({"low_stock_items": list(view.get("items", {}).values())}), 200))
 
-    low_stock_items = []
-    for doc in items:
-        data = doc.to_dict()
-        if "quantity" in data and "threshold" in data:
-            if data["quantity"] <= data["threshold"]:
-                low_stock_items.append(data)
+# ✅ Reorder suggestions from each item's recent usage, with nearby suppliers to buy from
+@inventory_bp.route("/reorder/<vendor_id>", methods=["GET"])
+def get_reorder_suggestions(vendor_id):
+    vendor_id = vendor_id.strip()
+
+    suggestions = reorder_suggestions(read_inventory(vendor_id), datetime.utcnow())
+    response = {"vendor_id": vendor_id, "suggestions": suggestions, "plan": None}
+
+    # With the vendor's location, plan where to buy the suggested quantities
+    if "lat" in request.args or "lon" in request.args:
+        try:
+            lat = float(request.args["lat"])
+            lon = float(request.args["lon"])
+            radius_km = float(request.args.get("radius_km", DEFAULT_RADIUS_KM))
+        except (KeyError, ValueError):
+            return jsonify({"error": "lat, lon and radius_km must be valid floats"}), 400
+        if suggestions:
+            quantities = {s["name"]: s["reorder_quantity"] for s in suggestions}
+            response["plan"] = plan_nearby(lat, lon, quantities, radius_km)
+
+    return jsonify(response), 200
+
+# ✅ Reorder suggestions as of the last reorder_job.py run
+@inventory_bp.route("/reorder/<vendor_id>/latest", methods=["GET"])
+def get_stored_reorder_suggestions(vendor_id):
+    vendor_id = vendor_id.strip()
 
-    return jsonify({"low_stock_items": low_stock_items}), 200
+    doc = db.collection(REORDER_SUGGESTIONS_COLLECTION).document(vendor_id).get()
+    if not doc.exists:
+        return jsonify({"error": "No reorder suggestions computed for this vendor yet"}), 404
+
+    return jsonify(doc.to_dict()), 200
 
 @inventory_bp.route("/add_from_order", methods=["POST"])
 def add_from_order():
@@ -172,55 +320,68 @@ def add_from_order():
     if not vendor_id or not order_id:
         return jsonify({"error": "vendor_id and order_id are required"}), 400
 
-    # 1. Get the order
     order_ref = db.collection("orders").document(order_id)
-    order = order_ref.get()
-    if not order.exists:
-        return jsonify({"error": "Order not found"}), 404
-
-    order_data = order.to_dict()
-    if order_data.get("status") != "accepted":
-        return jsonify({"error": "Order is not accepted yet"}), 400
-
-    if order_data.get("vendor_id") != vendor_id:
-        return jsonify({"error": "This order does not belong to the vendor"}), 403
-
-    ordered_items = order_data.get("items", [])
-
-    # 2. Get vendor inventory
-    inventory_ref = db.collection("inventory").where("vendor_id", "==", vendor_id)
-    inventory_docs = inventory_ref.stream()
-    inventory = [doc.to_dict() | {"id": doc.id} for doc in inventory_docs]
-
-    updated_items = []
-    for item in ordered_items:
-        name = item["name"].lower()
-        quantity = item["quantity"]
-        price = item.get("price", 0)
-        threshold = item.get("threshold", 5)
-
-        # Check if item exists
-        match = next((i for i in inventory if i["name"].lower() == name), None)
-        if match:
-            # Update quantity
-            new_quantity = match["quantity"] + quantity
-            db.collection("inventory").document(match["id"]).update({
-                "quantity": new_quantity
-            })
-            updated_items.append(f"Updated {name} to {new_quantity}")
-        else:
-            # Add new item
-            new_item = {
-                "vendor_id": vendor_id,
-                "name": name,
-                "quantity": quantity,
-                "price": price,
-                "threshold": threshold
-            }
-            db.collection("inventory").add(new_item)
-            updated_items.append(f"Added new item: {name}")
+
+    # One transaction: read the order and the vendor's inventory document
+    # together, then commit every changed item in one merge write
+    def add_items(transaction):
+        # 1. Get the order and the vendor inventory
+        docs = {doc.reference.path: doc for doc in db.get_all([order_ref, inventory_ref(vendor_id)],
+                                                                transaction=transaction)}
+        order = docs[order_ref.path]
+        if not order.exists:
+            raise ApiError("Order not found", 404)
+
+        order_data = order.to_dict()
+        if order_data.get("status") != "accepted":
+            raise ApiError("Order is not accepted yet", 400)
+
+        if order_data.get("vendor_id") != vendor_id:
+            raise ApiError("This order does not belong to the vendor", 403)
+
+        if order_data.get("added_to_inventory"):
+            raise ApiError("Order items were already added to inventory", 400)
+
+        ordered_items = order_data.get("items", [])
+        inventory = items_from_doc(docs[inventory_ref(vendor_id).path])
+        before = {}
+        after = {}
+
+        updated_items = []
+        for item in ordered_items:
+            name = item_key(item["name"])
+            quantity = item["quantity"]
+            price = item.get("price", 0)
+            threshold = item.get("threshold", 5)
+
+            # Check if item exists
+            current = after.get(name) or inventory.get(name)
+            if current:
+                # Update quantity
+                before.setdefault(name, current)
+                after[name] = {**current, "quantity": current["quantity"] + quantity}
+                updated_items.append(f"Updated {name} to {after[name]['quantity']}")
+            else:
+                # Add new item
+                after[name] = new_item(vendor_id, {
+                    "name": name,
+                    "quantity": quantity,
+                    "price": price,
+                    "threshold": threshold
+                })
+                updated_items.append(f"Added new item: {name}")
+
+        after = save_items(vendor_id, before, after, writer=transaction)
+        transaction.update(order_ref, {"added_to_inventory": True})
+        return updated_items, before, after
+
+    try:
+        updated_items, before, after = db.run_transaction(add_items)
+    except ApiError as e:
+        return jsonify({"error": e.message}), e.status
+    inventory_committed(vendor_id, before, after)
 
     return jsonify({
         "message": "Inventory updated from accepted order.",
         "details": updated_items
-    }), 200
\ No newline at end of file
+    }), 200
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+
+from utils.metrics import registry
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+# ✅ Prometheus scrape endpoint
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(registry.render(), mimetype="text/plain", headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
@@ -1,9 +1,34 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from firebase_config import db
-from datetime import datetime
+from utils.errors import ApiError
+from datetime import date, datetime, timedelta
+from utils.pagination import encode_cursor, decode_cursor
+from utils.supplier_catalog import supplier_catalog
+from utils.events import event_bus, vendor_channel
+from utils.vendor_inventory import inventory_committed, new_item, read_inventory, save_items
+from utils.constants import WRITE_BEHIND_ENABLED, ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS
+from utils.write_behind import QueueFull, order_writes
+from utils.order_rollups import PERIODS, accumulate, read_rollups, record_orders, rollup_writes, summarize
 
 orders_bp = Blueprint("orders", __name__)
 
+
+def items_by_name(items):
+    """Normalized name -> item, built once per supplier document (first match wins)."""
+    by_name = {}
+    for item in items:
+        by_name.setdefault(item["name"].strip().lower(), item)
+    return by_name
+
+
+def publish_placed(vendor_id, orders):
+    """One "order_placed" event per supplier order on the vendor's event stream."""
+    for order in orders:
+        event_bus.publish(vendor_channel(vendor_id), "order_placed", {
+            key: order[key] for key in ("order_id", "vendor_id", "supplier_id", "items", "total_cost", "timestamp")
+        })
+
+
 # ✅ Test route
 @orders_bp.route("/", methods=["GET"])
 def test_orders():
@@ -34,17 +59,22 @@ def place_order():
 
         supplier_orders[supplier_id].append({"name": name, "quantity": quantity})
 
+    # One batched read for every supplier in the basket
+    supplier_refs = [db.collection("suppliers").document(supplier_id) for supplier_id in supplier_orders]
+    supplier_docs = {doc.id: doc for doc in db.get_all(supplier_refs)}
+
+    writes = []
     all_orders = []
+    timestamp = datetime.utcnow().isoformat()
 
     for supplier_id, order_items in supplier_orders.items():
-        supplier_ref = db.collection("suppliers").document(supplier_id)
-        supplier_doc = supplier_ref.get()
+        supplier_doc = supplier_docs.get(supplier_id)
 
-        if not supplier_doc.exists:
+        if supplier_doc is None or not supplier_doc.exists:
             return jsonify({"error": f"Supplier '{supplier_id}' not found"}), 404
 
         supplier_data = supplier_doc.to_dict()
-        inventory = supplier_data.get("items", [])
+        inventory = items_by_name(supplier_data.get("items", []))
 
         fulfilled_items = []
         total_cost = 0.0
@@ -53,8 +83,7 @@ def place_order():
             name = order_item["name"]
             quantity = order_item["quantity"]
 
-            matched_item = next(
-                (i for i in inventory if i["name"].strip().lower() == name), None)
+            matched_item = inventory.get(name)
 
             if not matched_item:
                 return jsonify({"error": f"Item '{name}' not found in supplier '{supplier_id}' inventory"}), 404
@@ -73,14 +102,36 @@ def place_order():
             "items": fulfilled_items,
             "total_cost": total_cost,
             "status": "pending",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": timestamp
         }
 
         order_ref = db.collection("orders").document()
-        order_ref.set(order_data)
-
-        order_data["order_id"] = order_ref.id
-        all_orders.append(order_data)
+        writes.append((order_ref, order_data, False))
+
+        all_orders.append({**order_data, "order_id": order_ref.id})
+
+    # Daily/weekly rollups are incremented in the same batch as the orders
+    rollups = {}
+    for order_data in all_orders:
+        accumulate(rollups, order_data, "placed", timestamp)
+    writes += rollup_writes(rollups)
+
+    # Under write-behind the ids are answered now and the orders are
+    # group-committed with other requests' shortly after
+    if current_app.config.get("WRITE_BEHIND", WRITE_BEHIND_ENABLED):
+        try:
+            order_writes.submit(writes)
+        except QueueFull:
+            return jsonify({"error": "Too many orders right now, please retry shortly"}), 503, {"Retry-After": "1"}
+        publish_placed(vendor_id, all_orders)
+        return jsonify({"message": "Orders placed successfully", "orders": all_orders, "queued": True}), 202
+
+    # All supplier orders are written together, or none if validation failed
+    batch = db.batch()
+    for ref, data, merge in writes:
+        batch.set(ref, data, merge=merge)
+    batch.commit()
+    publish_placed(vendor_id, all_orders)
 
     return jsonify({"message": "Orders placed successfully", "orders": all_orders})
 
@@ -96,75 +147,156 @@ def accept_order():
         return jsonify({"error": "order_id and supplier_id are required"}), 400
 
     order_ref = db.collection("orders").document(order_id)
-    order_doc = order_ref.get()
+    supplier_ref = db.collection("suppliers").document(supplier_id)
 
-    if not order_doc.exists:
-        return jsonify({"error": "Order not found"}), 404
+    # Read everything, then commit all writes at once; concurrent accepts
+    # touching the same supplier stock are retried by the transaction
+    def accept(transaction):
+        docs = {doc.reference.path: doc for doc in db.get_all([order_ref, supplier_ref], transaction=transaction)}
+        order_doc = docs[order_ref.path]
+        supplier_doc = docs[supplier_ref.path]
 
-    order_data = order_doc.to_dict()
+        if not order_doc.exists:
+            raise ApiError("Order not found", 404)
 
-    if order_data["supplier_id"] != supplier_id:
-        return jsonify({"error": "Unauthorized supplier"}), 403
+        order_data = order_doc.to_dict()
 
-    vendor_id = order_data["vendor_id"]
-    order_items = order_data["items"]
+        if order_data["supplier_id"] != supplier_id:
+            raise ApiError("Unauthorized supplier", 403)
 
-    # ✅ Step 1: Deduct from supplier inventory
-    supplier_ref = db.collection("suppliers").document(supplier_id)
-    supplier_doc = supplier_ref.get()
+        if order_data.get("status") == "accepted":
+            raise ApiError("Order already accepted", 400)
+
+        if not supplier_doc.exists:
+            raise ApiError("Supplier not found", 404)
+
+        vendor_id = order_data["vendor_id"]
+        order_items = order_data["items"]
+
+        inventory = read_inventory(vendor_id, transaction=transaction)
 
-    if not supplier_doc.exists:
-        return jsonify({"error": "Supplier not found"}), 404
+        # ✅ Step 1: Deduct from supplier inventory
+        supplier_data = supplier_doc.to_dict()
+        supplier_inventory = supplier_data.get("items", [])
+        supplier_items = items_by_name(supplier_inventory)
 
-    supplier_data = supplier_doc.to_dict()
-    supplier_inventory = supplier_data.get("items", [])
+        for item in order_items:
+            name = item["name"].strip().lower()
+            quantity = item["quantity"]
 
-    for item in order_items:
-        name = item["name"].strip().lower()
-        quantity = item["quantity"]
+            matched_item = supplier_items.get(name)
 
-        matched_item = next((i for i in supplier_inventory if i["name"].strip().lower() == name), None)
+            if not matched_item:
+                raise ApiError(f"Item '{name}' not found in supplier '{supplier_id}'", 404)
 
-        if not matched_item:
-            return jsonify({"error": f"Item '{name}' not found in supplier '{supplier_id}'"}), 404
+            if matched_item["quantity"] < quantity:
+                raise ApiError(f"Not enough stock of '{name}' with supplier '{supplier_id}'", 400)
+
+            matched_item["quantity"] -= quantity
+
+        # ✅ Step 2: Add to vendor inventory
+        before = {}
+        after = {}
+
+        for item in order_items:
+            name = item["name"].strip().lower()
+            quantity = item["quantity"]
+            price = item.get("price", 0.0)
+
+            current = after.get(name) or inventory.get(name)
+            if current:
+                before.setdefault(name, current)
+                after[name] = {**current, "quantity": current["quantity"] + quantity}
+            else:
+                after[name] = new_item(vendor_id, {
+                    "name": name,
+                    "quantity": quantity,
+                    "price": price,
+                    "threshold": 0
+                })
+
+        transaction.update(supplier_ref, {"items": supplier_inventory})
+        after = save_items(vendor_id, before, after, writer=transaction)
+
+        # ✅ Step 3: Mark order as accepted
+        accepted_at = datetime.utcnow()
+        # The items are credited to the vendor here, so add_from_order must not add them again
+        transaction.update(order_ref, {
+            "status": "accepted",
+            "accepted_at": accepted_at,
+            "added_to_inventory": True
+        })
+        record_orders([order_data], "accepted", accepted_at, writer=transaction)
+        return supplier_data, supplier_inventory, vendor_id, before, after
 
-        if matched_item["quantity"] < quantity:
-            return jsonify({"error": f"Not enough stock of '{name}' with supplier '{supplier_id}'"}), 400
+    try:
+        supplier_data, supplier_inventory, vendor_id, before, after = db.run_transaction(accept)
+    except ApiError as e:
+        return jsonify({"error": e.message}), e.status
 
-        matched_item["quantity"] -= quantity
+    supplier_catalog.put(supplier_id, {**supplier_data, "items": supplier_inventory})
+    event_bus.publish(vendor_channel(vendor_id), "order_accepted",
+                      {"order_id": order_id, "vendor_id": vendor_id, "supplier_id": supplier_id})
+    inventory_committed(vendor_id, before, after)
 
-    supplier_ref.update({"items": supplier_inventory})
+    return jsonify({"message": "Order accepted. Inventory updated."}), 200
 
-    # ✅ Step 2: Add to vendor inventory
-    inventory_ref = db.collection("inventory").document(vendor_id)
-    inventory_doc = inventory_ref.get()
-    existing_items = inventory_doc.to_dict().get("items", []) if inventory_doc.exists else []
-    inventory_map = {item["name"].lower(): item for item in existing_items}
 
-    for item in order_items:
-        name = item["name"].strip().lower()
-        quantity = item["quantity"]
-        price = item.get("price", 0.0)
+def round_totals(value):
+    """Rollup totals with costs rounded to paise."""
+    if isinstance(value, dict):
+        return {key: round(v, 2) if key == "total_cost" else round_totals(v) for key, v in value.items()}
+    if isinstance(value, list):
+        return [round_totals(v) for v in value]
+    return value
 
-        if name in inventory_map:
-            inventory_map[name]["quantity"] += quantity
-        else:
-            inventory_map[name] = {
-                "name": name,
-                "quantity": quantity,
-                "price": price,
-                "threshold": 0
-            }
 
-    inventory_ref.set({"items": list(inventory_map.values())})
+# ✅ Spend and volume per day or week from precomputed rollups
+@orders_bp.route("/analytics", methods=["GET"])
+def get_order_analytics():
+    vendor_id = request.args.get("vendor_id")
+    supplier_id = request.args.get("supplier_id")
+    if bool(vendor_id) == bool(supplier_id):
+        return jsonify({"error": "Provide exactly one of vendor_id or supplier_id"}), 400
+    scope, owner_id = ("vendor", vendor_id) if vendor_id else ("supplier", supplier_id)
 
-    # ✅ Step 3: Mark order as accepted
-    order_ref.update({
-        "status": "accepted",
-        "accepted_at": datetime.utcnow()
-    })
+    period = request.args.get("period", "day")
+    if period not in PERIODS:
+        return jsonify({"error": "period must be 'day' or 'week'"}), 400
 
-    return jsonify({"message": "Order accepted. Inventory updated."}), 200
+    try:
+        end = date.fromisoformat(request.args["to"]) if "to" in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args["from"]) if "from" in request.args else \
+            end - timedelta(days=ANALYTICS_DEFAULT_DAYS[period] - 1)
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO dates (YYYY-MM-DD)"}), 400
+    if start > end or (end - start).days >= ANALYTICS_MAX_DAYS:
+        return jsonify({"error": f"from must not be after to, and the range is limited to {ANALYTICS_MAX_DAYS} days"}), 400
+
+    # One batched read of at most ANALYTICS_MAX_DAYS documents, however long the history
+    buckets = read_rollups(scope, owner_id, period, start, end)
+    summary = summarize(buckets)
+    if request.args.get("include_items", "true").lower() != "true":
+        for totals in buckets + [summary]:
+            del totals["items"]
+
+    return jsonify(round_totals({
+        "scope": scope,
+        "owner_id": owner_id,
+        "period": period,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "buckets": buckets,
+        "totals": summary
+    }))
+
+
+def parse_history_bound(value, end_of_day=False):
+    """ISO date/datetime -> timestamp string comparable with stored order timestamps."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
 
 
 # ✅ Order history for a vendor
@@ -175,15 +307,60 @@ def get_order_history():
         return jsonify({"error": "Missing vendor_id"}), 400
 
     try:
-        orders_ref = db.collection("orders").where("vendor_id", "==", vendor_id)
-        docs = orders_ref.stream()
-
-        history = []
-        for doc in docs:
+        date_from = request.args.get("from")
+        date_to = request.args.get("to")
+        start = parse_history_bound(date_from) if date_from else None
+        end = parse_history_bound(date_to, end_of_day=True) if date_to else None
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+        after = decode_cursor(request.args.get("cursor"))
+        if (limit is not None and limit <= 0) or (after is not None and len(after) != 2):
+            raise ValueError("Invalid limit or cursor")
+    except ValueError:
+        return jsonify({"error": "Invalid from/to date, limit or cursor"}), 400
+
+    # Newest first, with range, ordering and paging done by the datastore
+    query = db.collection("orders").where("vendor_id", "==", vendor_id)
+    if start:
+        query = query.where("timestamp", ">=", start)
+    if end:
+        # A bare date includes the whole day
+        query = query.where("timestamp", "<" if len(date_to) == 10 else "<=", end)
+    query = query.order_by("timestamp", direction=db.DESCENDING).order_by("__name__", direction=db.DESCENDING)
+    if after:
+        query = query.start_after({"timestamp": after[0], "__name__": after[1]})
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    def orders():
+        for count, doc in enumerate(query.stream()):
             order = doc.to_dict()
             order["order_id"] = doc.id
-            history.append(order)
+            yield count, order
+
+    def next_cursor(order):
+        return encode_cursor([order["timestamp"], order["order_id"]])
+
+    if request.args.get("format") == "ndjson":
+        # Stream rows as they arrive; a final {"next_cursor": ...} line marks more pages
+        def generate():
+            last = None
+            for count, order in orders():
+                if limit is not None and count == limit:
+                    yield current_app.json.dumps({"next_cursor": next_cursor(last)}) + "\n"
+                    return
+                last = order
+                yield current_app.json.dumps(order) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-        return jsonify({"orders": sorted(history, key=lambda x: x.get("timestamp", ""), reverse=True)})
+    try:
+        history = [order for _, order in orders()]
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+    if limit is None:
+        return jsonify({"orders": history})
+
+    has_more = len(history) > limit
+    history = history[:limit]
+    return jsonify({"orders": history, "next_cursor": next_cursor(history[-1]) if has_more else None})
@@ -1,27 +1,159 @@
+from bisect import bisect_right
+
 from flask import Blueprint, request, jsonify
 from firebase_config import db
-from utils.geo_utils import calculate_distance
+from utils.constants import (DEFAULT_RADIUS_KM, BASKET_MAX_SUPPLIERS, BASKET_DELIVERY_FEE,
+                             BASKET_COST_PER_KM, SUPPLIERS_MAX_LIMIT)
+from utils.geo_index import GeoIndex
+from utils.supplier_catalog import index_location, supplier_catalog, SORT_KEYS
+from utils.pagination import encode_cursor, decode_cursor, take_page
+from utils.fast_json import json_response
+from utils.conditional import conditional, current_version, stored_version
+from utils.supplier_records import as_dict, with_items
+from utils.basket_planner import plan_basket
+from utils.search_index import words
 
 suppliers_bp = Blueprint("suppliers", __name__)
 
+def get_supplier_index():
+    """Spatial index over supplier locations, kept by the catalog with its listing.
+
+    It is rebuilt whenever the listing reloads, so suppliers added through
+    other workers appear within the catalog TTL. Without a cacheable
+    listing (cache disabled or too large) it is built for this request.
+    """
+    index = supplier_catalog.geo_index()
+    if index is not None:
+        return index
+    records = supplier_catalog.records()
+    index = supplier_catalog.geo_index()
+    if index is None:
+        index = GeoIndex()
+        for record in records:
+            index_location(index, record)
+    return index
+
+
+def catalog_version():
+    """The supplier catalog's stored version, with the cached listing brought up to it."""
+    version = current_version("suppliers", lambda: stored_version("suppliers"))
+    supplier_catalog.sync_version(version[0])
+    return version
+
+
 def paginate(items, page, limit):
     start = (page - 1) * limit
     return items[start:start + limit]
 
-def filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_price, max_price, search_term, require_all_items):
+
+def stream_suppliers_after(order, after, chunk_size=200):
+    """Supplier records in SORT_KEYS[order] order after the cursor key.
+
+    Served from the cached catalog when possible, otherwise from ordered
+    datastore queries that fetch one chunk at a time.
+    """
+    records = supplier_catalog.iter_ordered(order, after)
+    if records is not None:
+        yield from records
+        return
+
+    query = db.collection("suppliers")
+    if order == "rating":
+        query = query.order_by("rating", direction=db.DESCENDING)
+    query = query.order_by("__name__")
+
+    while True:
+        chunk = query
+        if after:
+            fields = {"__name__": after[-1]}
+            if order == "rating":
+                fields["rating"] = -after[0]
+            chunk = chunk.start_after(fields)
+        docs = list(chunk.limit(chunk_size).stream())
+        for doc in docs:
+            record = doc.to_dict()
+            record["id"] = doc.id
+            yield record
+        if len(docs) < chunk_size:
+            return
+        after = list(SORT_KEYS[order](record))
+
+
+def matches_search(supplier, search_term):
+    """The plain search: the term is a substring of the supplier's name or id."""
+    return search_term in supplier.get("name", "").lower() or search_term in supplier.get("id", "").lower()
+
+
+def search_scores(search_term):
+    """{supplier_id: score} for a search term, or None without a term or cached catalog.
+
+    The union of SearchIndex matches (words, prefixes, typos, synonyms) and
+    the plain substring search, both answered by the index, so caching
+    never loses a result; a substring hit scores like an exact match of
+    every query word. A term without letters or digits also gets None, so
+    callers fall back to the plain search.
+    """
+    search_index = supplier_catalog.search_index() if search_term else None
+    if search_index is None:
+        return None
+    substring_matches = search_index.substring_matches(search_term)
+    if substring_matches is None:
+        return None
+    scores = search_index.search(search_term)
+    whole = float(max(len(words(search_term)), 1))
+    for supplier_id in substring_matches:
+        scores[supplier_id] = max(scores.get(supplier_id, 0.0), whole)
+    return scores
+
+
+def has_item_bounds(items_filter, min_quantity, min_price, max_price):
+    """Whether the item filters can exclude any item (an infinite max_price bounds nothing)."""
+    return bool(items_filter or min_price or min_quantity or (max_price and max_price != float("inf")))
+
+
+def filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_price, max_price, search_term, require_all_items,
+                     item_index=None, index_matches=None, search_matches=None):
+    """Suppliers (plain dicts or SupplierRecords) passing the filters, with items narrowed to the matches.
+
+    A supplier matches search_term when its name or id contains it, or when
+    it is in search_matches (from search_scores(search_term)).
+    """
     filtered = []
+    item_filters = bool(items_filter or min_price or max_price or min_quantity)
+    item_bounds = has_item_bounds(items_filter, min_quantity, min_price, max_price)
+
+    # Resolve item filters for indexed suppliers through the inverted index
+    # (index_matches can be passed in when filtering a stream chunk by chunk)
+    if not item_bounds or item_index is None:
+        index_matches = None
+    elif index_matches is None:
+        index_matches = item_index.match(items_filter, min_quantity, min_price, max_price, require_all_items)
 
     for supplier in suppliers:
-        supplier_name = supplier.get("name", "").lower()
-        supplier_id = supplier.get("id", "").lower()
+        # Cheap id lookup first; covers() only decides for suppliers the index matched
+        if index_matches is not None and supplier.get("id") not in index_matches and item_index.covers(supplier):
+            continue
+        indexed = index_matches is not None and supplier.get("id") in index_matches and item_index.covers(supplier)
 
-        if search_term and search_term not in supplier_name and search_term not in supplier_id:
+        if search_term and not matches_search(supplier, search_term) and (
+                search_matches is None or supplier.get("id") not in search_matches):
             continue
 
         if min_rating and supplier.get("rating", 0) < min_rating:
             continue
 
         supplier_items = supplier.get("items", [])
+
+        if indexed:
+            filtered.append(with_items(supplier, [supplier_items[pos] for pos in index_matches[supplier["id"]]]))
+            continue
+
+        if item_filters and not item_bounds:
+            # Only the default max_price=inf: every item matches, items stay as they are
+            if supplier_items:
+                filtered.append(supplier)
+            continue
+
         matched_items = []
 
         for item in supplier_items:
@@ -41,7 +173,7 @@ def filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_pric
             matched_items.append(item)
 
         if items_filter:
-            item_names_matched = [item["name"].lower() for item in matched_items]
+            item_names_matched = {item["name"].lower() for item in matched_items}
             if require_all_items:
                 if not all(item in item_names_matched for item in items_filter):
                     continue
@@ -49,12 +181,12 @@ def filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_pric
                 if not any(item in item_names_matched for item in items_filter):
                     continue
 
-        if (items_filter or min_price or max_price or min_quantity) and not matched_items:
+        if item_filters and not matched_items:
             continue
 
         # Override supplier items only if filters are applied
-        if items_filter or min_price or max_price or min_quantity:
-            supplier['items'] = matched_items
+        if item_filters:
+            supplier = with_items(supplier, matched_items)
 
         filtered.append(supplier)
 
@@ -83,6 +215,12 @@ def add_supplier():
     if not isinstance(location, dict) or "lat" not in location or "lon" not in location:
         return jsonify({"error": "Location must be a dict with 'lat' and 'lon'"}), 400
 
+    try:
+        location["lat"] = float(location["lat"])
+        location["lon"] = float(location["lon"])
+    except (TypeError, ValueError):
+        return jsonify({"error": "Location 'lat' and 'lon' must be numbers"}), 400
+
     if not isinstance(items, list) or len(items) == 0:
         return jsonify({"error": "Items must be a non-empty list"}), 400
 
@@ -105,6 +243,7 @@ def add_supplier():
         "rating": rating
     }
     db.collection("suppliers").document(supplier_id).set(supplier_data)
+    supplier_catalog.put(supplier_id, supplier_data)
     supplier_data["id"] = supplier_id
 
     return jsonify({"message": "Supplier added successfully", "supplier": supplier_data}), 201
@@ -112,14 +251,8 @@ def add_supplier():
 
 # ✅ Get all suppliers with filters
 @suppliers_bp.route("/all", methods=["GET"])
+@conditional(catalog_version)
 def get_all_suppliers():
-    all_docs = db.collection("suppliers").stream()
-    suppliers = []
-    for doc in all_docs:
-        data = doc.to_dict()
-        data["id"] = doc.id
-        suppliers.append(data)
-
     # Query parameters
     item_param = request.args.get("items")
     items_filter = [i.strip().lower() for i in item_param.split(",")] if item_param else None
@@ -131,9 +264,51 @@ def get_all_suppliers():
     search_term = request.args.get("search", "").lower()
     require_all_items = request.args.get("require_all", "true").lower() == "true"
     page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 10))
+    limit = min(max(int(request.args.get("limit", 10)), 1), SUPPLIERS_MAX_LIMIT)
+
+    item_index = supplier_catalog.item_index()
+
+    # Cursor mode: only read as far as the requested page
+    if "cursor" in request.args:
+        try:
+            after = decode_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        order = "rating" if sort_by == "rating" else "id"
+        index_matches = None
+        if item_index is not None and has_item_bounds(items_filter, min_quantity, min_price, max_price):
+            index_matches = item_index.match(items_filter, min_quantity, min_price, max_price, require_all_items)
+        search_matches = search_scores(search_term)
 
-    filtered = filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_price, max_price, search_term, require_all_items)
+        def apply_filters(chunk):
+            return filter_suppliers(chunk, items_filter, min_rating, min_quantity, min_price, max_price, search_term,
+                                    require_all_items, item_index=item_index, index_matches=index_matches,
+                                    search_matches=search_matches)
+
+        try:
+            paginated, has_more = take_page(stream_suppliers_after(order, after), limit, apply_filters)
+        except TypeError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        response = {
+            "suppliers": [as_dict(supplier) for supplier in paginated],
+            "limit": limit,
+            "next_cursor": encode_cursor(list(SORT_KEYS[order](paginated[-1]))) if has_more else None
+        }
+        if request.args.get("include_total", "false").lower() == "true":
+            response["total"] = len(apply_filters(supplier_catalog.records()))
+        return json_response(response)
+
+    search_matches = search_scores(search_term)
+    if search_matches is not None:
+        # Only the search hits, most relevant first
+        ranked = sorted(search_matches, key=lambda supplier_id: (-search_matches[supplier_id], supplier_id))
+        suppliers = supplier_catalog.get_records(ranked)
+    else:
+        suppliers = supplier_catalog.records()
+    filtered = filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_price, max_price, search_term, require_all_items,
+                                item_index=item_index, search_matches=search_matches)
 
     if sort_by == "rating":
         filtered.sort(key=lambda x: x.get("rating", 0), reverse=True)
@@ -143,8 +318,8 @@ def get_all_suppliers():
     total = len(filtered)
     total_pages = (total + limit - 1) // limit
 
-    return jsonify({
-        "suppliers": paginated,
+    return json_response({
+        "suppliers": [as_dict(supplier) for supplier in paginated],
         "total": total,
         "page": page,
         "limit": limit,
@@ -161,16 +336,19 @@ def get_nearby_suppliers():
     except (TypeError, ValueError):
         return jsonify({"error": "Latitude and longitude must be provided and valid floats"}), 400
 
-    all_docs = db.collection("suppliers").stream()
-    suppliers = []
-    for doc in all_docs:
-        data = doc.to_dict()
-        data["id"] = doc.id
-        location = data.get("location")
-        if location and "lat" in location and "lon" in location:
-            dist = calculate_distance(lat, lon, location["lat"], location["lon"])
-            data["distance_km"] = round(dist, 2)
-            suppliers.append(data)
+    try:
+        radius_km = float(request.args.get("radius_km", DEFAULT_RADIUS_KM))
+        k = int(request.args["k"]) if "k" in request.args else None
+    except ValueError:
+        return jsonify({"error": "radius_km must be a number and k an integer"}), 400
+
+    # Only suppliers in nearby index cells are fetched, nearest first
+    index = get_supplier_index()
+    if k is not None:
+        max_radius = radius_km if "radius_km" in request.args else None
+        hits = index.nearest(lat, lon, k, max_radius_km=max_radius)
+    else:
+        hits = index.within_radius(lat, lon, radius_km)
 
     item_param = request.args.get("items") or request.args.get("item")
     items_filter = [i.strip().lower() for i in item_param.split(",")] if item_param else None
@@ -181,19 +359,63 @@ def get_nearby_suppliers():
     search_term = request.args.get("search", "").lower()
     require_all_items = request.args.get("require_all", "true").lower() == "true"
     page = int(request.args.get("page", 1))
-    limit = int(request.args.get("limit", 10))
-
-    filtered = filter_suppliers(suppliers, items_filter, min_rating, min_quantity, min_price, max_price, search_term, require_all_items)
+    limit = min(max(int(request.args.get("limit", 10)), 1), SUPPLIERS_MAX_LIMIT)
+
+    item_index = supplier_catalog.item_index()
+    index_matches = None
+    if item_index is not None and has_item_bounds(items_filter, min_quantity, min_price, max_price):
+        index_matches = item_index.match(items_filter, min_quantity, min_price, max_price, require_all_items)
+    search_matches = search_scores(search_term)
+
+    def apply_filters(chunk):
+        return filter_suppliers(chunk, items_filter, min_rating, min_quantity, min_price, max_price, search_term,
+                                require_all_items, item_index=item_index, index_matches=index_matches,
+                                search_matches=search_matches)
+
+    def with_distances(hits, chunk_size=200):
+        # Fetch supplier records for the hits lazily, one batch at a time
+        for start in range(0, len(hits), chunk_size):
+            chunk = hits[start:start + chunk_size]
+            records = {record.id: record for record in supplier_catalog.get_records([supplier_id for supplier_id, _ in chunk])}
+            for supplier_id, dist in chunk:
+                record = records.get(supplier_id)
+                if record is None:
+                    index.remove(supplier_id)
+                    continue
+                yield record.replace(distance_km=round(dist, 2))
 
-    filtered.sort(key=lambda x: x.get("distance_km", float("inf")))
+    # Cursor mode: resume after the last (distance, id) and stop once the page is full
+    if "cursor" in request.args:
+        remaining = hits
+        try:
+            after = decode_cursor(request.args["cursor"])
+            if after:
+                keys = [(dist, supplier_id) for supplier_id, dist in hits]
+                remaining = hits[bisect_right(keys, tuple(after)):]
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        paginated, has_more = take_page(with_distances(remaining), limit, apply_filters)
+        distances = dict(remaining)
+        response = {
+            "suppliers": [as_dict(supplier) for supplier in paginated],
+            "limit": limit,
+            "next_cursor": encode_cursor([distances[paginated[-1]["id"]], paginated[-1]["id"]]) if has_more else None
+        }
+        if request.args.get("include_total", "false").lower() == "true":
+            response["total"] = len(apply_filters(list(with_distances(hits))))
+        return json_response(response)
+
+    # Already in distance order from the index; filtering keeps that order
+    filtered = apply_filters(list(with_distances(hits)))
 
     paginated = paginate(filtered, page, limit)
 
     total = len(filtered)
     total_pages = (total + limit - 1) // limit
 
-    return jsonify({
-        "suppliers": paginated,
+    return json_response({
+        "suppliers": [as_dict(supplier) for supplier in paginated],
         "total": total,
         "page": page,
         "limit": limit,
@@ -201,6 +423,63 @@ def get_nearby_suppliers():
     })
 
 
+def plan_nearby(lat, lon, quantities, radius_km=DEFAULT_RADIUS_KM, max_suppliers=BASKET_MAX_SUPPLIERS,
+                delivery_fee=BASKET_DELIVERY_FEE, cost_per_km=BASKET_COST_PER_KM):
+    """Basket plan ({item name: quantity}) over suppliers within radius_km listing any of the items."""
+    hits = get_supplier_index().within_radius(lat, lon, radius_km)
+    distances = dict(hits)
+    records = supplier_catalog.get_records([supplier_id for supplier_id, _ in hits])
+    candidates = filter_suppliers(records, list(quantities), 0, 0, 0, float("inf"), "", False,
+                                  item_index=supplier_catalog.item_index())
+    return plan_basket(quantities, candidates, [distances[supplier["id"]] for supplier in candidates],
+                       max_suppliers, delivery_fee, cost_per_km)
+
+
+# ✅ Plan which nearby suppliers to buy a basket from
+@suppliers_bp.route("/plan_basket", methods=["POST"])
+def plan_nearby_basket():
+    data = request.get_json() or {}
+    try:
+        lat = float(data["lat"])
+        lon = float(data["lon"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Latitude and longitude must be provided and valid floats"}), 400
+
+    try:
+        radius_km = float(data.get("radius_km", DEFAULT_RADIUS_KM))
+        max_suppliers = int(data.get("max_suppliers", BASKET_MAX_SUPPLIERS))
+        delivery_fee = float(data.get("delivery_fee", BASKET_DELIVERY_FEE))
+        cost_per_km = float(data.get("cost_per_km", BASKET_COST_PER_KM))
+    except (TypeError, ValueError):
+        return jsonify({"error": "radius_km, delivery_fee and cost_per_km must be numbers and max_suppliers an integer"}), 400
+    if max_suppliers < 1:
+        return jsonify({"error": "max_suppliers must be at least 1"}), 400
+
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Items must be a non-empty list"}), 400
+
+    # Same item listed twice is bought together
+    quantities = {}
+    for item in items:
+        name = str(item.get("name", "")).strip().lower() if isinstance(item, dict) else ""
+        try:
+            quantity = int(item.get("quantity")) if name else 0
+        except (TypeError, ValueError):
+            quantity = 0
+        if not name or quantity <= 0:
+            return jsonify({"error": f"Each item needs a name and a positive integer quantity: {item}"}), 400
+        quantities[name] = quantities.get(name, 0) + quantity
+
+    return json_response(plan_nearby(lat, lon, quantities, radius_km, max_suppliers, delivery_fee, cost_per_km))
+
+
+# ✅ Supplier catalog cache hit/miss counters
+@suppliers_bp.route("/cache_stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(supplier_catalog.stats())
+
+
 # ✅ Test route
 @suppliers_bp.route("/", methods=["GET"])
 def test_suppliers():
@@ -0,0 +1,34 @@
+"""Firestore adapter for the storage interface used by the routes."""
+from google.cloud import firestore
+
+
+class FirestoreStore:
+    """Thin wrapper around a google.cloud.firestore client.
+
+    The routes only use the Firestore-shaped API (collection, document,
+    where, stream, get_all, batch), which the client already provides, so
+    calls are delegated as-is. Backend-specific helpers live here so the
+    local store can offer the same ones.
+    """
+
+    ASCENDING = firestore.Query.ASCENDING
+    DESCENDING = firestore.Query.DESCENDING
+    DELETE_FIELD = firestore.DELETE_FIELD
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    @property
+    def client(self):
+        return self._client
+
+    def run_transaction(self, fn):
+        """Run fn(transaction) in a Firestore transaction, retrying on contention."""
+        return firestore.transactional(fn)(self._client.transaction())
+
+    @staticmethod
+    def increment(value):
+        return firestore.Increment(value)
@@ -0,0 +1,583 @@
+"""Local stand-in for the Firestore client used by the routes.
+
+Supports the subset of the Firestore API the app relies on:
+
+    db.collection(name).where(field, op, value).order_by(field).limit(n).stream()
+    db.collection(name).document(id).get() / .set() / .update() / .delete()
+    db.collection(name).add(data)
+    db.get_all(refs), db.batch()
+    db.run_transaction(fn), db.increment(n)
+
+Documents live either in process memory (MemoryBackend) or in a SQLite
+file (SQLiteBackend). Equality filters are served from per-field indexes
+that are built the first time a field is queried.
+"""
+import json
+import re
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+from functools import cmp_to_key
+from threading import RLock
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+DOCUMENT_ID = "__name__"
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+_MISSING = object()
+
+
+class NotFound(Exception):
+    pass
+
+
+class Increment:
+    """Local counterpart of firestore.Increment."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+# Local counterpart of firestore.DELETE_FIELD
+DELETE_FIELD = object()
+
+
+def _increment(current, transform):
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        return current + transform.value
+    return transform.value
+
+
+def _apply_transforms(data, current):
+    for key, value in data.items():
+        if isinstance(value, Increment):
+            data[key] = _increment(current.get(key) if isinstance(current, dict) else None, value)
+        elif isinstance(value, dict):
+            _apply_transforms(value, current.get(key) if isinstance(current, dict) else None)
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _get_path(data, field):
+    value = data
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(data, field, value):
+    parts = field.split(".")
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    data[parts[-1]] = value
+
+
+def _delete_path(data, field):
+    parts = field.split(".")
+    for part in parts[:-1]:
+        data = data.get(part)
+        if not isinstance(data, dict):
+            return
+    data.pop(parts[-1], None)
+
+
+def _merge(current, data):
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            current.pop(key, None)
+        elif isinstance(value, dict) and isinstance(current.get(key), dict):
+            _merge(current[key], value)
+        else:
+            current[key] = value
+
+
+def _index_key(value):
+    try:
+        hash(value)
+    except TypeError:
+        return ("__unhashable__", repr(value))
+    if isinstance(value, bool):
+        return ("__bool__", value)
+    return value
+
+
+def _type_rank(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    return 5
+
+
+def _compare_values(a, b):
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 5:
+        a, b = repr(a), repr(b)
+    return (a > b) - (a < b)
+
+
+def _matches(value, op, target):
+    if value is _MISSING:
+        return False
+    if op == "==":
+        return _type_rank(value) == _type_rank(target) and value == target
+    if op == "!=":
+        return not (_type_rank(value) == _type_rank(target) and value == target)
+    if op == "in":
+        return any(_matches(value, "==", t) for t in target)
+    if op == "not-in":
+        return not any(_matches(value, "==", t) for t in target)
+    if op == "array_contains":
+        return isinstance(value, list) and any(_matches(v, "==", target) for v in value)
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(_matches(v, "in", target) for v in value)
+    if _type_rank(value) != _type_rank(target):
+        return False
+    cmp = _compare_values(value, target)
+    if op == "<":
+        return cmp < 0
+    if op == "<=":
+        return cmp <= 0
+    if op == ">":
+        return cmp > 0
+    if op == ">=":
+        return cmp >= 0
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+class _JSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime):
+            return {"__datetime__": o.isoformat()}
+        return super().default(o)
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+# ---------- Backends ----------
+
+class MemoryBackend:
+    def __init__(self):
+        self._docs = {}
+        self._indexes = {}
+
+    def get(self, collection, doc_id):
+        return self._docs.get(collection, {}).get(doc_id)
+
+    def put(self, collection, doc_id, data):
+        docs = self._docs.setdefault(collection, {})
+        old = docs.get(doc_id)
+        for field, index in self._indexes.get(collection, {}).items():
+            if old is not None:
+                self._unindex(index, _get_path(old, field), doc_id)
+            self._index(index, _get_path(data, field), doc_id)
+        docs[doc_id] = data
+
+    def delete(self, collection, doc_id):
+        old = self._docs.get(collection, {}).pop(doc_id, None)
+        if old is None:
+            return
+        for field, index in self._indexes.get(collection, {}).items():
+            self._unindex(index, _get_path(old, field), doc_id)
+
+    @staticmethod
+    def _index(index, value, doc_id):
+        if value is not _MISSING:
+            index.setdefault(_index_key(value), set()).add(doc_id)
+
+    @staticmethod
+    def _unindex(index, value, doc_id):
+        if value is _MISSING:
+            return
+        ids = index.get(_index_key(value))
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del index[_index_key(value)]
+
+    def _field_index(self, collection, field):
+        indexes = self._indexes.setdefault(collection, {})
+        if field not in indexes:
+            index = indexes[field] = {}
+            for doc_id, data in self._docs.get(collection, {}).items():
+                self._index(index, _get_path(data, field), doc_id)
+        return indexes[field]
+
+    def scan(self, collection, filters):
+        docs = self._docs.get(collection, {})
+        candidate_ids = None
+        for field, op, value in filters:
+            if field == DOCUMENT_ID or op not in ("==", "in"):
+                continue
+            index = self._field_index(collection, field)
+            values = value if op == "in" else [value]
+            ids = set()
+            for v in values:
+                ids |= index.get(_index_key(v), set())
+            candidate_ids = ids if candidate_ids is None else candidate_ids & ids
+
+        if candidate_ids is None:
+            return list(docs.items())
+        return [(doc_id, docs[doc_id]) for doc_id in candidate_ids if doc_id in docs]
+
+    def count(self, collection):
+        return len(self._docs.get(collection, {}))
+
+
+class SQLiteBackend:
+    def __init__(self, path=":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, id))"
+        )
+        self._conn.commit()
+        self._indexed_fields = set()
+
+    @staticmethod
+    def _dumps(data):
+        return json.dumps(data, cls=_JSONEncoder)
+
+    @staticmethod
+    def _loads(text):
+        return json.loads(text, object_hook=_json_object_hook)
+
+    def get(self, collection, doc_id):
+        row = self._conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return self._loads(row[0]) if row else None
+
+    def put(self, collection, doc_id, data):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+            (collection, doc_id, self._dumps(data)),
+        )
+        self._conn.commit()
+
+    def delete(self, collection, doc_id):
+        self._conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+        self._conn.commit()
+
+    def _ensure_index(self, field):
+        if field not in self._indexed_fields:
+            name = "idx_" + field.replace(".", "__")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f"ON documents (collection, json_extract(data, '$.{field}'))"
+            )
+            self._conn.commit()
+            self._indexed_fields.add(field)
+
+    def scan(self, collection, filters):
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [collection]
+        for field, op, value in filters:
+            if field == DOCUMENT_ID or not _FIELD_RE.match(field):
+                continue
+            # Exact semantics are re-checked in Python; SQL only narrows the scan
+            if op == "==" and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                self._ensure_index(field)
+                sql += f" AND json_extract(data, '$.{field}') = ?"
+                params.append(value)
+            elif op == "in" and value and all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in value):
+                self._ensure_index(field)
+                sql += f" AND json_extract(data, '$.{field}') IN ({', '.join('?' * len(value))})"
+                params.extend(value)
+        return [(doc_id, self._loads(data)) for doc_id, data in self._conn.execute(sql, params)]
+
+    def count(self, collection):
+        return self._conn.execute("SELECT COUNT(*) FROM documents WHERE collection = ?", (collection,)).fetchone()[0]
+
+
+# ---------- Firestore-like client surface ----------
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        if field == DOCUMENT_ID:
+            return self.id
+        value = _get_path(self._data or {}, field)
+        if value is _MISSING:
+            raise KeyError(field)
+        return _copy(value)
+
+
+class LocalDocumentReference:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, transaction=None):
+        with self._store._lock:
+            return LocalDocumentSnapshot(self, _copy(self._store._backend.get(self._collection, self.id)))
+
+    def set(self, data, merge=False):
+        with self._store._lock:
+            self._store._set(self, data, merge)
+
+    def update(self, data):
+        with self._store._lock:
+            self._store._update(self, data)
+
+    def delete(self):
+        with self._store._lock:
+            self._store._backend.delete(self._collection, self.id)
+
+
+class LocalQuery:
+    def __init__(self, store, collection, filters=(), orders=(), limit=None, offset=0, cursor=None):
+        self._store = store
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+
+    def _copy_with(self, **changes):
+        params = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                      offset=self._offset, cursor=self._cursor)
+        params.update(changes)
+        return LocalQuery(self._store, self._collection, **params)
+
+    def where(self, field, op, value):
+        return self._copy_with(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy_with(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy_with(limit=count)
+
+    def offset(self, count):
+        return self._copy_with(offset=count)
+
+    def select(self, field_paths):
+        return self
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy_with(cursor=document_fields_or_snapshot)
+
+    def _value(self, doc_id, data, field):
+        return doc_id if field == DOCUMENT_ID else _get_path(data, field)
+
+    def _run(self):
+        with self._store._lock:
+            rows = self._store._backend.scan(self._collection, self._filters)
+            rows = [
+                (doc_id, data) for doc_id, data in rows
+                if all(_matches(self._value(doc_id, data, f), op, v) for f, op, v in self._filters)
+                and all(self._value(doc_id, data, f) is not _MISSING for f, _ in self._orders)
+            ]
+
+            orders = list(self._orders)
+            if not any(f == DOCUMENT_ID for f, _ in orders):
+                orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+
+            def compare(a, b):
+                for field, direction in orders:
+                    cmp = _compare_values(self._value(a[0], a[1], field), self._value(b[0], b[1], field))
+                    if cmp:
+                        return -cmp if direction == DESCENDING else cmp
+                return 0
+
+            if self._orders:
+                rows.sort(key=cmp_to_key(compare))
+            else:
+                rows.sort(key=lambda row: row[0])
+
+            if self._cursor is not None:
+                if isinstance(self._cursor, LocalDocumentSnapshot):
+                    snapshot = self._cursor
+                    cursor_row = (snapshot.id, snapshot._data or {})
+                    fields = orders
+                else:
+                    cursor_row = None
+                    fields = [(f, d) for f, d in orders if f in self._cursor]
+
+                def after_cursor(row):
+                    for field, direction in fields:
+                        if cursor_row is not None:
+                            target = self._value(cursor_row[0], cursor_row[1], field)
+                        else:
+                            target = self._cursor[field]
+                        cmp = _compare_values(self._value(row[0], row[1], field), target)
+                        if cmp:
+                            return (-cmp if direction == DESCENDING else cmp) > 0
+                    return False
+
+                rows = [row for row in rows if after_cursor(row)]
+
+            rows = rows[self._offset:]
+            if self._limit is not None:
+                rows = rows[:self._limit]
+            return [
+                LocalDocumentSnapshot(LocalDocumentReference(self._store, self._collection, doc_id), _copy(data))
+                for doc_id, data in rows
+            ]
+
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    def get(self, transaction=None):
+        return self._run()
+
+
+class LocalCollectionReference(LocalQuery):
+    def __init__(self, store, name):
+        super().__init__(store, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        return LocalDocumentReference(self._store, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.now(timezone.utc), ref
+
+
+class LocalWriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append(("set", reference, _copy(document_data), merge))
+
+    def update(self, reference, field_updates):
+        self._ops.append(("update", reference, _copy(field_updates), None))
+
+    def delete(self, reference):
+        self._ops.append(("delete", reference, None, None))
+
+    def commit(self):
+        with self._store._lock:
+            # Validate first so a failing update leaves nothing half-written
+            for op, ref, _, _ in self._ops:
+                if op == "update" and self._store._backend.get(ref._collection, ref.id) is None:
+                    raise NotFound(f"No document to update: {ref.path}")
+            for op, ref, data, merge in self._ops:
+                if op == "set":
+                    self._store._set(ref, data, merge)
+                elif op == "update":
+                    self._store._update(ref, data)
+                else:
+                    self._store._backend.delete(ref._collection, ref.id)
+        results = [datetime.now(timezone.utc)] * len(self._ops)
+        self._ops = []
+        return results
+
+
+class LocalStore:
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+    DELETE_FIELD = DELETE_FIELD
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._lock = RLock()
+
+    @classmethod
+    def in_memory(cls):
+        return cls(MemoryBackend())
+
+    @classmethod
+    def sqlite(cls, path=":memory:"):
+        return cls(SQLiteBackend(path))
+
+    def collection(self, name):
+        return LocalCollectionReference(self, name)
+
+    def document(self, path):
+        collection, doc_id = path.split("/", 1)
+        return self.collection(collection).document(doc_id)
+
+    def get_all(self, references, transaction=None):
+        for ref in references:
+            yield ref.get()
+
+    def batch(self):
+        return LocalWriteBatch(self)
+
+    def transaction(self):
+        return LocalWriteBatch(self)
+
+    def run_transaction(self, fn):
+        """Call fn(transaction) and commit its writes, all under the store lock."""
+        with self._lock:
+            transaction = self.transaction()
+            result = fn(transaction)
+            transaction.commit()
+            return result
+
+    @staticmethod
+    def increment(value):
+        return Increment(value)
+
+    def _set(self, ref, data, merge):
+        data = _copy(data)
+        current = _copy(self._backend.get(ref._collection, ref.id) or {})
+        _apply_transforms(data, current if merge else None)
+        if merge:
+            _merge(current, data)
+            data = current
+        self._backend.put(ref._collection, ref.id, data)
+
+    def _update(self, ref, field_updates):
+        current = self._backend.get(ref._collection, ref.id)
+        if current is None:
+            raise NotFound(f"No document to update: {ref.path}")
+        current = _copy(current)
+        for field, value in field_updates.items():
+            if value is DELETE_FIELD:
+                _delete_path(current, field)
+                continue
+            if isinstance(value, Increment):
+                value = _increment(_get_path(current, field), value)
+            _set_path(current, field, _copy(value))
+        self._backend.put(ref._collection, ref.id, current)
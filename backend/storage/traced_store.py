@@ -0,0 +1,116 @@
+"""Datastore wrapper that times reads and writes for the metrics module.
+
+TracedStore wraps either storage backend. Query builders (collection,
+document, where, order_by, ...) return traced objects, and the terminal
+calls (get, stream, get_all, set, update, delete, add, commit) are timed
+and passed to a recorder as (kind, op, seconds, documents). Calls made
+from inside another traced call (e.g. the local get_all reading each
+reference) are not counted twice.
+"""
+import threading
+from time import perf_counter
+
+READ_OPS = {"get", "stream", "get_all"}
+WRITE_OPS = {"set", "update", "delete", "add", "commit", "create"}
+BUILDER_OPS = {
+    "collection", "document", "where", "order_by", "limit", "limit_to_last", "offset",
+    "select", "start_at", "start_after", "end_at", "end_before", "batch",
+}
+
+_state = threading.local()
+
+
+def _depth():
+    return getattr(_state, "depth", 0)
+
+
+class _Traced:
+    def __init__(self, target, recorder):
+        self._target = target
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in BUILDER_OPS:
+            return lambda *args, **kwargs: _Traced(attr(*args, **kwargs), self._recorder)
+        if name in ("stream", "get_all"):
+            return lambda *args, **kwargs: self._iterate(name, attr, args, kwargs)
+        if name in READ_OPS:
+            return lambda *args, **kwargs: self._call("read", name, attr, args, kwargs)
+        if name in WRITE_OPS:
+            return lambda *args, **kwargs: self._call("write", name, attr, args, kwargs)
+        return attr
+
+    def _record(self, kind, op, seconds, documents):
+        _state.nested_seconds = getattr(_state, "nested_seconds", 0.0) + seconds
+        self._recorder(kind, op, seconds, documents)
+
+    def _call(self, kind, op, method, args, kwargs):
+        if _depth():
+            return method(*args, **kwargs)
+        _state.depth = 1
+        started = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _state.depth = 0
+            elapsed = perf_counter() - started
+        if kind == "read":
+            documents = len(result) if isinstance(result, list) else int(bool(getattr(result, "exists", False)))
+        else:
+            # Buffered batch/transaction writes are counted when added, not again on commit
+            documents = 0 if op == "commit" else 1
+        self._record(kind, op, elapsed, documents)
+        return result
+
+    def _iterate(self, op, method, args, kwargs):
+        # Generators are timed per next() so only datastore time is counted
+        if _depth():
+            yield from method(*args, **kwargs)
+            return
+        elapsed = 0.0
+        documents = 0
+        try:
+            _state.depth = 1
+            started = perf_counter()
+            try:
+                iterator = iter(method(*args, **kwargs))
+            finally:
+                _state.depth = 0
+                elapsed += perf_counter() - started
+            while True:
+                _state.depth = 1
+                started = perf_counter()
+                try:
+                    doc = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _state.depth = 0
+                    elapsed += perf_counter() - started
+                documents += 1
+                yield doc
+        finally:
+            self._record("read", op, elapsed, documents)
+
+
+class TracedStore(_Traced):
+    """Traced wrapper for LocalStore / FirestoreStore."""
+
+    def run_transaction(self, fn):
+        """Run fn with a traced transaction; the commit is recorded as one "transaction" write."""
+        if _depth():
+            return self._target.run_transaction(fn)
+
+        outer_nested = getattr(_state, "nested_seconds", 0.0)
+        _state.nested_seconds = 0.0
+        started = perf_counter()
+        try:
+            return self._target.run_transaction(lambda transaction: fn(_Traced(transaction, self._recorder)))
+        finally:
+            elapsed = perf_counter() - started
+            inner = _state.nested_seconds
+            _state.nested_seconds = outer_nested
+            self._record("write", "transaction", max(elapsed - inner, 0.0), 0)
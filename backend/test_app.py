@@ -1,6 +1,18 @@
+import os
+
 import pytest
+
+# Run against the local in-memory store unless a backend is chosen explicitly
+os.environ.setdefault("PROXIMART_DB", "memory")
+
 from app import app as flask_app
 from firebase_config import db
+from utils.geo_index import GeoIndex
+from utils.geo_utils import calculate_distance, distances_within_radius
+from storage.local_store import LocalStore, DESCENDING
+from utils.supplier_catalog import SupplierCatalog
+from utils.item_index import ItemIndex
+from routes.suppliers import filter_suppliers
 
 @pytest.fixture
 def client():
@@ -58,10 +70,215 @@ def test_place_order_missing_fields(client):
     response = client.post("/api/orders/place", json={"vendor_id": "x"})
     assert response.status_code == 400
 
+def test_accept_order_deducts_stock_once(client):
+    client.post("/api/suppliers/add", json={
+        "supplier_id": "accept_supplier",
+        "name": "Accept Supplier",
+        "location": {"lat": 28.6, "lon": 77.2},
+        "items": [{"name": "Onion", "price": 10, "quantity": 10}]
+    })
+    placed = client.post("/api/orders/place", json={
+        "vendor_id": "accept_vendor",
+        "items": [{"name": "onion", "quantity": 4, "supplier_id": "accept_supplier"}]
+    }).get_json()
+    order_id = placed["orders"][0]["order_id"]
+
+    accept = {"order_id": order_id, "supplier_id": "accept_supplier"}
+    assert client.post("/api/orders/accept", json=accept).status_code == 200
+    assert client.post("/api/orders/accept", json=accept).status_code == 400
+
+    supplier = db.collection("suppliers").document("accept_supplier").get().to_dict()
+    assert supplier["items"][0]["quantity"] == 6
+
+    # Accepting credits the vendor once; add_from_order cannot add the items again
+    add = {"vendor_id": "accept_vendor", "order_id": order_id}
+    assert client.post("/api/inventory/add_from_order", json=add).status_code == 400
+    inventory = client.get("/api/inventory/vendor/accept_vendor").get_json()["inventory"]
+    assert [(item["name"], item["quantity"]) for item in inventory] == [("onion", 4)]
+
+def test_vendor_event_stream_and_long_poll(client):
+    client.post("/api/suppliers/add", json={
+        "supplier_id": "events_supplier",
+        "name": "Events Supplier",
+        "location": {"lat": 28.6, "lon": 77.2},
+        "items": [{"name": "Ginger", "price": 80, "quantity": 10}]
+    })
+    start = client.get("/api/events/vendor/events_vendor?mode=poll&timeout=0").get_json()
+    assert start["events"] == []
+
+    placed = client.post("/api/orders/place", json={
+        "vendor_id": "events_vendor",
+        "items": [{"name": "ginger", "quantity": 3, "supplier_id": "events_supplier"}]
+    }).get_json()
+    order_id = placed["orders"][0]["order_id"]
+    client.post("/api/orders/accept", json={"order_id": order_id, "supplier_id": "events_supplier"})
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": "events_vendor", "name": "ginger",
+                                                       "quantity": 1, "threshold": 2})
+
+    # Resuming from the last seen id replays everything published since
+    poll = client.get("/api/events/vendor/events_vendor?mode=poll&timeout=0&last_event_id=0").get_json()
+    types = [event["type"] for event in poll["events"]]
+    assert types == ["order_placed", "order_accepted", "inventory_changed", "inventory_changed", "low_stock"]
+    assert poll["events"][0]["data"]["order_id"] == order_id
+    assert poll["events"][-1]["data"]["items"] == [{"name": "ginger", "quantity": 1, "threshold": 2}]
+
+    response = client.get("/api/events/vendor/events_vendor?max_seconds=0.05",
+                          headers={"Last-Event-ID": str(poll["events"][2]["id"])})
+    assert response.mimetype == "text/event-stream"
+    body = response.get_data(as_text=True)
+    assert body.count("event: ") == 2 and "event: low_stock" in body
+    assert f"id: {poll['last_event_id']}" in body
+
+    # Nothing new: an empty answer, without touching the datastore
+    idle = client.get(f"/api/events/vendor/events_vendor?mode=poll&timeout=0&last_event_id={poll['last_event_id']}")
+    assert idle.get_json()["events"] == []
+    assert client.get("/api/events/vendor/events_vendor?mode=poll&timeout=x").status_code == 400
+
+    # An id from another worker or an earlier run replays everything kept instead of skipping
+    other = client.get("/api/events/vendor/events_vendor?mode=poll&timeout=0&last_event_id=feedbeef-99999").get_json()
+    assert [event["id"] for event in other["events"]] == [event["id"] for event in poll["events"]]
+
+    # Each open stream or poll holds a thread, so only so many are let in at once
+    from routes.events import stream_slots
+    held = 0
+    while stream_slots.acquire(blocking=False):
+        held += 1
+    try:
+        busy = client.get("/api/events/vendor/events_vendor?mode=poll&timeout=0")
+        assert busy.status_code == 503 and busy.headers["Retry-After"]
+    finally:
+        for _ in range(held):
+            stream_slots.release()
+
+def test_datastore_event_bus_reaches_other_processes():
+    from utils.events import DatastoreEventBus
+
+    # Two workers' buses over one datastore
+    store = LocalStore.in_memory()
+    first = DatastoreEventBus(store, poll_seconds=0.01)
+    second = DatastoreEventBus(store, poll_seconds=0.01)
+
+    with second.subscribe("vendor:v1") as subscription:
+        placed = first.publish("vendor:v1", "order_placed", {"order_id": "o1"})
+        first.publish("vendor:v2", "order_placed", {"order_id": "o2"})
+        relayed = subscription.get(timeout=2)
+        assert (relayed.id, relayed.type, relayed.data) == (placed.id, "order_placed", {"order_id": "o1"})
+        # Own events are delivered once, not again when read back
+        own = second.publish("vendor:v1", "low_stock", {"items": []})
+        assert subscription.get(timeout=2).id == own.id
+        assert subscription.get(timeout=0.1) is None
+
+    # A client reconnecting to another worker resumes from the id it saw there
+    accepted = first.publish("vendor:v1", "order_accepted", {"order_id": "o1"})
+    third = DatastoreEventBus(store, poll_seconds=0.01)
+    with third.subscribe("vendor:v1", last_event_id=placed.id) as subscription:
+        assert [event.id for event in subscription.drain(timeout=2)] == [own.id, accepted.id]
+
+    old = DatastoreEventBus(store, retention_seconds=0)
+    old._prune()
+    assert list(store.collection("events").stream()) == []
+
+def test_place_order_multi_supplier_basket(client):
+    for supplier_id in ("basket_a", "basket_b"):
+        client.post("/api/suppliers/add", json={
+            "supplier_id": supplier_id,
+            "name": supplier_id,
+            "location": {"lat": 10.0, "lon": 10.0},
+            "items": [{"name": "Rice", "price": 50, "quantity": 5}]
+        })
+    items = [{"name": "rice", "quantity": 2, "supplier_id": "basket_a"},
+             {"name": "rice", "quantity": 3, "supplier_id": "basket_b"}]
+
+    response = client.post("/api/orders/place", json={"vendor_id": "basket_vendor", "items": items})
+    assert response.status_code == 200
+    orders = response.get_json()["orders"]
+    assert [(o["supplier_id"], o["total_cost"]) for o in orders] == [("basket_a", 100.0), ("basket_b", 150.0)]
+
+    # A failing supplier leaves no order behind for the others
+    items.append({"name": "rice", "quantity": 1, "supplier_id": "basket_missing"})
+    response = client.post("/api/orders/place", json={"vendor_id": "basket_vendor", "items": items})
+    assert response.status_code == 404
+    history = client.get("/api/orders/history?vendor_id=basket_vendor").get_json()["orders"]
+    assert len(history) == 2
+
+def test_place_order_write_behind_group_commits():
+    from app import create_app
+    from utils.metrics import write_behind_batch_writes
+    from utils.write_behind import QueueFull, WriteBehindQueue, order_writes
+
+    store = LocalStore.in_memory()
+    writes = WriteBehindQueue(store, "test", batch_size=4, linger=0.05)
+    for i in range(6):
+        writes.submit([(store.collection("orders").document(f"wb_{i}_{j}"), {"n": i}, False) for j in range(2)])
+    assert writes.flush(timeout=5)
+    assert len(list(store.collection("orders").where("n", ">=", 0).stream())) == 12
+    assert write_behind_batch_writes.count(("test",)) < 6  # fewer commits than requests
+    writes.close()
+    with pytest.raises(QueueFull):
+        writes.submit([(store.collection("orders").document("late"), {}, False)])
+
+    client = create_app({"TESTING": True, "WRITE_BEHIND": True}).test_client()
+    client.post("/api/suppliers/add", json={"supplier_id": "wb_supplier", "name": "WB", "location": {"lat": 1.0, "lon": 1.0},
+                                            "items": [{"name": "Rice", "price": 10, "quantity": 5}]})
+    response = client.post("/api/orders/place", json={"vendor_id": "wb_vendor",
+                                                      "items": [{"name": "rice", "quantity": 2, "supplier_id": "wb_supplier"}]})
+    assert response.status_code == 202
+    order_id = response.get_json()["orders"][0]["order_id"]
+    assert order_writes.flush(timeout=5)
+    assert db.collection("orders").document(order_id).get().to_dict()["total_cost"] == 20.0
+
+def test_order_analytics_rollups_and_backfill(client):
+    from datetime import datetime
+    from backfill_rollups import backfill
+    from utils.order_rollups import ROLLUP_COLLECTION
+
+    client.post("/api/suppliers/add", json={"supplier_id": "rollup_supplier", "name": "R", "location": {"lat": 2.0, "lon": 2.0},
+                                            "items": [{"name": "Rice", "price": 10, "quantity": 50},
+                                                      {"name": "Dal", "price": 30, "quantity": 50}]})
+    for items in ([{"name": "rice", "quantity": 2}], [{"name": "rice", "quantity": 1}, {"name": "dal", "quantity": 3}]):
+        placed = client.post("/api/orders/place", json={"vendor_id": "rollup_vendor",
+                                                        "items": [{**item, "supplier_id": "rollup_supplier"} for item in items]})
+    order_id = placed.get_json()["orders"][0]["order_id"]
+    client.post("/api/orders/accept", json={"order_id": order_id, "supplier_id": "rollup_supplier"})
+
+    today = datetime.utcnow().date().isoformat()
+    data = client.get(f"/api/orders/analytics?vendor_id=rollup_vendor&from={today}&to={today}").get_json()
+    assert [b["bucket"] for b in data["buckets"]] == [today]
+    assert data["totals"]["placed"] == {"count": 2, "quantity": 6, "total_cost": 120.0}
+    assert data["totals"]["accepted"] == {"count": 1, "quantity": 4, "total_cost": 100.0}
+    assert data["totals"]["items"]["dal"]["placed"] == {"count": 1, "quantity": 3, "total_cost": 90.0}
+    weekly = client.get("/api/orders/analytics?supplier_id=rollup_supplier&period=week&include_items=false").get_json()
+    assert weekly["totals"] == {"placed": {"count": 2, "quantity": 6, "total_cost": 120.0},
+                                "accepted": {"count": 1, "quantity": 4, "total_cost": 100.0}}
+
+    # Rebuilding from the orders gives the same numbers and drops rollups without orders
+    db.collection(ROLLUP_COLLECTION).document("vendor:gone:day:2020-01-01").set({"placed": {"count": 1}})
+    assert backfill(db, chunk_size=3)["deleted"] == 1
+    assert client.get(f"/api/orders/analytics?vendor_id=rollup_vendor&from={today}&to={today}").get_json()["totals"] == data["totals"]
+
+    assert client.get("/api/orders/analytics").status_code == 400
+    assert client.get("/api/orders/analytics?vendor_id=v&from=2024-01-01&to=2026-01-01").status_code == 400
+
 def test_order_history_missing_param(client):
     response = client.get("/api/orders/history")
     assert response.status_code == 400
 
+def test_order_history_cursor_and_range(client):
+    for day in range(1, 6):
+        db.collection("orders").document(f"history_{day}").set({
+            "vendor_id": "history_vendor",
+            "timestamp": f"2025-01-0{day}T09:30:00",
+            "status": "pending"
+        })
+
+    first = client.get("/api/orders/history?vendor_id=history_vendor&limit=2").get_json()
+    assert [o["order_id"] for o in first["orders"]] == ["history_5", "history_4"]
+    second = client.get(f"/api/orders/history?vendor_id=history_vendor&limit=2&cursor={first['next_cursor']}").get_json()
+    assert [o["order_id"] for o in second["orders"]] == ["history_3", "history_2"]
+
+    ranged = client.get("/api/orders/history?vendor_id=history_vendor&from=2025-01-02&to=2025-01-03").get_json()
+    assert [o["order_id"] for o in ranged["orders"]] == ["history_3", "history_2"]
+
 # ---------- INVENTORY ROUTES TESTS ----------
 
 def test_inventory_root(client):
@@ -83,6 +300,200 @@ def test_add_inventory_missing_fields(client):
     response = client.post("/api/inventory/add", json={"vendor_id": "x"})
     assert response.status_code == 400
 
+def test_bulk_import_inventory_csv(client):
+    client.post("/api/inventory/add", json={"vendor_id": "bulk_vendor", "name": "Onion", "price": 20, "quantity": 5})
+    body = "name,price,quantity,threshold\nonion,20,5,\ntomato,15,40,10\nrice,cheap,1,\ntomato,15,1,\n"
+
+    response = client.post("/api/inventory/bulk_import?vendor_id=bulk_vendor", data=body, content_type="text/csv")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["added"], data["duplicate"], data["invalid"]) == (1, 2, 1)
+    assert [r["status"] for r in data["results"]] == ["duplicate", "added", "invalid", "duplicate"]
+
+def test_stock_alert_view_tracks_updates(client):
+    vendor = "low_stock_vendor"
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Salt", "price": 10, "quantity": 2, "threshold": 5})
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Sugar", "price": 40, "quantity": 50, "threshold": 5})
+
+    alerts = client.get(f"/api/inventory/stock_alert/{vendor}").get_json()["low_stock_items"]
+    assert [item["name"] for item in alerts] == ["salt"]
+    assert alerts[0]["since"]
+
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "salt", "quantity": 20})
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "sugar", "quantity": 1})
+    alerts = client.get(f"/api/inventory/stock_alert/{vendor}").get_json()["low_stock_items"]
+    assert [item["name"] for item in alerts] == ["sugar"]
+
+    client.delete("/api/inventory/delete_by_item", json={"vendor_id": vendor, "name": "sugar"})
+    assert client.get(f"/api/inventory/stock_alert/{vendor}").get_json()["low_stock_items"] == []
+
+def test_vendor_inventory_conditional_get(client):
+    from utils.vendor_inventory import inventory_ref
+
+    vendor = "etag_vendor"
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Tea", "price": 5, "quantity": 10})
+
+    first = client.get(f"/api/inventory/vendor/{vendor}")
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    # Written this second: a second-resolution Last-Modified could not tell it from the next write
+    assert "Last-Modified" not in first.headers
+
+    client.application.config["TIMING_HEADERS"] = True
+    try:
+        cached = client.get(f"/api/inventory/vendor/{vendor}", headers={"If-None-Match": first.headers["ETag"]})
+    finally:
+        client.application.config["TIMING_HEADERS"] = False
+    assert cached.status_code == 304 and cached.data == b""
+    # The version is known from the shared table: nothing is read
+    assert 'db-read;dur=0.00;desc="0 calls' in cached.headers["Server-Timing"]
+
+    # Other query strings are different representations
+    assert client.get(f"/api/inventory/vendor/{vendor}?x=1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+    # A write made by any process changes the stored version
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "tea", "quantity": 3})
+    changed = client.get(f"/api/inventory/vendor/{vendor}", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.get_json()["inventory"][0]["quantity"] == 3
+    alerts = client.get(f"/api/inventory/stock_alert/{vendor}")
+    assert client.get(f"/api/inventory/stock_alert/{vendor}",
+                      headers={"If-None-Match": alerts.headers["ETag"]}).status_code == 304
+
+    # After a restart (or an evicted entry) the stored version gives the same ETag back
+    from utils.conditional import versions
+    etag = client.get(f"/api/inventory/vendor/{vendor}").headers["ETag"]
+    versions.clear()
+    assert client.get(f"/api/inventory/vendor/{vendor}", headers={"If-None-Match": etag}).status_code == 304
+
+    inventory_ref(vendor).set({"updated_at": "2025-01-01T00:00:00"}, merge=True)
+    versions.clear()  # written behind the routes' back, as by another host
+    dated = client.get(f"/api/inventory/vendor/{vendor}")
+    assert dated.headers["Last-Modified"] == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert client.get(f"/api/inventory/vendor/{vendor}",
+                      headers={"If-Modified-Since": dated.headers["Last-Modified"]}).status_code == 304
+
+def test_shared_versions_across_processes():
+    import multiprocessing
+    from utils.conditional import SharedVersions
+
+    table = SharedVersions(slots=8)
+    generation = table.generation("inventory:v1")
+    table.set("inventory:v1", "abc", 1700000000, generation)
+    assert table.get("inventory:v1") == ("abc", 1700000000)
+    assert table.get("inventory:v2") is None
+
+    # A forked worker's write is seen here without any read
+    child = multiprocessing.get_context("fork").Process(target=table.forget, args=("inventory:v1",))
+    child.start()
+    child.join()
+    assert table.get("inventory:v1") is None
+    # A version read before that write is not recorded
+    table.set("inventory:v1", "abc", None, generation)
+    assert table.get("inventory:v1") is None
+
+def test_catalog_and_faq_etags_are_stable(client):
+    from utils.conditional import versions
+
+    faqs = client.get("/api/help/faqs").headers["ETag"]
+    suppliers = client.get("/api/suppliers/all").headers["ETag"]
+    versions.clear()  # as in a fresh worker
+    assert client.get("/api/help/faqs", headers={"If-None-Match": faqs}).status_code == 304
+    assert client.get("/api/suppliers/all", headers={"If-None-Match": suppliers}).status_code == 304
+
+    # Another process adding a supplier changes the stored version: the listing reloads with it
+    from utils.supplier_catalog import SupplierCatalog
+    supplier = {"name": "Elsewhere", "location": {"lat": 1.0, "lon": 1.0}, "items": [{"name": "rice", "price": 5, "quantity": 1}]}
+    db.collection("suppliers").document("stable_etag_supplier").set(supplier)
+    SupplierCatalog(db).put("stable_etag_supplier", supplier)
+    changed = client.get("/api/suppliers/all?search=elsewhere", headers={"If-None-Match": suppliers})
+    assert changed.status_code == 200 and [s["id"] for s in changed.get_json()["suppliers"]] == ["stable_etag_supplier"]
+
+def test_migrate_inventory_to_vendor_documents(client):
+    from migrate_inventory import migrate
+
+    vendor = "migrate_vendor"
+    db.collection("inventory").document("old_item").set(
+        {"vendor_id": vendor, "name": "Rice", "price": 50.0, "quantity": 2, "threshold": 5})
+    db.collection("inventory").document(vendor).set(
+        {"items": [{"name": "rice", "price": 1.0, "quantity": 99, "threshold": 0},
+                   {"name": "dal", "price": 80.0, "quantity": 10, "threshold": 0}]})
+
+    assert migrate(db, dry_run=True)["items"] >= 2
+    assert client.get(f"/api/inventory/vendor/{vendor}").get_json()["inventory"] == []
+
+    assert migrate(db)["items"] >= 2
+    items = client.get(f"/api/inventory/vendor/{vendor}").get_json()["inventory"]
+    assert [(item["name"], item["quantity"]) for item in items] == [("dal", 10), ("rice", 2)]
+    assert items[1]["id"] == "old_item"
+    assert [item["name"] for item in client.get(f"/api/inventory/stock_alert/{vendor}").get_json()["low_stock_items"]] == ["rice"]
+
+    # Re-running adds nothing; routes keep working against the unified document
+    assert migrate(db, delete_old=True)["skipped"] >= 2
+    assert not db.collection("inventory").document(vendor).get().exists
+    assert client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "dal", "quantity": 1}).status_code == 200
+    assert client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "dal", "quantity": -1}).status_code == 400
+    assert client.delete("/api/inventory/delete_by_item", json={"vendor_id": vendor, "name": "rice"}).status_code == 200
+    doc = db.collection("vendor_inventory").document(vendor).get().to_dict()
+    assert list(doc["items"]) == ["dal"] and doc["items"]["dal"]["quantity"] == 1
+
+def test_reorder_suggestions_from_usage(client):
+    from datetime import datetime, timedelta
+    from utils.reorder import track_usage, usage_rate
+
+    # 10 units a day for 10 days: the decayed rate recovers the true rate
+    start = datetime(2025, 1, 1)
+    item = {"quantity": 200}
+    for day in range(1, 11):
+        item = track_usage(item, {**item, "quantity": item["quantity"] - 10}, start + timedelta(days=day))
+    assert 10 <= usage_rate(item["usage"], start + timedelta(days=10)) <= 11.5
+    assert usage_rate(item["usage"], start + timedelta(days=60)) < 1
+    # Restocking alone is not consumption
+    restocked = track_usage({"quantity": 5}, {"quantity": 50}, start)
+    assert usage_rate(restocked["usage"], start + timedelta(days=1)) == 0
+
+    vendor = "reorder_vendor"
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Ghee", "price": 500, "quantity": 40, "threshold": 2})
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Salt", "price": 20, "quantity": 50, "threshold": 2})
+    client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Jeera", "price": 90, "quantity": 1, "threshold": 3})
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "ghee", "quantity": 10})
+    client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "salt", "quantity": 49})
+
+    suggestions = client.get(f"/api/inventory/reorder/{vendor}").get_json()["suggestions"]
+    assert [s["name"] for s in suggestions] == ["ghee", "jeera"]
+    assert 30 <= suggestions[0]["daily_usage"] <= 32 and suggestions[0]["days_left"] < 1
+    assert suggestions[1]["days_left"] is None and suggestions[1]["reorder_quantity"] == 2
+    assert "usage" not in client.get(f"/api/inventory/stock_alert/{vendor}").get_json()["low_stock_items"][0]
+    assert all("usage" not in item for item in client.get(f"/api/inventory/vendor/{vendor}").get_json()["inventory"])
+
+    client.post("/api/suppliers/add", json={"supplier_id": "reorder_supplier", "name": "Ghee House", "location": {"lat": -30.0, "lon": 20.0},
+                                            "items": [{"name": "ghee", "price": 450, "quantity": 1000}]})
+    plan = client.get(f"/api/inventory/reorder/{vendor}?lat=-30.0&lon=20.0").get_json()["plan"]
+    assert plan["items"] == [{"name": "ghee", "quantity": suggestions[0]["reorder_quantity"], "supplier_id": "reorder_supplier"}]
+    assert plan["unavailable"] == ["jeera"]
+
+def test_reorder_job_streams_every_vendor(client):
+    from reorder_job import iter_vendor_inventories, run
+
+    vendors = [f"reorder_job_{i}" for i in range(5)]
+    for vendor in vendors:
+        client.post("/api/inventory/add", json={"vendor_id": vendor, "name": "Atta", "price": 40, "quantity": 30, "threshold": 2})
+        client.patch("/api/inventory/update_by_item", json={"vendor_id": vendor, "name": "atta", "quantity": 3})
+    assert client.get(f"/api/inventory/reorder/{vendors[0]}/latest").status_code == 404
+
+    # Two documents per query, so every chunk boundary is crossed
+    streamed = [vendor_id for vendor_id, _ in iter_vendor_inventories(db, chunk_size=2)]
+    assert streamed == sorted(streamed) and set(vendors) <= set(streamed)
+
+    counts = run(db, chunk_size=2, batch_size=3)
+    assert counts["vendors"] == len(streamed) and counts["with_suggestions"] >= len(vendors)
+    for vendor in vendors:
+        stored = client.get(f"/api/inventory/reorder/{vendor}/latest").get_json()
+        assert stored["vendor_id"] == vendor and stored["generated_at"]
+        assert stored["suggestions"] == client.get(f"/api/inventory/reorder/{vendor}").get_json()["suggestions"]
+
+    assert run(db, dry_run=True)["vendors"] == counts["vendors"]
+
 def test_get_vendor_inventory(client):
     response = client.get("/api/inventory/vendor/test_vendor")
     assert response.status_code == 200
@@ -104,6 +515,287 @@ def test_delete_inventory_fake(client):
     response = client.delete("/api/inventory/delete/some_fake_id")
     assert response.status_code in (200, 404)
 
+def test_get_nearby_suppliers_invalid_radius(client):
+    response = client.get("/api/suppliers/nearby?lat=28.6&lon=77.2&radius_km=far")
+    assert response.status_code == 400
+
+def test_get_nearby_suppliers_within_radius(client):
+    for supplier_id, lat in [("nearby_a", 28.6140), ("nearby_b", 28.7000), ("nearby_far", 30.0)]:
+        client.post("/api/suppliers/add", json={
+            "supplier_id": supplier_id,
+            "name": supplier_id,
+            "location": {"lat": lat, "lon": 77.2090},
+            "items": [{"name": "onion", "price": 20, "quantity": 50}]
+        })
+
+    response = client.get("/api/suppliers/nearby?lat=28.6139&lon=77.2090&radius_km=15")
+    assert response.status_code == 200
+    ids = [s["id"] for s in response.get_json()["suppliers"] if s["id"].startswith("nearby_")]
+    assert ids == ["nearby_a", "nearby_b"]
+
+def test_get_all_suppliers_cursor_pages(client):
+    for i in range(5):
+        client.post("/api/suppliers/add", json={
+            "supplier_id": f"cursor_{i}",
+            "name": f"Cursor Supplier {i}",
+            "location": {"lat": 28.6, "lon": 77.2},
+            "items": [{"name": "rice", "price": 30, "quantity": 10}]
+        })
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(f"/api/suppliers/all?search=cursor supplier&limit=2&cursor={cursor}")
+        assert response.status_code == 200
+        data = response.get_json()
+        assert "total" not in data
+        seen += [s["id"] for s in data["suppliers"]]
+        cursor = data["next_cursor"]
+
+    assert seen == [f"cursor_{i}" for i in range(5)]
+
+def test_get_all_suppliers_invalid_cursor(client):
+    response = client.get("/api/suppliers/all?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+# ---------- GEO INDEX ----------
+
+def test_geo_index_radius_and_nearest():
+    index = GeoIndex()
+    index.add("near", 28.6140, 77.2091)
+    index.add("mid", 28.7000, 77.2090)
+    index.add("far", 19.0760, 72.8777)
+
+    assert [key for key, _ in index.within_radius(28.6139, 77.2090, 15)] == ["near", "mid"]
+    assert [key for key, _ in index.nearest(28.6139, 77.2090, 3)] == ["near", "mid", "far"]
+
+    index.remove("near")
+    assert [key for key, _ in index.nearest(28.6139, 77.2090, 1)] == ["mid"]
+
+def test_geo_index_keeps_points_at_the_radius_edge():
+    from math import cos, degrees, radians
+    from utils.geo_utils import EARTH_RADIUS_KM
+
+    # Due north/south/east/west, just inside the radius, from origins all over the grid
+    for step in range(200):
+        lat, lon = -60 + step * 0.6016, -170 + step * 1.7
+        for radius in (1, 10, 25):
+            dlat = degrees(radius * 0.9999 / EARTH_RADIUS_KM)
+            index = GeoIndex()
+            index.add("n", lat + dlat, lon)
+            index.add("s", lat - dlat, lon)
+            for key, east in (("e", 1), ("w", -1)):
+                dlon = dlat / cos(radians(lat))
+                while calculate_distance(lat, lon, lat, lon + east * dlon) > radius:
+                    dlon *= 0.99999
+                index.add(key, lat, lon + east * dlon)
+            assert sorted(key for key, _ in index.within_radius(lat, lon, radius)) == ["e", "n", "s", "w"]
+
+def test_batch_distances_match_scalar():
+    lats = [28.6140, 28.7000, 19.0760]
+    lons = [77.2091, 77.2090, 72.8777]
+    distances, mask = distances_within_radius(28.6139, 77.2090, lats, lons, 15)
+
+    assert mask.tolist() == [True, True, False]
+    for i in range(2):
+        assert distances[i] == pytest.approx(calculate_distance(28.6139, 77.2090, lats[i], lons[i]))
+
+# ---------- SUPPLIER CATALOG CACHE ----------
+
+def test_supplier_catalog_ttl_and_write_through():
+    store = LocalStore.in_memory()
+    now = [0.0]
+    catalog = SupplierCatalog(store, ttl=10, max_size=100, clock=lambda: now[0])
+    suppliers = store.collection("suppliers")
+
+    suppliers.document("s1").set({"name": "A"})
+    assert [s["id"] for s in catalog.all()] == ["s1"]
+
+    # Written behind the cache's back: not visible until the TTL runs out
+    suppliers.document("s2").set({"name": "B"})
+    assert [s["id"] for s in catalog.all()] == ["s1"]
+
+    catalog.put("s0", {"name": "Z"})
+    assert [s["id"] for s in catalog.all()] == ["s0", "s1"]
+
+    now[0] = 11
+    assert [s["id"] for s in catalog.all()] == ["s1", "s2"]
+    assert catalog.stats()["hits"] == 2
+    assert catalog.stats()["misses"] == 2
+
+
+def test_supplier_catalog_geo_index_follows_reloads():
+    store = LocalStore.in_memory()
+    now = [0.0]
+    catalog = SupplierCatalog(store, ttl=10, max_size=100, clock=lambda: now[0])
+    suppliers = store.collection("suppliers")
+    near = {"lat": 28.6, "lon": 77.2}
+
+    suppliers.document("s1").set({"name": "A", "location": near})
+    assert catalog.geo_index() is None
+    catalog.records()
+    assert [key for key, _ in catalog.geo_index().within_radius(28.6, 77.2, 5)] == ["s1"]
+
+    # Added through this process: indexed at once; through another one: after the TTL
+    catalog.put("s2", {"name": "B", "location": near})
+    suppliers.document("s3").set({"name": "C", "location": near})
+    assert sorted(key for key, _ in catalog.geo_index().within_radius(28.6, 77.2, 5)) == ["s1", "s2"]
+    now[0] = 11
+    catalog.records()
+    assert sorted(key for key, _ in catalog.geo_index().within_radius(28.6, 77.2, 5)) == ["s1", "s3"]
+
+def test_supplier_record_round_trip_and_fast_json():
+    from utils.supplier_records import SupplierRecord
+    from utils.fast_json import json_response
+
+    data = {"id": "r1", "name": "R", "location": {"lat": 1.5, "lon": 2.5}, "rating": 4.0, "verified": True,
+            "items": [{"name": "Onion", "price": 10.0, "quantity": 3, "unit": "kg"}, {"name": "salt", "price": 2.0}]}
+    record = SupplierRecord.from_dict(data)
+    assert record.to_dict() == data
+    assert record.get("location") == {"lat": 1.5, "lon": 2.5}
+    assert record["items"][0]["unit"] == "kg"
+    assert record.get("missing", 7) == 7
+
+    narrowed = record.replace(items=record.items[:1], distance_km=1.2)
+    assert narrowed.to_dict()["items"] == data["items"][:1]
+    assert narrowed["distance_km"] == 1.2
+    assert record.to_dict() == data
+
+    with flask_app.app_context():
+        assert json_response({"suppliers": [data]}).get_data() == flask_app.json.response({"suppliers": [data]}).get_data()
+        named = {**data, "name": "राम किराना \u2028 \x7f 🧅", "note": "tab\t\"quoted\""}
+        assert json_response(named).get_data() == flask_app.json.response(named).get_data()
+        assert json_response({"rating": float("nan")}).get_json() == {"rating": None}
+
+# ---------- ITEM INDEX ----------
+
+def test_filter_suppliers_with_item_index_matches_scan():
+    def suppliers():
+        return [
+            {"id": "a", "name": "A", "items": [{"name": "Onion", "price": 20, "quantity": 5},
+                                               {"name": "rice", "price": 40, "quantity": 50}]},
+            {"id": "b", "name": "B", "items": [{"name": "onion", "price": 15, "quantity": 30}]},
+            {"id": "c", "name": "C", "items": [{"name": "oil", "price": 90, "quantity": 10}]},
+        ]
+
+    for args in [
+        (["onion", "rice"], 0, 0, 0, float("inf"), "", True),
+        (["onion", "rice"], 0, 0, 0, float("inf"), "", False),
+        (None, 0, 10, 0, 50, "", True),
+        (["onion"], 0, 0, 18, float("inf"), "", True),
+    ]:
+        records = suppliers()
+        indexed = filter_suppliers([dict(s) for s in records], *args, item_index=ItemIndex(records))
+        assert indexed == filter_suppliers(suppliers(), *args)
+
+# ---------- BASKET PLANNER ----------
+
+def test_plan_basket_prefers_fewer_nearby_suppliers(client):
+    def add(supplier_id, lat, items):
+        client.post("/api/suppliers/add", json={"supplier_id": supplier_id, "name": supplier_id, "location": {"lat": lat, "lon": 50.0},
+                                                "items": [{"name": n, "price": p, "quantity": q} for n, p, q in items]})
+
+    add("plan_cheap_far", 40.05, [("jaggery", 10, 100), ("tamarind", 10, 100)])          # ~5.6 km
+    add("plan_near", 40.001, [("jaggery", 12, 100), ("tamarind", 30, 100)])
+    add("plan_near_tamarind", 40.002, [("tamarind", 11, 100), ("jaggery", 11, 1)])
+    body = {"lat": 40.0, "lon": 50.0, "items": [{"name": "Jaggery", "quantity": 5}, {"name": "tamarind", "quantity": 5},
+                                                  {"name": "saffron", "quantity": 1}]}
+
+    plan = client.post("/api/suppliers/plan_basket", json={**body, "delivery_fee": 5, "cost_per_km": 10}).get_json()
+    assert [s["supplier_id"] for s in plan["suppliers"]] == ["plan_near", "plan_near_tamarind"]
+    assert plan["items"] == [{"name": "jaggery", "quantity": 5, "supplier_id": "plan_near"},
+                             {"name": "tamarind", "quantity": 5, "supplier_id": "plan_near_tamarind"}]
+    assert plan["unavailable"] == ["saffron"] and plan["exact"]
+
+    # Free delivery: the cheapest supplier wins despite the distance; one supplier only
+    plan = client.post("/api/suppliers/plan_basket", json={**body, "delivery_fee": 0, "cost_per_km": 0}).get_json()
+    assert {s["supplier_id"] for s in plan["suppliers"]} == {"plan_cheap_far"}
+    assert plan["total_cost"] == 100.0
+    plan = client.post("/api/suppliers/plan_basket", json={**body, "max_suppliers": 1}).get_json()
+    assert len(plan["suppliers"]) == 1 and len(plan["items"]) == 2
+
+    assert client.post("/api/suppliers/plan_basket", json={"lat": 40.0, "lon": 50.0, "items": []}).status_code == 400
+    assert client.post("/api/suppliers/plan_basket", json={**body, "max_suppliers": 0}).status_code == 400
+
+
+# ---------- SEARCH INDEX ----------
+
+def test_search_index_ranks_typos_prefixes_and_synonyms():
+    from utils.search_index import SearchIndex
+
+    index = SearchIndex([
+        {"id": "s1", "name": "Sharma Traders", "items": [{"name": "tomato"}, {"name": "onion"}]},
+        {"id": "s2", "name": "Tomato King", "items": [{"name": "tomato"}]},
+        {"id": "s3", "name": "Gupta Stores", "items": [{"name": "Tamatar"}]},
+    ])
+    assert index.search("sharmaa").keys() == {"s1"}
+    assert set(index.search("tamato")) == {"s1", "s2", "s3"}
+    ranked = index.search("tomato")
+    assert max(ranked, key=ranked.get) == "s2"
+    assert set(index.search("pyaz")) == {"s1"}
+    assert set(index.search("gup sto")) == {"s3"}
+    assert index.search("sharma tomato").keys() == {"s1"}
+    assert index.search("xyz") == {}
+    # Plain substring search, across word boundaries and inside numeric ids
+    assert index.substring_matches("rma tra") == {"s1"}
+    assert index.substring_matches("to") == {"s2", "s3"}
+    assert index.substring_matches("tamatar") == set()
+    index.add_supplier({"id": "98765", "name": "Hari Om", "items": []})
+    assert index.substring_matches("876") == {"98765"}
+    assert index.substring_matches(" - ") is None
+
+    index.add_supplier({"id": "s1", "name": "Verma Traders", "items": []})
+    assert index.search("sharma") == {}
+    assert index.substring_matches("rma tra") == {"s1"} and index.substring_matches("sharma") == set()
+    index.remove_supplier("s2")
+    assert set(index.search("tomato")) == {"s3"}
+
+
+def test_get_all_suppliers_fuzzy_search(client):
+    client.get("/api/suppliers/all")  # cache the catalog listing
+    for supplier_id, name, item in [("fuzzy_1", "Baliram Vegetables", "tomato"), ("fuzzy_2", "Tomatowala Baliram", "onion")]:
+        client.post("/api/suppliers/add", json={"supplier_id": supplier_id, "name": name, "location": {"lat": 28.6, "lon": 77.2},
+                                                "items": [{"name": item, "price": 20, "quantity": 10}]})
+
+    data = client.get("/api/suppliers/all?search=balirm").get_json()
+    assert [s["id"] for s in data["suppliers"]] == ["fuzzy_1", "fuzzy_2"]
+    assert [s["id"] for s in client.get("/api/suppliers/all?search=baliram tamatar").get_json()["suppliers"]] == ["fuzzy_1"]
+
+
+def test_search_keeps_substring_matches_with_cached_catalog(client):
+    from utils.supplier_catalog import supplier_catalog
+
+    client.post("/api/suppliers/add", json={"supplier_id": "freshmart42", "name": "Fresh Mart", "location": {"lat": 28.6, "lon": 77.2},
+                                            "items": [{"name": "rice", "price": 50, "quantity": 10}]})
+    results = []
+    for cached in (False, True):
+        if not cached:
+            supplier_catalog.invalidate()
+        else:
+            client.get("/api/suppliers/all")
+        results.append([[s["id"] for s in client.get(f"/api/suppliers/all?search={term}").get_json()["suppliers"]]
+                        for term in ("mart", "42", "eshma")])
+    # Ids and in-word substrings match whether or not the catalog is cached
+    assert results[0] == results[1] == [["freshmart42"]] * 3
+
+
+# ---------- LOCAL STORE ----------
+
+@pytest.mark.parametrize("store", [LocalStore.in_memory(), LocalStore.sqlite()])
+def test_local_store_queries(store):
+    orders = store.collection("orders")
+    for i in range(5):
+        orders.document(f"o{i}").set({"vendor_id": "v1" if i % 2 == 0 else "v2", "total_cost": i})
+    orders.document("o0").update({"status": "accepted"})
+
+    docs = list(orders.where("vendor_id", "==", "v1").order_by("total_cost", direction=DESCENDING).limit(2).stream())
+    assert [doc.id for doc in docs] == ["o4", "o2"]
+    assert orders.document("o0").get().to_dict()["status"] == "accepted"
+
+    orders.document("o4").delete()
+    assert [doc.id for doc in orders.where("vendor_id", "==", "v1").stream()] == ["o0", "o2"]
+    assert not orders.document("missing").get().exists
+
 # ---------- HELP/FAQ ROUTE ----------
 
 def test_faqs(client):
@@ -117,3 +809,118 @@ def test_invalid_route(client):
     response = client.get("/non-existent-route")
     assert response.status_code == 404
     assert "error" in response.get_json()
+
+
+def test_synthetic_marketplace_is_deterministic():
+    from storage.local_store import LocalStore
+    from utils.synthetic_data import MarketplaceGenerator
+
+    generator = MarketplaceGenerator(seed=7, suppliers=20, vendors=3, orders_per_vendor=4)
+    assert list(generator.iter_suppliers()) == list(MarketplaceGenerator(seed=7, suppliers=20).iter_suppliers())
+    assert list(generator.iter_orders()) == list(MarketplaceGenerator(seed=7, suppliers=20, vendors=3, orders_per_vendor=4).iter_orders())
+
+    store = LocalStore.in_memory()
+    assert generator.populate(store, batch_size=7) == {"suppliers": 20, "vendor_inventory": 3, "orders": 12}
+    assert len(list(store.collection("orders").where("vendor_id", "==", "vendor_000001").stream())) == 4
+
+
+def test_metrics_endpoint_and_timing_headers(client):
+    client.application.config["TIMING_HEADERS"] = True
+    try:
+        client.post("/api/inventory/add", json={"vendor_id": "metrics_vendor", "name": "Oil", "price": 90, "quantity": 1})
+        response = client.get("/api/inventory/vendor/metrics_vendor")
+    finally:
+        client.application.config["TIMING_HEADERS"] = False
+    assert 'db-read;dur=' in response.headers["Server-Timing"]
+    assert '1 docs' in response.headers["Server-Timing"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    text = response.get_data(as_text=True)
+    assert 'proximart_http_requests_total{route="/api/inventory/vendor/<vendor_id>",method="GET",status="200"}' in text
+    assert 'proximart_request_documents_read_count{route="/api/inventory/vendor/<vendor_id>"}' in text
+    assert 'proximart_datastore_operation_seconds_count{op="stream"}' in text
+
+
+def test_lazy_store_and_app_factory():
+    from app import create_app
+    from firebase_config import LazyStore
+
+    calls = []
+    lazy = LazyStore(lambda: calls.append(1) or LocalStore.in_memory())
+    assert not lazy.created and calls == []
+    lazy.collection("x").document("a").set({"n": 1})
+    assert lazy.collection("x").document("a").get().to_dict() == {"n": 1}
+    assert calls == [1]
+
+    lazy.reset()
+    assert not lazy.created
+    assert not lazy.collection("x").document("a").get().exists
+    assert calls == [1, 1]
+
+    other = create_app({"TESTING": True})
+    assert other.config["TESTING"]
+    assert other.test_client().get("/api/help/faqs").status_code == 200
+
+
+def test_admission_control_limits_catalog_scans():
+    from app import create_app
+    from utils.admission import AdmissionController, request_cost
+
+    # Full scans cost more than cursor pages; revalidations cost nothing
+    assert request_cost({}) > request_cost({"cursor": ""})
+    assert request_cost({"limit": "100000"}) == request_cost({"limit": "100"})
+    assert request_cost({}, status=304) == 0
+
+    now = [0.0]
+    policy = {"rate": 100.0, "burst": 100.0, "concurrency": 1, "max_waiting": 0, "wait_seconds": 0,
+              "client_rate": 1.0, "client_burst": 10.0, "client_concurrency": 1}
+    controller = AdmissionController({"catalog": policy}, {"scan": "catalog"}, clock=lambda: now[0])
+    assert controller.admit("orders.place_order", "a") is None  # unclassified routes are never limited
+    assert controller.admit("scan", "a") is None
+    assert controller.admit("scan", "a")[:2] == (429, 1)  # client already has a request running
+    assert controller.admit("scan", "b")[:2] == (503, 1)  # class has no free slot
+    controller.release("scan", "a", 12)
+    assert controller.admit("scan", "a")[:2] == (429, 2)  # 2 tokens in debt at 1 token/s
+    assert controller.admit("scan", "b") is None  # other clients keep their own budget
+    controller.release("scan", "b", 1)
+    now[0] += 2
+    assert controller.admit("scan", "a") is None
+    controller.release("scan", "a", 0)
+
+    app = create_app({"TESTING": True, "ADMISSION_POLICIES": {"catalog": {**policy, "concurrency": 4}}})
+    client = app.test_client()
+    first = client.get("/api/suppliers/all")
+    assert first.status_code == 200
+    for _ in range(20):  # cached revalidations are free
+        assert client.get("/api/suppliers/all", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    client.get("/api/suppliers/all?limit=100")
+    limited = client.get("/api/suppliers/all")
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+    assert client.get("/api/orders/").status_code == 200
+    assert 'proximart_admission_rejected_total{class="catalog",reason="client_rate"}' in client.get("/metrics").get_data(as_text=True)
+
+    # Behind a trusted proxy each forwarded client has its own budget
+    proxied = create_app({"TESTING": True, "TRUSTED_PROXY_HOPS": 1,
+                          "ADMISSION_POLICIES": {"catalog": {**policy, "concurrency": 4}}}).test_client()
+    for user in ("10.1.0.1", "10.1.0.2"):
+        headers = {"X-Forwarded-For": user}
+        statuses = [proxied.get("/api/suppliers/all?limit=100", headers=headers).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+
+def test_bench_style_traffic_is_not_throttled():
+    from app import create_app
+
+    # Back-to-back catalog loads from one address, as bench.py sends them:
+    # its app turns admission control off, and the default budget also
+    # absorbs a burst of this size
+    for config in ({"TESTING": True, "ADMISSION_CONTROL": False}, {"TESTING": True}):
+        client = create_app(config).test_client()
+        statuses = [client.get(url).status_code
+                    for _ in range(15)
+                    for url in ("/api/suppliers/all?limit=50",
+                                "/api/suppliers/all?items=rice&min_quantity=100&max_price=200&limit=20",
+                                "/api/suppliers/nearby?lat=28.6&lon=77.2&limit=20")]
+        assert statuses == [200] * len(statuses)
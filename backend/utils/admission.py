@@ -0,0 +1,211 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+from utils.constants import (ADMISSION_CONTROL_ENABLED, ADMISSION_MAX_CLIENTS, ADMISSION_POLICIES, ADMISSION_ROUTES,
+                             ADMISSION_ROWS_PER_COST, ADMISSION_SCAN_COST, SUPPLIERS_MAX_LIMIT)
+from utils.metrics import admission_in_flight, admission_queue_depth, admission_rejected
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`.
+
+    Requests are charged after they finish, once their real cost is known,
+    so the balance can go negative (down to -burst); a bucket in debt
+    admits nothing until it has refilled to zero.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self):
+        """0 if the bucket is not in debt, else the seconds until it is out of it."""
+        self._refill()
+        return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def charge(self, cost):
+        self._refill()
+        self._tokens = max(self._tokens - cost, -self.burst)
+
+
+class ConcurrencyLimit:
+    """At most `limit` requests at once; up to `max_waiting` more wait for a slot."""
+
+    def __init__(self, name, limit, max_waiting):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        with self._cond:
+            if self.active >= self.limit or self.waiting:
+                if self.waiting >= self.max_waiting:
+                    return False
+                self.waiting += 1
+                admission_queue_depth.set(self.waiting, (self.name,))
+                try:
+                    if not self._cond.wait_for(lambda: self.active < self.limit, timeout):
+                        return False
+                finally:
+                    self.waiting -= 1
+                    admission_queue_depth.set(self.waiting, (self.name,))
+            self.active += 1
+            admission_in_flight.set(self.active, (self.name,))
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            admission_in_flight.set(self.active, (self.name,))
+            self._cond.notify()
+
+
+def request_cost(args, status=200):
+    """Cost units of a finished catalog query: a full scan (no cursor, or
+    include_total) weighs ADMISSION_SCAN_COST, a cursor page 1, plus one
+    unit per ADMISSION_ROWS_PER_COST rows asked for. A 304 answered from
+    the data version did no work and costs nothing."""
+    if status == 304:
+        return 0
+    try:
+        limit = min(max(int(args.get("limit", 10)), 1), SUPPLIERS_MAX_LIMIT)
+    except ValueError:
+        limit = 10
+    scan = "cursor" not in args or args.get("include_total", "false").lower() == "true"
+    return (ADMISSION_SCAN_COST if scan else 1) + limit / ADMISSION_ROWS_PER_COST
+
+
+class AdmissionController:
+    """Per-route-class and per-client limits for expensive routes.
+
+    Routes map to a class (ADMISSION_ROUTES); each class has a policy with
+    a shared token bucket and concurrency limit, and the same per client.
+    release() charges both buckets the request's request_cost(), so full
+    scans use up a budget faster than cursor pages and revalidations
+    (304) cost nothing. A client over its own limits gets 429;
+    a class over its shared limits (or whose wait queue is full) gets 503.
+    Both carry Retry-After. Routes without a class are never limited, so
+    orders and inventory keep their worker threads during catalog storms.
+    """
+
+    def __init__(self, policies=ADMISSION_POLICIES, routes=ADMISSION_ROUTES, max_clients=ADMISSION_MAX_CLIENTS,
+                 clock=time.monotonic):
+        self.policies = policies
+        self.routes = routes
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {name: TokenBucket(policy["rate"], policy["burst"], clock) for name, policy in policies.items()}
+        self._limits = {name: ConcurrencyLimit(name, policy["concurrency"], policy["max_waiting"])
+                        for name, policy in policies.items()}
+        self._clients = OrderedDict()  # (class, client) -> [TokenBucket, in-flight count], least recent first
+
+    def _client(self, name, client):
+        key = (name, client)
+        state = self._clients.get(key)
+        if state is None:
+            policy = self.policies[name]
+            state = self._clients[key] = [TokenBucket(policy["client_rate"], policy["client_burst"], self._clock), 0]
+            # Forget the least recently seen idle clients beyond max_clients
+            for old_key in list(self._clients):
+                if len(self._clients) <= self.max_clients:
+                    break
+                if old_key != key and self._clients[old_key][1] == 0:
+                    del self._clients[old_key]
+        else:
+            self._clients.move_to_end(key)
+        return state
+
+    def admit(self, endpoint, client):
+        """None when admitted (call release() with the request's cost when
+        done), else (status, retry_after seconds, reason)."""
+        name = self.routes.get(endpoint)
+        if name is None:
+            return None
+        policy = self.policies[name]
+
+        with self._lock:
+            state = self._client(name, client)
+            if state[1] >= policy["client_concurrency"]:
+                return self._reject(name, 429, 1, "client_concurrency")
+            wait = state[0].wait()
+            if wait:
+                return self._reject(name, 429, wait, "client_rate")
+            wait = self._buckets[name].wait()
+            if wait:
+                return self._reject(name, 503, wait, "rate")
+            state[1] += 1
+
+        if not self._limits[name].acquire(policy["wait_seconds"]):
+            self._release_client(name, client)
+            return self._reject(name, 503, 1, "concurrency")
+        return None
+
+    def release(self, endpoint, client, cost):
+        name = self.routes[endpoint]
+        self._limits[name].release()
+        self._release_client(name, client, cost)
+
+    def _release_client(self, name, client, cost=0):
+        with self._lock:
+            self._buckets[name].charge(cost)
+            state = self._clients.get((name, client))
+            if state is not None:
+                state[1] -= 1
+                state[0].charge(cost)
+
+    def _reject(self, name, status, retry_after, reason):
+        admission_rejected.inc((name, reason))
+        return status, max(1, math.ceil(retry_after)), reason
+
+
+def init_app(app):
+    """Admission control for the routes in ADMISSION_ROUTES; app.config["ADMISSION_CONTROL"]
+    turns it off and app.config["ADMISSION_POLICIES"] replaces the limits."""
+    app.config.setdefault("ADMISSION_CONTROL", ADMISSION_CONTROL_ENABLED)
+    controller = AdmissionController(app.config.get("ADMISSION_POLICIES", ADMISSION_POLICIES))
+    app.extensions["admission"] = controller
+
+    @app.before_request
+    def admit_request():
+        if not app.config["ADMISSION_CONTROL"] or request.endpoint not in controller.routes:
+            return None
+        # The real client behind trusted proxies once create_app applied ProxyFix
+        client = request.remote_addr or "unknown"
+        rejected = controller.admit(request.endpoint, client)
+        if rejected is None:
+            g.admitted = (request.endpoint, client)
+            return None
+        status, retry_after, _ = rejected
+        message = "Too many requests, please slow down" if status == 429 else "Server is busy, please retry shortly"
+        return jsonify({"error": message}), status, {"Retry-After": str(retry_after)}
+
+    @app.after_request
+    def price_request(response):
+        if "admitted" in g:
+            g.admission_cost = request_cost(request.args, response.status_code)
+        return response
+
+    @app.teardown_request
+    def release_request(exc):
+        # After a streamed body too, like the request metrics; a request
+        # that raised is charged in full
+        admitted = g.pop("admitted", None)
+        if admitted is not None:
+            cost = g.pop("admission_cost", None)
+            controller.release(*admitted, request_cost(request.args) if cost is None else cost)
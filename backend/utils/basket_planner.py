@@ -0,0 +1,199 @@
+import itertools
+from math import comb
+
+import numpy as np
+
+from utils.constants import BASKET_CANDIDATES_PER_ITEM, BASKET_EXHAUSTIVE_LIMIT
+
+# Subsets scored per numpy call in the exhaustive search
+_CHUNK = 4096
+
+
+def cost_matrix(quantities, suppliers):
+    """(costs, prices): arrays of shape (items, suppliers) for a basket.
+
+    costs[i, s] is the price of the whole quantity of item i at supplier s,
+    inf when s does not list it or has too little stock. Like place_order,
+    the first item of a supplier with a given name is the one used.
+    """
+    rows = {name: row for row, name in enumerate(quantities)}
+    needed = np.array(list(quantities.values()), dtype=float)
+    prices = np.full((len(rows), len(suppliers)), np.inf)
+    stock = np.zeros((len(rows), len(suppliers)))
+    for col, supplier in enumerate(suppliers):
+        for item in supplier.get("items") or ():
+            row = rows.get(str(item.get("name", "")).strip().lower())
+            if row is None or prices[row, col] != np.inf:
+                continue
+            prices[row, col] = item.get("price", 0)
+            stock[row, col] = item.get("quantity", 0)
+    costs = np.where(stock >= needed[:, None], prices * needed[:, None], np.inf)
+    return costs, prices
+
+
+def _undominated(costs, penalties):
+    """Columns no other column beats: another one at most as expensive for
+    every item and in penalty can always replace them in a plan."""
+    n = costs.shape[1]
+    keep = np.ones(n, dtype=bool)
+    for s in np.argsort(penalties + costs.sum(axis=0), kind="stable"):
+        if not keep[s]:
+            continue
+        dominated = (costs[:, s][:, None] <= costs).all(axis=0) & (penalties[s] <= penalties)
+        dominated[s] = False
+        keep &= ~dominated
+    return np.flatnonzero(keep)
+
+
+def _shortlist(costs, penalties, per_item):
+    """Columns among the `per_item` cheapest (cost plus penalty) for some
+    item, plus the `per_item` cheapest for the whole basket on their own
+    (which favours suppliers covering many items)."""
+    order = np.argsort(costs + penalties, axis=1, kind="stable")[:, :per_item]
+    whole = np.argsort(costs.sum(axis=0) + penalties, kind="stable")[:per_item]
+    return np.union1d(order.ravel(), whole)
+
+
+def _exhaustive(costs, penalties, max_suppliers):
+    best_total, best = np.inf, ()
+    for size in range(1, max_suppliers + 1):
+        combos = itertools.combinations(range(costs.shape[1]), size)
+        while True:
+            chunk = np.array(list(itertools.islice(combos, _CHUNK)), dtype=int).reshape(-1, size)
+            if not len(chunk):
+                break
+            totals = costs[:, chunk].min(axis=2).sum(axis=0) + penalties[chunk].sum(axis=1)
+            i = int(np.argmin(totals))
+            if totals[i] < best_total:
+                best_total, best = totals[i], tuple(chunk[i])
+    return list(best)
+
+
+def _total(costs, penalties, chosen, uncovered):
+    base = costs[:, chosen].min(axis=1) if chosen else np.full(costs.shape[0], uncovered)
+    return base.sum() + penalties[chosen].sum()
+
+
+def _improve(costs, penalties, chosen, max_suppliers, uncovered):
+    """Grow `chosen` greedily, then apply the best add/drop/swap while it lowers the total."""
+    m, n = costs.shape
+    total = _total(costs, penalties, chosen, uncovered)
+    for _ in range(10 * max_suppliers * n):
+        moves = []
+        if len(chosen) < max_suppliers:
+            base = costs[:, chosen].min(axis=1) if chosen else np.full(m, uncovered)
+            totals = np.minimum(base[:, None], costs).sum(axis=0) + penalties + penalties[chosen].sum()
+            totals[chosen] = np.inf
+            s = int(np.argmin(totals))
+            moves.append((totals[s], chosen + [s]))
+        for j in range(len(chosen)):
+            rest = chosen[:j] + chosen[j + 1:]
+            base = costs[:, rest].min(axis=1) if rest else np.full(m, uncovered)
+            base_penalty = penalties[rest].sum()
+            moves.append((base.sum() + base_penalty, rest))
+            totals = np.minimum(base[:, None], costs).sum(axis=0) + penalties + base_penalty
+            totals[chosen] = np.inf
+            s = int(np.argmin(totals))
+            moves.append((totals[s], rest + [s]))
+        best_total, best = min(moves, key=lambda move: move[0], default=(np.inf, chosen))
+        if best_total >= total - 1e-9:
+            break
+        total, chosen = best_total, best
+    return total, chosen
+
+
+def _local_search(costs, penalties, max_suppliers, uncovered, starts):
+    """Best of local searches started from each of the `starts` cheapest single suppliers."""
+    singles = costs.sum(axis=0) + penalties
+    best_total, best = np.inf, []
+    for s in np.argsort(singles, kind="stable")[:starts]:
+        total, chosen = _improve(costs, penalties, [int(s)], max_suppliers, uncovered)
+        if total < best_total:
+            best_total, best = total, chosen
+    return best
+
+
+def choose_suppliers(costs, penalties, max_suppliers, exhaustive_limit=BASKET_EXHAUSTIVE_LIMIT,
+                     per_item=BASKET_CANDIDATES_PER_ITEM):
+    """Columns (at most max_suppliers) minimising the sum of row minima plus their penalties.
+
+    Rows no chosen column can supply count as a cost larger than any plan,
+    so plans cover as many items as possible first. Returns (columns,
+    exact): exact is True when every undominated subset was scored,
+    otherwise the plan comes from local searches over the cheapest
+    candidates per item.
+    """
+    m, n = costs.shape
+    if not m or not n or max_suppliers < 1:
+        return [], True
+
+    finite = costs[np.isfinite(costs)]
+    uncovered = (finite.sum() if len(finite) else 0.0) + np.sort(penalties)[-max_suppliers:].sum() + 1.0
+    costs = np.where(np.isfinite(costs), costs, uncovered)
+
+    candidates = _undominated(costs, penalties)
+    exact = True
+    if m * sum(comb(len(candidates), k) for k in range(1, max_suppliers + 1)) > exhaustive_limit:
+        exact = False
+        subset = _shortlist(costs[:, candidates], penalties[candidates], per_item)
+        candidates = candidates[subset]
+
+    sub_costs, sub_penalties = costs[:, candidates], penalties[candidates]
+    if exact:
+        chosen = _exhaustive(sub_costs, sub_penalties, max_suppliers)
+    else:
+        chosen = _local_search(sub_costs, sub_penalties, max_suppliers, uncovered, starts=per_item)
+    return [int(candidates[s]) for s in chosen], exact
+
+
+def plan_basket(quantities, suppliers, distances, max_suppliers, delivery_fee, cost_per_km, **options):
+    """Cheapest way to buy a basket from nearby suppliers.
+
+    quantities is {item name: quantity}; suppliers are filter_suppliers
+    results with distances[i] in km. Each item is bought whole from one
+    supplier and every supplier used adds delivery_fee + cost_per_km * km.
+    The "items" of the plan can be sent to /api/orders/place as is.
+    """
+    costs, prices = cost_matrix(quantities, suppliers)
+    distances = np.asarray(distances, dtype=float)
+    penalties = delivery_fee + cost_per_km * distances
+    chosen, exact = choose_suppliers(costs, penalties, max_suppliers, **options)
+
+    names = list(quantities)
+    plan_suppliers = {}
+    order_items = []
+    unavailable = []
+    for row, name in enumerate(names):
+        options_for_item = [s for s in chosen if np.isfinite(costs[row, s])]
+        if not options_for_item:
+            unavailable.append(name)
+            continue
+        s = min(options_for_item, key=lambda col: (costs[row, col], penalties[col]))
+        supplier = suppliers[s]
+        entry = plan_suppliers.get(s)
+        if entry is None:
+            entry = plan_suppliers[s] = {
+                "supplier_id": supplier["id"],
+                "name": supplier.get("name"),
+                "distance_km": round(float(distances[s]), 2),
+                "delivery_cost": round(float(penalties[s]), 2),
+                "items": [],
+                "items_cost": 0.0,
+            }
+        cost = float(costs[row, s])
+        entry["items"].append({"name": name, "quantity": quantities[name], "price": float(prices[row, s]), "cost": cost})
+        entry["items_cost"] += cost
+        order_items.append({"name": name, "quantity": quantities[name], "supplier_id": supplier["id"]})
+
+    items_cost = sum(entry["items_cost"] for entry in plan_suppliers.values())
+    delivery_cost = sum(entry["delivery_cost"] for entry in plan_suppliers.values())
+    return {
+        "suppliers": list(plan_suppliers.values()),
+        "items": order_items,
+        "unavailable": unavailable,
+        "items_cost": round(items_cost, 2),
+        "delivery_cost": round(delivery_cost, 2),
+        "total_cost": round(items_cost + delivery_cost, 2),
+        "candidates": len(suppliers),
+        "exact": exact,
+    }
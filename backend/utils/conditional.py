@@ -0,0 +1,213 @@
+import hashlib
+import json
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from firebase_config import db
+from utils.constants import CACHE_CONTROL, DATA_VERSION_TTL_SECONDS, DATA_VERSIONS_COLLECTION, SHARED_VERSION_SLOTS
+
+
+class SharedVersions:
+    """Version tokens of stored data, kept where conditional GETs can check them without a read.
+
+    A fixed table of `slots` entries in anonymous shared memory, created
+    at import: with gunicorn's preload_app that happens in the master, so
+    every forked worker shares the table and a write in one worker is seen
+    by the others at once. Each key hashes to one slot, and a later key
+    may evict an earlier one, which only costs a read. Tokens come from
+    the datastore (see current_version), so they agree across workers and
+    restarts; an entry is trusted for `ttl` seconds, which bounds what a
+    write from another host can leave stale.
+
+    Writers call forget(key) after they commit. Readers note generation(key)
+    before reading the data and pass it to set(), which then skips the
+    entry if a write was committed in between.
+    """
+
+    SLOT = struct.Struct("<QQdq40s")  # key hash, generation, expires_at, last_modified (0: none), token
+
+    def __init__(self, slots=SHARED_VERSION_SLOTS, ttl=DATA_VERSION_TTL_SECONDS, clock=time.time):
+        self.slots = slots
+        self.ttl = ttl
+        self._clock = clock
+        self._table = mmap.mmap(-1, slots * self.SLOT.size)
+        self._lock = multiprocessing.Lock()
+
+    def _slot(self, key):
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        return key_hash, (key_hash % self.slots) * self.SLOT.size
+
+    def get(self, key):
+        """(token, last_modified epoch seconds or None) for key, or None if not known."""
+        key_hash, offset = self._slot(key)
+        with self._lock:
+            stored_hash, _, expires_at, last_modified, token = self.SLOT.unpack_from(self._table, offset)
+        if stored_hash != key_hash or expires_at <= self._clock():
+            return None
+        return token.rstrip(b"\0").decode(), last_modified or None
+
+    def generation(self, key):
+        _, offset = self._slot(key)
+        with self._lock:
+            return self.SLOT.unpack_from(self._table, offset)[1]
+
+    def set(self, key, token, last_modified, generation):
+        """Record key's version as read from the datastore, unless a write to it was committed since generation(key)."""
+        key_hash, offset = self._slot(key)
+        with self._lock:
+            if self.SLOT.unpack_from(self._table, offset)[1] != generation:
+                return
+            self.SLOT.pack_into(self._table, offset, key_hash, generation, self._clock() + self.ttl,
+                                last_modified or 0, token.encode()[:40])
+
+    def forget(self, *keys):
+        for key in keys:
+            _, offset = self._slot(key)
+            with self._lock:
+                generation = self.SLOT.unpack_from(self._table, offset)[1]
+                self.SLOT.pack_into(self._table, offset, 0, generation + 1, 0.0, 0, b"")
+
+    def clear(self):
+        with self._lock:
+            self._table[:] = bytes(len(self._table))
+
+
+versions = SharedVersions()
+
+
+def new_version(now=None):
+    """Fields to merge into a document on every write that changes what GETs serve from it.
+
+    They live in the datastore, so every process sees the same version
+    however many workers there are.
+    """
+    now = now or datetime.utcnow()
+    return {"version": uuid.uuid4().hex, "updated_at": now.isoformat()}
+
+
+def document_version(data, clock=time.time):
+    """(token, last_modified epoch seconds or None) of a stored document's data.
+
+    Documents written before versions were stored get a token hashed from
+    their content. Last-Modified has one-second resolution, so it is only
+    given once updated_at is a second old: a later write can then no longer
+    share its second (RFC 7232 section 2.2.2).
+    """
+    token = data.get("version") or hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    last_modified = None
+    if data.get("updated_at"):
+        updated_at = datetime.fromisoformat(data["updated_at"]).replace(tzinfo=timezone.utc).timestamp()
+        if clock() - updated_at >= 1:
+            last_modified = math.ceil(updated_at)
+    return token, last_modified
+
+
+def content_version(data):
+    """(token, None) hashed from data that only changes with a deploy."""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest(), None
+
+
+def stored_version(key, store=db):
+    """Version fields of data kept in several documents (like the supplier
+    catalog), from its data_versions/<key> document."""
+    doc = store.collection(DATA_VERSIONS_COLLECTION).document(key).get()
+    return doc.to_dict() if doc.exists else {}
+
+
+def bump_version(key, store=db):
+    """Store a new version for key after a write to its data committed; returns the token."""
+    version = new_version()
+    store.collection(DATA_VERSIONS_COLLECTION).document(key).set(version)
+    versions.forget(key)
+    return version["version"]
+
+
+def current_version(key, read):
+    """(token, last_modified) for key: from the shared table, else
+    document_version(read()) (recorded in the table for next time)."""
+    version = versions.get(key)
+    if version is None:
+        generation = versions.generation(key)
+        version = document_version(read())
+        versions.set(key, *version, generation)
+    return version
+
+
+def cache_control_for(endpoint):
+    return current_app.config.get("CACHE_CONTROL", CACHE_CONTROL).get(endpoint, CACHE_CONTROL["default"])
+
+
+def _etag(token):
+    # The query string is part of it: filters and pages change the body
+    return hashlib.sha1(f"{token}:{request.full_path}".encode()).hexdigest()[:20]
+
+
+def _not_modified(etag, last_modified):
+    """Whether the request's If-None-Match (or, without one, If-Modified-Since) matches."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return request.if_modified_since.timestamp() >= last_modified
+    return False
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control_for(request.endpoint)
+    return response
+
+
+def conditional_response(token, last_modified, build):
+    """304 when the request's validators match (token, last_modified), else build().
+
+    A matching If-None-Match (or, without one, If-Modified-Since) answers
+    304 without calling build. The ETag also covers the query string,
+    since filters and pages change the body. last_modified may be None.
+    """
+    etag = _etag(token)
+    if _not_modified(etag, last_modified):
+        return _with_validators(current_app.response_class(status=304), etag, last_modified)
+    response = make_response(build())
+    if response.status_code != 200:
+        return response
+    return _with_validators(response, etag, last_modified)
+
+
+def document_response(key, read, build):
+    """conditional_response for a view built from one stored document.
+
+    When the shared table knows key's version and the validators match it,
+    answers 304 without reading anything. Otherwise read() fetches the
+    document's data, its version answers (and is recorded for next time),
+    and build(data) makes the body, so ETag and body always agree.
+    """
+    version = versions.get(key)
+    if version is not None and _not_modified(_etag(version[0]), version[1]):
+        return _with_validators(current_app.response_class(status=304), _etag(version[0]), version[1])
+    generation = versions.generation(key)
+    data = read()
+    version = document_version(data)
+    versions.set(key, *version, generation)
+    return conditional_response(*version, lambda: build(data))
+
+
+def conditional(version):
+    """ETag/Last-Modified for a GET view: version(**view_kwargs) gives
+    (token, last_modified), and a match answers 304 before the view runs
+    (see conditional_response)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            return conditional_response(*version(**kwargs), lambda: view(*args, **kwargs))
+        return wrapped
+    return decorator
@@ -1,6 +1,152 @@
+import os
+
 COMMON_ITEMS = [
     "onion", "tomato", "potato", "oil", "spices", "bread", "paneer", "rice"
 ]
 
 # Constants can go here if needed
 DEFAULT_RADIUS_KM = 10
+
+# Supplier catalog cache (TTL of 0 disables caching)
+SUPPLIER_CACHE_TTL_SECONDS = float(os.environ.get("SUPPLIER_CACHE_TTL", 60))
+SUPPLIER_CACHE_MAX_SIZE = int(os.environ.get("SUPPLIER_CACHE_MAX_SIZE", 100_000))
+
+# Writes per batch commit for bulk imports (Firestore allows at most 500)
+BULK_IMPORT_BATCH_SIZE = 400
+
+# Add Server-Timing headers with request and datastore timings to every response
+TIMING_HEADERS_ENABLED = os.environ.get("PROXIMART_TIMING_HEADERS", "").lower() in ("1", "true", "yes")
+
+# Conditional GETs: versions are stored in the datastore (on the document,
+# or in data_versions/<key> for the supplier catalog) and kept in a table
+# shared by the gunicorn workers, so a matching If-None-Match costs no
+# read. Slots in that table, and how long an entry is trusted before it
+# is read again (bounds staleness from writes made on other hosts)
+DATA_VERSIONS_COLLECTION = "data_versions"
+SHARED_VERSION_SLOTS = 65536
+DATA_VERSION_TTL_SECONDS = float(os.environ.get("DATA_VERSION_TTL", 60))
+
+# Cache-Control per endpoint; override with app.config["CACHE_CONTROL"]
+CACHE_CONTROL = {
+    "default": "no-cache",
+    "suppliers.get_all_suppliers": "no-cache",
+    "inventory.get_inventory": "private, no-cache",
+    "inventory.get_stock_alerts": "private, no-cache",
+    "help.get_faqs": "public, max-age=3600",
+}
+
+# One document per vendor holding its whole inventory: {"vendor_id", "items": {name: item}}
+VENDOR_INVENTORY_COLLECTION = "vendor_inventory"
+
+# Supplier search: minimum trigram similarity for a fuzzy word match (as
+# pg_trgm's default), vocabulary words tried per prefix, and the weight of
+# item-name matches relative to supplier name/id matches
+SEARCH_MIN_SIMILARITY = 0.3
+SEARCH_MAX_PREFIX_EXPANSIONS = 50
+SEARCH_ITEM_WEIGHT = 0.7
+
+# Hindi/Hinglish spellings vendors type, mapped to the catalog's item names
+SEARCH_SYNONYMS = {
+    "tamatar": "tomato", "pyaz": "onion", "pyaaz": "onion", "kanda": "onion",
+    "aloo": "potato", "alu": "potato", "tel": "oil", "masala": "spices",
+    "chawal": "rice", "pav": "bread", "cheeni": "sugar", "namak": "salt",
+    "atta": "flour", "makhan": "butter", "doodh": "milk", "dahi": "curd",
+    "adrak": "ginger", "lehsun": "garlic", "lahsun": "garlic", "mirch": "chilli",
+    "mirchi": "chilli", "dhaniya": "coriander", "nimbu": "lemon", "gobhi": "cabbage",
+    "gajar": "carrot", "matar": "peas",
+}
+
+# Write-behind for order placement (off by default; app.config["WRITE_BEHIND"]
+# overrides): orders are acknowledged once queued and group-committed by a
+# background worker. The queue bound counts requests, a batch counts writes.
+WRITE_BEHIND_ENABLED = os.environ.get("PROXIMART_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_QUEUE = int(os.environ.get("WRITE_BEHIND_MAX_QUEUE", 10_000))
+WRITE_BEHIND_BATCH_SIZE = BULK_IMPORT_BATCH_SIZE
+WRITE_BEHIND_LINGER_SECONDS = 0.01
+WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS = 0.5
+WRITE_BEHIND_RETRIES = 3
+
+# Basket planner defaults: suppliers one plan may use, and the per-supplier
+# penalty (flat delivery fee plus a charge per km) added to item costs
+BASKET_MAX_SUPPLIERS = 3
+BASKET_DELIVERY_FEE = 20.0
+BASKET_COST_PER_KM = 5.0
+# Subsets x items scored when searching every supplier subset; beyond that
+# the planner shortlists the cheapest candidates per item and improves
+# greedy plans by swaps
+BASKET_EXHAUSTIVE_LIMIT = 1_000_000
+BASKET_CANDIDATES_PER_ITEM = 8
+
+# Order analytics: default range per period and the longest range one
+# request may read (in days, i.e. at most that many rollup documents)
+ANALYTICS_DEFAULT_DAYS = {"day": 30, "week": 84}
+ANALYTICS_MAX_DAYS = 400
+
+# Reorder suggestions: consumption is an exponentially decayed sum with this
+# time constant; an item is due when its stock covers no more than the
+# supplier lead time (plus threshold as safety stock), and the suggestion
+# refills it for lead time + cover days
+REORDER_RATE_WINDOW_DAYS = 14.0
+REORDER_LEAD_DAYS = 2.0
+REORDER_COVER_DAYS = 7.0
+REORDER_SUGGESTIONS_COLLECTION = "reorder_suggestions"
+
+# Change events (/api/events): events kept per channel for Last-Event-ID
+# resumes, events one slow stream may fall behind by before losing the
+# oldest, the keep-alive interval of idle streams, how long one stream
+# stays open before the client reconnects, and the longest long-poll wait.
+# Streams and long polls each hold a thread: at most EVENTS_MAX_STREAMS
+# per process, below gunicorn's threads so other routes keep some
+EVENTS_HISTORY_SIZE = 100
+EVENTS_MAX_PENDING = 1000
+EVENTS_HEARTBEAT_SECONDS = 15.0
+EVENTS_MAX_STREAM_SECONDS = 300.0
+EVENTS_POLL_SECONDS = 25.0
+EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", 8))
+
+# Events between processes: the bus ("local", or "datastore" so every
+# worker sees every write; empty picks datastore unless PROXIMART_DB is
+# memory), the collection the datastore bus writes events to, how often a
+# process with open streams reads the events other processes wrote (one
+# query per process, however many streams), how far back each read looks
+# again for events committed late, how long events are kept, and the
+# events read per query
+EVENTS_BUS = os.environ.get("PROXIMART_EVENT_BUS", "").lower()
+EVENTS_COLLECTION = "events"
+EVENTS_RELAY_POLL_SECONDS = float(os.environ.get("EVENTS_RELAY_POLL", 1.0))
+EVENTS_RELAY_GRACE_SECONDS = 2.0
+EVENTS_RETENTION_SECONDS = 600.0
+EVENTS_RELAY_BATCH_SIZE = 500
+
+# Largest page /api/suppliers/all and /nearby serve; bigger limits are clamped
+SUPPLIERS_MAX_LIMIT = 100
+
+# Admission control (on unless PROXIMART_ADMISSION=0; app.config
+# "ADMISSION_CONTROL"/"ADMISSION_POLICIES" override). Routes listed here
+# belong to a class; anything else is never limited. Budgets are in cost
+# units: a full catalog scan costs ADMISSION_SCAN_COST, a cursor page 1,
+# plus one unit per ADMISSION_ROWS_PER_COST rows requested. Class
+# concurrency stays below gunicorn's threads per worker so order and
+# inventory requests always find a free thread.
+# Reverse proxies in front of the app (PROXIMART_TRUSTED_PROXIES, or
+# app.config["TRUSTED_PROXY_HOPS"]): with N > 0 the client address comes
+# from the last N X-Forwarded-For hops, so each user gets their own budget
+TRUSTED_PROXY_HOPS = int(os.environ.get("PROXIMART_TRUSTED_PROXIES", 0))
+ADMISSION_CONTROL_ENABLED = os.environ.get("PROXIMART_ADMISSION", "1").lower() not in ("0", "false", "no")
+ADMISSION_SCAN_COST = 5
+ADMISSION_ROWS_PER_COST = 50
+ADMISSION_MAX_CLIENTS = 10_000
+ADMISSION_ROUTES = {
+    "suppliers.get_all_suppliers": "catalog",
+    "suppliers.get_nearby_suppliers": "catalog",
+    "suppliers.plan_nearby_basket": "catalog",
+}
+ADMISSION_POLICIES = {
+    "catalog": {
+        # Shared by all clients: cost units per second, burst, requests at
+        # once, and how many more may wait (for up to wait_seconds) for a slot
+        "rate": 200.0, "burst": 400.0, "concurrency": 4, "max_waiting": 16, "wait_seconds": 0.5,
+        # Per client (remote address): about 60 full scans at once, then 10 a second
+        "client_rate": 50.0, "client_burst": 300.0, "client_concurrency": 2,
+    },
+}
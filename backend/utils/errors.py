@@ -0,0 +1,7 @@
+class ApiError(Exception):
+    """Raised inside transactions to abort with an HTTP error response."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
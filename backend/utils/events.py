@@ -0,0 +1,327 @@
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from firebase_config import DB_BACKEND, db
+from utils.constants import (EVENTS_BUS, EVENTS_COLLECTION, EVENTS_HISTORY_SIZE, EVENTS_MAX_PENDING,
+                             EVENTS_RELAY_BATCH_SIZE, EVENTS_RELAY_GRACE_SECONDS, EVENTS_RELAY_POLL_SECONDS,
+                             EVENTS_RETENTION_SECONDS)
+from utils.metrics import event_subscribers, events_dropped, events_published
+
+logger = logging.getLogger(__name__)
+
+# seq orders events within one bus: for LocalEventBus it increases and id
+# is "<epoch>-<seq>"; DatastoreEventBus ids sort by publish time and are
+# their own seq
+Event = namedtuple("Event", "id seq channel type data")
+
+
+def vendor_channel(vendor_id):
+    return f"vendor:{vendor_id.strip()}"
+
+
+class Subscription:
+    """Events published to one channel since subscribing, oldest first.
+
+    Holds at most max_pending events; a consumer that falls further behind
+    loses the oldest ones (counted in events_dropped) rather than holding
+    up publishers.
+    """
+
+    def __init__(self, bus, channel, max_pending):
+        self.bus = bus
+        self.channel = channel
+        self._events = deque()
+        self._max_pending = max_pending
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def _push(self, event):
+        with self._cond:
+            if len(self._events) >= self._max_pending:
+                self._events.popleft()
+                events_dropped.inc()
+            self._events.append(event)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next event, waiting up to timeout seconds; None if there was none."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.closed, timeout)
+            return self._events.popleft() if self._events else None
+
+    def drain(self, timeout=None):
+        """Every pending event, waiting up to timeout seconds for the first one."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.closed, timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self.bus._unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalEventBus:
+    """In-process change notifications: write paths publish after they
+    commit, open event streams subscribe per channel.
+
+    Each channel keeps its last `history` events so a reconnecting client
+    can resume from the Last-Event-ID it saw. Ids carry the bus's epoch:
+    an id from another epoch (another worker, or before a restart or
+    fork) cannot be compared, so that client is sent everything kept
+    rather than risk skipping events. Only subscribers in this process see
+    an event: it serves tests and single-process runs, and
+    DatastoreEventBus extends it across processes.
+    """
+
+    def __init__(self, history=EVENTS_HISTORY_SIZE, max_pending=EVENTS_MAX_PENDING):
+        self.history = history
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> set of Subscription
+        self._count = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new epoch with no history, e.g. in a freshly forked worker."""
+        with self._lock:
+            self.epoch = uuid.uuid4().hex[:8]
+            self._seqs = itertools.count(1)
+            self._history = {}  # channel -> deque of recent Events
+
+    def publish(self, channel, event_type, data):
+        with self._lock:
+            seq = next(self._seqs)
+            event = Event(f"{self.epoch}-{seq}", seq, channel, event_type, data)
+            subscribers = self._record(event)
+        for subscription in subscribers:
+            subscription._push(event)
+        events_published.inc((event_type,))
+        return event
+
+    def _record(self, event):
+        """Keep event in its channel's history; the subscribers to push it to. Call with _lock held."""
+        self._history.setdefault(event.channel, deque(maxlen=self.history)).append(event)
+        return list(self._subscribers.get(event.channel, ()))
+
+    def _seq_after(self, last_event_id):
+        """Sequence number to resume after: 0 (everything kept) for ids of another epoch."""
+        epoch, _, seq = str(last_event_id).partition("-")
+        if epoch == self.epoch and seq.isdigit():
+            return int(seq)
+        return 0
+
+    def subscribe(self, channel, last_event_id=None):
+        """A Subscription to channel, starting with kept events after last_event_id if given."""
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            self._count += 1
+            event_subscribers.set(self._count)
+            if last_event_id is not None:
+                after = self._seq_after(last_event_id)
+                for event in self._history.get(channel, ()):
+                    if event.seq > after:
+                        subscription._push(event)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if not subscribers or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.channel]
+            self._count -= 1
+            event_subscribers.set(self._count)
+
+
+class DatastoreEventBus(LocalEventBus):
+    """LocalEventBus whose events reach subscribers in every process.
+
+    publish() writes each event to the `collection` documents (ids are the
+    publish time in ns, the bus's epoch and seq, so they sort by time and
+    a Last-Event-ID means the same in every worker) and delivers it here
+    at once. While this process has open streams, one relay thread reads
+    the events other processes wrote every `poll_seconds`: a single query
+    per process however many streams are open, and none without streams.
+    Each read looks `grace_seconds` back again, so an event committed late
+    (or stamped by a slightly slow clock) is not skipped; ids already
+    delivered are not delivered twice. A subscriber arriving while the
+    relay is idle reads once before its replay, and a Last-Event-ID older
+    than the relay's position is read back from the datastore, so a client
+    reconnecting to another worker misses nothing kept for
+    `retention_seconds`. Older events are deleted by the relays.
+    """
+
+    ID = re.compile(r"^(\d{20})-[0-9a-f]+-\d+$")
+
+    def __init__(self, db, collection=EVENTS_COLLECTION, poll_seconds=EVENTS_RELAY_POLL_SECONDS,
+                 grace_seconds=EVENTS_RELAY_GRACE_SECONDS, retention_seconds=EVENTS_RETENTION_SECONDS,
+                 batch_size=EVENTS_RELAY_BATCH_SIZE, **kwargs):
+        self._db = db
+        self.collection = collection
+        self.poll_seconds = poll_seconds
+        self.grace_ns = int(grace_seconds * 1e9)
+        self.retention_ns = int(retention_seconds * 1e9)
+        self.batch_size = batch_size
+        self._fetch_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def reset(self):
+        super().reset()
+        with self._lock:
+            self._cursor = time.time_ns()  # relayed up to here (ns), less the grace window
+            self._delivered = {}  # event id -> ns, for ids within the retention window
+            self._pruned_at = 0
+            # Threads do not survive a fork
+            self._relay_thread = None
+            self._relay_pid = None
+
+    def publish(self, channel, event_type, data):
+        with self._lock:
+            seq = next(self._seqs)
+        now = time.time_ns()
+        event_id = f"{now:020d}-{self.epoch}-{seq}"
+        try:
+            self._db.collection(self.collection).document(event_id).set(
+                {"channel": channel, "type": event_type, "data": data, "origin": self.epoch, "at": now})
+        except Exception:
+            # The write it announces has committed; this process's streams still hear of it
+            logger.warning("event %s could not be shared with other processes", event_id, exc_info=True)
+        event = Event(event_id, event_id, channel, event_type, data)
+        with self._lock:
+            self._delivered[event_id] = now
+            subscribers = self._record(event)
+        for subscription in subscribers:
+            subscription._push(event)
+        events_published.inc((event_type,))
+        return event
+
+    def _seq_after(self, last_event_id):
+        """The id to resume after: "" (everything kept) for ids this bus did not issue."""
+        last_event_id = str(last_event_id)
+        return last_event_id if self.ID.match(last_event_id) else ""
+
+    def subscribe(self, channel, last_event_id=None):
+        subscription = super().subscribe(channel, last_event_id)
+        match = self.ID.match(str(last_event_id)) if last_event_id is not None else None
+        # Relayed events at or before this are not news to the subscriber
+        subscription.after = match.group(0) if match else f"{time.time_ns() - self.grace_ns:020d}"
+        with self._lock:
+            idle = self._relay_thread is None or self._relay_pid != os.getpid()
+            if idle:
+                # Only recent events matter to a relay starting now
+                self._cursor = max(self._cursor, time.time_ns() - self.grace_ns)
+            # Read back what this process's relay has not seen yet
+            since = max(int(match.group(1)), time.time_ns() - self.retention_ns) if match else None
+            if since is not None and since >= self._cursor:
+                since = None
+        # Registered first, so what the read finds is pushed to this subscription too
+        if idle or since is not None:
+            self._fetch(since)
+        self._ensure_relay()
+        return subscription
+
+    def _ensure_relay(self):
+        with self._lock:
+            if self._relay_thread is not None and self._relay_pid == os.getpid():
+                return
+            self._relay_pid = os.getpid()
+            self._relay_thread = threading.Thread(target=self._relay, name="event-relay", daemon=True)
+            self._relay_thread.start()
+
+    def _relay(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self._lock:
+                # Stop with the last stream; the next subscriber starts a new relay
+                if self._relay_thread is not threading.current_thread():
+                    return
+                if not self._subscribers:
+                    self._relay_thread = None
+                    return
+            try:
+                self._fetch()
+                self._prune()
+            except Exception:
+                logger.warning("reading events from other processes failed", exc_info=True)
+
+    def _fetch(self, since=None):
+        """Deliver the events written since `since` (default: the cursor), less the
+        grace window, that were not delivered yet."""
+        with self._fetch_lock:
+            started = time.time_ns()
+            with self._lock:
+                after = f"{max((self._cursor if since is None else since) - self.grace_ns, 0):020d}"
+            query = self._db.collection(self.collection).order_by("__name__")
+            while True:
+                docs = list(query.start_after({"__name__": after}).limit(self.batch_size).stream())
+                for doc in docs:
+                    self._deliver(doc)
+                if len(docs) < self.batch_size:
+                    break
+                after = docs[-1].id
+            with self._lock:
+                self._cursor = max(self._cursor, started)
+
+    def _deliver(self, doc):
+        match = self.ID.match(doc.id)
+        if not match:
+            return
+        at = int(match.group(1))
+        with self._lock:
+            if doc.id in self._delivered:
+                return
+            data = doc.to_dict() or {}
+            self._delivered[doc.id] = at
+            event = Event(doc.id, doc.id, data.get("channel"), data.get("type"), data.get("data"))
+            subscribers = self._record(event)
+        for subscription in subscribers:
+            if getattr(subscription, "after", "") < event.seq:
+                subscription._push(event)
+
+    def _prune(self):
+        """Delete events past the retention window, at most once per tenth of it."""
+        now = time.time_ns()
+        if now - self._pruned_at < self.retention_ns // 10:
+            return
+        self._pruned_at = now
+        cutoff = now - self.retention_ns
+        with self._lock:
+            self._delivered = {event_id: at for event_id, at in self._delivered.items() if at >= cutoff}
+        docs = list(self._db.collection(self.collection).where("at", "<", cutoff).limit(self.batch_size).stream())
+        if docs:
+            batch = self._db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+
+
+def create_event_bus(kind=EVENTS_BUS):
+    """The bus for this process: shared through the datastore, or in-process
+    for the memory backend (which no other process can see anyway)."""
+    if kind == "local" or (not kind and DB_BACKEND == "memory"):
+        return LocalEventBus()
+    if kind in ("", "datastore"):
+        return DatastoreEventBus(db)
+    raise ValueError(f"unknown PROXIMART_EVENT_BUS {kind!r}: use 'local' or 'datastore'")
+
+
+event_bus = create_event_bus()
@@ -0,0 +1,49 @@
+import re
+
+from flask import current_app, jsonify
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to Flask's encoder
+    orjson = None
+
+# Sorted keys match Flask's default jsonify output; datetimes and other
+# types orjson would format differently go through Flask's own encoder
+ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+# What json.dumps(ensure_ascii=True) escapes that orjson writes raw
+NON_ASCII = re.compile("[^\x00-\x7e]")
+
+
+def _escape(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return "\\u%04x\\u%04x" % (0xD800 | code >> 10, 0xDC00 | code & 0x3FF)
+    return "\\u%04x" % code
+
+
+def ascii_json(body):
+    """orjson output with non-ASCII characters escaped as Flask's encoder does."""
+    if body.isascii() and b"\x7f" not in body:
+        return body
+    return NON_ASCII.sub(_escape, body.decode()).encode()
+
+
+def json_response(payload, status=200):
+    """jsonify() with orjson when it is installed; for large list responses.
+
+    The body is the same as jsonify's (sorted keys, escaped non-ASCII when
+    the app's JSON provider has ensure_ascii) except for NaN and infinite
+    floats: orjson writes them as null, valid JSON where Flask writes NaN
+    and Infinity.
+    """
+    if orjson is None:
+        response = jsonify(payload)
+    else:
+        body = orjson.dumps(payload, default=current_app.json.default, option=ORJSON_OPTIONS)
+        if getattr(current_app.json, "ensure_ascii", True):
+            body = ascii_json(body)
+        response = current_app.response_class(body + b"\n", mimetype=current_app.json.mimetype)
+    response.status_code = status
+    return response
@@ -0,0 +1,121 @@
+from math import cos, pi, radians, floor
+from threading import RLock
+
+import numpy as np
+
+from utils.geo_utils import EARTH_RADIUS_KM, distances_within_radius
+
+# On the sphere the haversine uses, so the cell range covers every point it counts as in range
+KM_PER_DEG_LAT = EARTH_RADIUS_KM * pi / 180
+DEFAULT_CELL_DEG = 0.05  # ~5.5 km of latitude per cell
+
+
+class GeoIndex:
+    """In-process grid index over (lat, lon) points keyed by id.
+
+    Points are bucketed into fixed-size lat/lon cells, so a radius query only
+    looks at the cells overlapping the query's bounding box.
+    """
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._wrap = round(360 / cell_deg)
+        self._cells = {}
+        self._points = {}
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _wrap_lon(self, cell_lon):
+        half = self._wrap // 2
+        return ((cell_lon + half) % self._wrap) - half
+
+    def _cell(self, lat, lon):
+        return floor(lat / self.cell_deg), self._wrap_lon(floor(lon / self.cell_deg))
+
+    def add(self, key, lat, lon):
+        lat, lon = float(lat), float(lon)
+        with self._lock:
+            self.remove(key)
+            cell = self._cell(lat, lon)
+            self._cells.setdefault(cell, {})[key] = (lat, lon)
+            self._points[key] = cell
+
+    def remove(self, key):
+        with self._lock:
+            cell = self._points.pop(key, None)
+            if cell is None:
+                return
+            bucket = self._cells[cell]
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+
+    def _candidates(self, lat, lon, radius_km):
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        cos_lat = min(cos(radians(lat_min)), cos(radians(lat_max)))
+        if cos_lat <= 1e-6 or radius_km / (KM_PER_DEG_LAT * cos_lat) >= 180:
+            # Near a pole or a huge radius: every longitude is in range
+            lon_cells = None
+        else:
+            dlon = radius_km / (KM_PER_DEG_LAT * cos_lat)
+            lon_lo = floor((lon - dlon) / self.cell_deg)
+            lon_hi = floor((lon + dlon) / self.cell_deg)
+            lon_cells = {self._wrap_lon(c) for c in range(lon_lo, lon_hi + 1)}
+
+        lat_lo = floor(lat_min / self.cell_deg)
+        lat_hi = floor(lat_max / self.cell_deg)
+
+        candidates = []
+        with self._lock:
+            probes = (lat_hi - lat_lo + 1) * (len(lon_cells) if lon_cells is not None else self._wrap)
+            if probes > len(self._cells):
+                # Fewer occupied cells than cells in range: walk the occupied ones
+                for (cell_lat, cell_lon), bucket in self._cells.items():
+                    if lat_lo <= cell_lat <= lat_hi and (lon_cells is None or cell_lon in lon_cells):
+                        candidates.extend(bucket.items())
+                return candidates
+
+            for cell_lat in range(lat_lo, lat_hi + 1):
+                for cell_lon in lon_cells:
+                    bucket = self._cells.get((cell_lat, cell_lon))
+                    if bucket:
+                        candidates.extend(bucket.items())
+        return candidates
+
+    def within_radius(self, lat, lon, radius_km):
+        """Return [(key, distance_km)] within radius_km, nearest first."""
+        candidates = self._candidates(lat, lon, radius_km)
+        if not candidates:
+            return []
+        lats = np.fromiter((point[0] for _, point in candidates), dtype=float, count=len(candidates))
+        lons = np.fromiter((point[1] for _, point in candidates), dtype=float, count=len(candidates))
+        distances, mask = distances_within_radius(lat, lon, lats, lons, radius_km)
+
+        results = [(candidates[i][0], float(distances[i])) for i in np.flatnonzero(mask)]
+        results.sort(key=lambda r: (r[1], r[0]))
+        return results
+
+    def nearest(self, lat, lon, k, max_radius_km=None):
+        """Return the k nearest [(key, distance_km)], nearest first."""
+        if k <= 0 or not self._points:
+            return []
+        # Grow the search radius until it holds k points (or everything)
+        radius = self.cell_deg * KM_PER_DEG_LAT
+        limit = max_radius_km if max_radius_km is not None else 20038.0  # half the earth's circumference
+        while True:
+            radius = min(radius, limit)
+            found = self.within_radius(lat, lon, radius)
+            if len(found) >= k or radius >= limit or len(found) == len(self._points):
+                return found[:k]
+            radius *= 2
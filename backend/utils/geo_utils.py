@@ -1,12 +1,49 @@
-from math import radians, cos, sin, asin, sqrt
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def calculate_distances(lat, lon, lats, lons):
+    """Haversine distance in km from one origin to arrays of points."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=float) - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box_mask(lat, lon, lats, lons, radius_km):
+    """Cheap prefilter: True for points inside the box around radius_km."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+    mask = np.abs(lats - lat) <= dlat
+
+    cos_lat = np.cos(np.radians(min(abs(lat) + dlat, 90.0)))
+    if cos_lat > 1e-6 and dlat / cos_lat < 180:
+        lon_diff = (lons - lon + 180.0) % 360.0 - 180.0
+        mask &= np.abs(lon_diff) <= dlat / cos_lat
+    return mask
+
+
+def distances_within_radius(lat, lon, lats, lons, radius_km):
+    """Return (distances, mask) for points within radius_km of the origin.
+
+    Haversine is only evaluated for points inside the bounding box; the
+    distance of every other point is reported as inf.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    distances = np.full(lats.shape, np.inf)
+    in_box = bounding_box_mask(lat, lon, lats, lons, radius_km)
+    distances[in_box] = calculate_distances(lat, lon, lats[in_box], lons[in_box])
+    return distances, distances <= radius_km
+
 
 def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Radius of Earth in km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return R * c
+    return float(calculate_distances(lat1, lon1, lat2, lon2))
+
 
 def is_within_radius(lat1, lon1, lat2, lon2, radius_km):
     distance = calculate_distance(lat1, lon1, lat2, lon2)
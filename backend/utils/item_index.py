@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right, insort
+from numbers import Real
+from operator import itemgetter
+from threading import RLock
+
+
+class ItemIndex:
+    """Inverted index from item name to supplier postings, sorted by price.
+
+    A posting is (price, supplier_id, item_position, quantity), where
+    item_position is the item's place in that supplier's `items` list.
+    A supplier is only "covered" while the index holds postings for the
+    exact `items` list object it is given; anything else falls back to a
+    plain scan in filter_suppliers.
+    """
+
+    def __init__(self, suppliers=()):
+        self._postings = {}           # name -> [posting] sorted by price
+        self._all_postings = []       # every posting, sorted by price
+        self._items_ref = {}          # supplier_id -> indexed items list
+        self._supplier_postings = {}  # supplier_id -> [(name, posting)]
+        self._lock = RLock()
+        for supplier in suppliers:
+            self._add(supplier, sort=False)
+        for postings in self._postings.values():
+            postings.sort()
+        self._all_postings.sort()
+
+    def __len__(self):
+        return len(self._items_ref)
+
+    def covers(self, supplier):
+        items = supplier.get("items")
+        return items is not None and self._items_ref.get(supplier.get("id")) is items
+
+    def add_supplier(self, supplier):
+        with self._lock:
+            self.remove_supplier(supplier.get("id"))
+            self._add(supplier, sort=True)
+
+    def _add(self, supplier, sort):
+        supplier_id = supplier.get("id")
+        items = supplier.get("items")
+        if supplier_id is None or not isinstance(items, (list, tuple)):
+            return
+
+        postings = []
+        for position, item in enumerate(items):
+            price = item.get("price", 0)
+            quantity = item.get("quantity", 0)
+            if not isinstance(price, Real) or not isinstance(quantity, Real) or price != price:
+                return  # Leave unusual records to the plain scan
+            postings.append((item.get("name", "").lower(), (price, supplier_id, position, quantity)))
+
+        for name, posting in postings:
+            if sort:
+                insort(self._postings.setdefault(name, []), posting)
+                insort(self._all_postings, posting)
+            else:
+                self._postings.setdefault(name, []).append(posting)
+                self._all_postings.append(posting)
+        self._items_ref[supplier_id] = items
+        self._supplier_postings[supplier_id] = postings
+
+    def remove_supplier(self, supplier_id):
+        with self._lock:
+            if self._items_ref.pop(supplier_id, None) is None:
+                return
+            for name, posting in self._supplier_postings.pop(supplier_id):
+                name_postings = self._postings[name]
+                del name_postings[bisect_left(name_postings, posting)]
+                del self._all_postings[bisect_left(self._all_postings, posting)]
+                if not name_postings:
+                    del self._postings[name]
+
+    @staticmethod
+    def _price_range(postings, min_price, max_price):
+        lo = bisect_left(postings, min_price, key=itemgetter(0)) if min_price else 0
+        hi = bisect_right(postings, max_price, key=itemgetter(0)) if max_price else len(postings)
+        return postings[lo:hi]
+
+    def match(self, items_filter, min_quantity, min_price, max_price, require_all_items):
+        """Map supplier_id -> sorted positions of matching items.
+
+        Mirrors filter_suppliers: falsy min_quantity/min_price/max_price
+        mean "no bound", and with items_filter a supplier must match all
+        (require_all_items) or any of the requested names.
+        """
+        positions = {}
+        with self._lock:
+            if items_filter:
+                names = set(items_filter)
+                names_matched = {}
+                for name in names:
+                    for _, supplier_id, position, quantity in self._price_range(
+                            self._postings.get(name, []), min_price, max_price):
+                        if min_quantity and quantity < min_quantity:
+                            continue
+                        positions.setdefault(supplier_id, []).append(position)
+                        names_matched.setdefault(supplier_id, set()).add(name)
+                if require_all_items:
+                    positions = {s: p for s, p in positions.items() if len(names_matched[s]) == len(names)}
+            else:
+                for _, supplier_id, position, quantity in self._price_range(
+                        self._all_postings, min_price, max_price):
+                    if min_quantity and quantity < min_quantity:
+                        continue
+                    positions.setdefault(supplier_id, []).append(position)
+
+        for supplier_positions in positions.values():
+            supplier_positions.sort()
+        return positions
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from firebase_config import db
+from utils.conditional import new_version
+from utils.constants import VENDOR_INVENTORY_COLLECTION
+
+# One document per vendor: {"vendor_id", "complete", "version", "updated_at", "items": {name: entry}}
+LOW_STOCK_COLLECTION = "low_stock"
+
+
+def is_low(item):
+    return bool(item) and "quantity" in item and "threshold" in item and item["quantity"] <= item["threshold"]
+
+
+def low_stock_changes(before, after):
+    """Map item name -> view update for items whose stock changed.
+
+    before/after are {name: item} for the touched items only (a missing
+    name means the item does not exist on that side). The update is an
+    entry to merge, DELETE_FIELD, or absent when the view is unaffected.
+    """
+    now = datetime.utcnow().isoformat()
+    changes = {}
+    for name in set(before) | set(after):
+        was_low = is_low(before.get(name))
+        now_low = is_low(after.get(name))
+        if now_low:
+            entry = dict(after[name])
+            entry.pop("usage", None)
+            entry["name"] = name
+            if not was_low:
+                entry["since"] = now
+            changes[name] = entry
+        elif was_low:
+            changes[name] = db.DELETE_FIELD
+    return changes
+
+
+def update_low_stock(vendor_id, before, after, transaction=None):
+    """Apply stock changes for a vendor to its low-stock view.
+
+    Pass the transaction/batch when called from one so the view commits
+    together with the inventory write.
+    """
+    changes = low_stock_changes(before, after)
+    if not changes:
+        return
+    ref = db.collection(LOW_STOCK_COLLECTION).document(vendor_id)
+    data = {"vendor_id": vendor_id, "items": changes, **new_version()}
+    if transaction is not None:
+        transaction.set(ref, data, merge=True)
+    else:
+        ref.set(data, merge=True)
+
+
+def get_low_stock(vendor_id):
+    """Low-stock entries for a vendor."""
+    return list(read_low_stock_view(vendor_id).get("items", {}).values())
+
+
+def read_low_stock_view(vendor_id):
+    """A vendor's low-stock view document: one read once the view exists."""
+    ref = db.collection(LOW_STOCK_COLLECTION).document(vendor_id)
+    doc = ref.get()
+    view = doc.to_dict() if doc.exists else {}
+    if view.get("complete"):
+        return view
+
+    # First lookup for this vendor: build the view from its inventory once
+    def backfill(transaction):
+        doc = ref.get(transaction=transaction)
+        view = doc.to_dict() if doc.exists else {}
+        if view.get("complete"):
+            return view
+
+        known = view.get("items", {})
+        items = {}
+        inventory_doc = db.collection(VENDOR_INVENTORY_COLLECTION).document(vendor_id).get(transaction=transaction)
+        inventory = (inventory_doc.to_dict() or {}).get("items") or {} if inventory_doc.exists else {}
+        for name, item in inventory.items():
+            if is_low(item):
+                entry = dict(item)
+                entry.pop("usage", None)
+                entry["name"] = name
+                entry["since"] = known.get(name, {}).get("since")
+                items[name] = entry
+        view = {"vendor_id": vendor_id, "complete": True, "items": items, **new_version()}
+        transaction.set(ref, view)
+        return view
+
+    return db.run_transaction(backfill)
@@ -0,0 +1,249 @@
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+from utils.constants import TIMING_HEADERS_ENABLED
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DATASTORE_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = _labels(self.labelnames, labels, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                label_text = _labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "proximart_http_requests_total", "HTTP requests by route, method and status.",
+    ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "proximart_http_request_duration_seconds", "Request latency, including streamed bodies.",
+    ("route", "method")))
+http_response_bytes = registry.register(Histogram(
+    "proximart_http_response_bytes", "Response body size.", ("route",), BYTES_BUCKETS))
+datastore_calls = registry.register(Histogram(
+    "proximart_request_datastore_calls", "Datastore calls per request.", ("route", "kind"), COUNT_BUCKETS))
+datastore_seconds = registry.register(Histogram(
+    "proximart_request_datastore_seconds", "Time spent in the datastore per request.", ("route", "kind")))
+datastore_documents = registry.register(Histogram(
+    "proximart_request_documents_read", "Documents streamed or fetched per request.", ("route",), COUNT_BUCKETS))
+datastore_operations = registry.register(Histogram(
+    "proximart_datastore_operation_seconds", "Latency of individual datastore operations.",
+    ("op",), DATASTORE_LATENCY_BUCKETS))
+
+write_behind_queue_depth = registry.register(Gauge(
+    "proximart_write_behind_queue_depth", "Requests waiting in write-behind queues.", ("queue",)))
+write_behind_batch_writes = registry.register(Histogram(
+    "proximart_write_behind_batch_writes", "Writes per write-behind group commit.", ("queue",), COUNT_BUCKETS))
+write_behind_rejected = registry.register(Counter(
+    "proximart_write_behind_rejected_total", "Requests turned away because a write-behind queue was full.",
+    ("queue",)))
+write_behind_dropped = registry.register(Counter(
+    "proximart_write_behind_dropped_writes_total", "Acknowledged writes given up on after failed commits.",
+    ("queue",)))
+
+event_subscribers = registry.register(Gauge(
+    "proximart_event_subscribers", "Open change-event streams in this process."))
+events_published = registry.register(Counter(
+    "proximart_events_published_total", "Change events published, by type.", ("type",)))
+events_dropped = registry.register(Counter(
+    "proximart_events_dropped_total", "Events discarded because a subscriber fell too far behind."))
+
+admission_queue_depth = registry.register(Gauge(
+    "proximart_admission_queue_depth", "Requests waiting for a concurrency slot, by route class.", ("class",)))
+admission_in_flight = registry.register(Gauge(
+    "proximart_admission_in_flight", "Admitted requests running, by route class.", ("class",)))
+admission_rejected = registry.register(Counter(
+    "proximart_admission_rejected_total", "Requests turned away by admission control, by route class and reason.",
+    ("class", "reason")))
+
+
+def new_request_stats():
+    return {"read": [0, 0.0], "write": [0, 0.0], "documents": 0}
+
+
+def record_datastore_call(kind, op, seconds, documents):
+    """Recorder for TracedStore: global per-op latency plus per-request totals."""
+    datastore_operations.observe((op,), seconds)
+    if has_request_context():
+        stats = g.setdefault("datastore_stats", new_request_stats())
+        stats[kind][0] += 1
+        stats[kind][1] += seconds
+        if kind == "read":
+            stats["documents"] += documents
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def _count_bytes(body, counter):
+    for chunk in body:
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def init_app(app):
+    """Record per-request metrics and optionally add Server-Timing headers."""
+    app.config.setdefault("TIMING_HEADERS", TIMING_HEADERS_ENABLED)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.datastore_stats = new_request_stats()
+
+    @app.after_request
+    def measure_response(response):
+        if response.is_streamed:
+            # Streamed bodies are counted as they are sent
+            g.response_bytes = [0]
+            response.response = _count_bytes(response.response, g.response_bytes)
+        else:
+            g.response_bytes = [response.calculate_content_length() or 0]
+
+        if app.config["TIMING_HEADERS"]:
+            stats = g.datastore_stats
+            elapsed = (time.perf_counter() - g.request_started) * 1000
+            response.headers["Server-Timing"] = (
+                f"app;dur={elapsed:.2f}, "
+                f"db-read;dur={stats['read'][1] * 1000:.2f};desc=\"{stats['read'][0]} calls, {stats['documents']} docs\", "
+                f"db-write;dur={stats['write'][1] * 1000:.2f};desc=\"{stats['write'][0]} calls\""
+            )
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        # Runs once the request context is popped, i.e. after a
+        # stream_with_context body has been fully sent
+        started = g.get("request_started")
+        if started is None:
+            return
+        route = _route()
+        status = g.get("response_status", 500)
+        stats = g.datastore_stats
+        http_requests.inc((route, request.method, str(status)))
+        http_latency.observe((route, request.method), time.perf_counter() - started)
+        http_response_bytes.observe((route,), g.get("response_bytes", [0])[0])
+        for kind in ("read", "write"):
+            datastore_calls.observe((route, kind), stats[kind][0])
+            datastore_seconds.observe((route, kind), stats[kind][1])
+        datastore_documents.observe((route,), stats["documents"])
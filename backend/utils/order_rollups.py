@@ -0,0 +1,148 @@
+from datetime import date, datetime, timedelta
+
+from firebase_config import db
+
+# One document per (vendor or supplier, period, bucket):
+# {"scope", "owner_id", "period", "bucket", "start",
+#  "placed": totals, "accepted": totals, "items": {name: {"placed": totals, "accepted": totals}}}
+# where totals are {"count", "quantity", "total_cost"}
+ROLLUP_COLLECTION = "order_rollups"
+PERIODS = ("day", "week")
+SCOPES = ("vendor", "supplier")
+EVENTS = ("placed", "accepted")
+
+
+def as_date(value):
+    """Date of a stored timestamp (ISO string or datetime)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def bucket_start(period, day):
+    """First day of the bucket `day` falls in (weeks start on Monday)."""
+    return day - timedelta(days=day.weekday()) if period == "week" else day
+
+
+def bucket_key(period, day):
+    """"2025-01-31" for days, ISO week "2025-W05" for weeks."""
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.isoformat()
+
+
+def rollup_id(scope, owner_id, period, key):
+    return f"{scope}:{owner_id}:{period}:{key}"
+
+
+def empty_totals():
+    return {"count": 0, "quantity": 0, "total_cost": 0.0}
+
+
+def accumulate(rollups, order, event, timestamp):
+    """Add one order event to in-memory rollups {doc_id: rollup}."""
+    day = as_date(timestamp)
+    quantity = sum(item.get("quantity", 0) for item in order.get("items", []))
+    for scope in SCOPES:
+        owner_id = order.get(f"{scope}_id")
+        if not owner_id:
+            continue
+        for period in PERIODS:
+            key = bucket_key(period, day)
+            doc_id = rollup_id(scope, owner_id, period, key)
+            rollup = rollups.get(doc_id)
+            if rollup is None:
+                rollup = rollups[doc_id] = {
+                    "scope": scope, "owner_id": owner_id, "period": period, "bucket": key,
+                    "start": bucket_start(period, day).isoformat(), "items": {},
+                }
+            totals = rollup.setdefault(event, empty_totals())
+            totals["count"] += 1
+            totals["quantity"] += quantity
+            totals["total_cost"] += order.get("total_cost", 0)
+            for item in order.get("items", []):
+                item_totals = rollup["items"].setdefault(item["name"], {}).setdefault(event, empty_totals())
+                item_totals["count"] += 1
+                item_totals["quantity"] += item.get("quantity", 0)
+                item_totals["total_cost"] += item.get("price", 0) * item.get("quantity", 0)
+
+
+def _increments(totals):
+    if isinstance(totals, dict):
+        return {key: _increments(value) for key, value in totals.items()}
+    return db.increment(totals)
+
+
+def rollup_writes(rollups):
+    """(ref, data, merge) writes adding in-memory rollups to the stored ones."""
+    writes = []
+    for doc_id, rollup in rollups.items():
+        data = {key: value for key, value in rollup.items() if key not in EVENTS and key != "items"}
+        for event in EVENTS:
+            if event in rollup:
+                data[event] = _increments(rollup[event])
+        data["items"] = _increments(rollup["items"])
+        writes.append((db.collection(ROLLUP_COLLECTION).document(doc_id), data, True))
+    return writes
+
+
+def record_orders(orders, event, timestamp, writer=None):
+    """Count orders as placed/accepted at `timestamp`, in the given batch/transaction if any."""
+    rollups = {}
+    for order in orders:
+        accumulate(rollups, order, event, timestamp)
+    for ref, data, merge in rollup_writes(rollups):
+        if writer is not None:
+            writer.set(ref, data, merge=merge)
+        else:
+            ref.set(data, merge=merge)
+
+
+def bucket_days(period, start, end):
+    """Bucket start days covering [start, end]."""
+    day = bucket_start(period, start)
+    step = timedelta(days=7 if period == "week" else 1)
+    days = []
+    while day <= end:
+        days.append(day)
+        day += step
+    return days
+
+
+def read_rollups(scope, owner_id, period, start, end):
+    """Stored rollups for every bucket in [start, end], oldest first, in one batched read."""
+    days = bucket_days(period, start, end)
+    refs = [db.collection(ROLLUP_COLLECTION).document(rollup_id(scope, owner_id, period, bucket_key(period, day)))
+            for day in days]
+    docs = {doc.id: doc for doc in db.get_all(refs)} if refs else {}
+    rollups = []
+    for ref, day in zip(refs, days):
+        doc = docs.get(ref.id)
+        rollup = doc.to_dict() if doc is not None and doc.exists else {}
+        rollups.append({
+            "bucket": bucket_key(period, day),
+            "start": day.isoformat(),
+            **{event: {**empty_totals(), **rollup.get(event, {})} for event in EVENTS},
+            "items": rollup.get("items", {}),
+        })
+    return rollups
+
+
+def summarize(rollups):
+    """Totals over several buckets, overall and per item."""
+    summary = {event: empty_totals() for event in EVENTS}
+    items = {}
+    for rollup in rollups:
+        for event in EVENTS:
+            for key, value in rollup[event].items():
+                summary[event][key] += value
+        for name, item in rollup["items"].items():
+            for event, totals in item.items():
+                item_summary = items.setdefault(name, {}).setdefault(event, empty_totals())
+                for key, value in totals.items():
+                    item_summary[key] += value
+    summary["items"] = items
+    return summary
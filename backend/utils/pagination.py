@@ -0,0 +1,42 @@
+import base64
+import json
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort key of the last item on a page."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; an empty token means "first page"."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def take_page(records, limit, apply_filters, chunk_size=200):
+    """Pull records in chunks through apply_filters until limit + 1 survive.
+
+    Returns (page, has_more) without consuming more of `records` than the
+    page needs.
+    """
+    page = []
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            page.extend(apply_filters(chunk))
+            chunk = []
+            if len(page) > limit:
+                break
+    if chunk:
+        page.extend(apply_filters(chunk))
+    return page[:limit], len(page) > limit
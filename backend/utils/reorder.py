@@ -0,0 +1,78 @@
+import math
+from datetime import datetime
+
+from utils.constants import REORDER_COVER_DAYS, REORDER_LEAD_DAYS, REORDER_RATE_WINDOW_DAYS
+from utils.low_stock import is_low
+
+
+def _days(later, earlier):
+    return (later - earlier).total_seconds() / 86400
+
+
+def decayed_usage(usage, now, window=REORDER_RATE_WINDOW_DAYS):
+    """(consumed, purchased) decayed sums as of `now`."""
+    if not usage:
+        return 0.0, 0.0
+    factor = math.exp(-max(_days(now, datetime.fromisoformat(usage["at"])), 0) / window)
+    return usage.get("consumed", 0) * factor, usage.get("purchased", 0) * factor
+
+
+def track_usage(before, after, now, window=REORDER_RATE_WINDOW_DAYS):
+    """Item `after` with its rolling usage updated for the quantity change since `before`.
+
+    A drop in quantity counts as consumption, a rise as a purchase. Usage
+    is kept on the item as decayed sums, so a rate needs no history scan.
+    """
+    if not before or not after or "quantity" not in before or "quantity" not in after:
+        return after
+    change = after["quantity"] - before["quantity"]
+    if not change:
+        return after
+    usage = before.get("usage")
+    consumed, purchased = decayed_usage(usage, now, window)
+    if change < 0:
+        consumed -= change
+    else:
+        purchased += change
+    at = now.isoformat()
+    return {**after, "usage": {"consumed": consumed, "purchased": purchased, "at": at,
+                               "since": usage["since"] if usage else at}}
+
+
+def usage_rate(usage, now, window=REORDER_RATE_WINDOW_DAYS):
+    """Units per day of recent consumption; 0 if none was recorded (purchases alone are not usage)."""
+    consumed, _ = decayed_usage(usage, now, window)
+    if not usage or not consumed:
+        return 0.0
+    # Weight of the observed span under the decay, so young items are not underestimated
+    span = max(_days(now, datetime.fromisoformat(usage["since"])), 1.0)
+    return consumed / (window * (1 - math.exp(-span / window)))
+
+
+def reorder_suggestions(items, now, lead_days=REORDER_LEAD_DAYS, cover_days=REORDER_COVER_DAYS):
+    """Items due for reordering, soonest stockout first.
+
+    items is {name: item}. An item is due when it is at or below its
+    threshold or its stock lasts no longer than lead_days at the current
+    rate; the suggested quantity refills it for lead_days + cover_days on
+    top of the threshold.
+    """
+    suggestions = []
+    for name, item in items.items():
+        quantity = item.get("quantity", 0)
+        threshold = item.get("threshold", 0)
+        rate = usage_rate(item.get("usage"), now)
+        days_left = quantity / rate if rate else None
+        if not (is_low(item) or (days_left is not None and quantity <= rate * lead_days + threshold)):
+            continue
+        target = math.ceil(rate * (lead_days + cover_days)) + threshold
+        suggestions.append({
+            "name": name,
+            "quantity": quantity,
+            "threshold": threshold,
+            "daily_usage": round(rate, 2),
+            "days_left": round(days_left, 1) if days_left is not None else None,
+            "reorder_quantity": max(target - quantity, 1),
+        })
+    suggestions.sort(key=lambda s: (s["days_left"] is None, s["days_left"] or 0, s["name"]))
+    return suggestions
@@ -0,0 +1,215 @@
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from operator import itemgetter
+from threading import RLock
+
+from utils.constants import (SEARCH_ITEM_WEIGHT, SEARCH_MAX_PREFIX_EXPANSIONS, SEARCH_MIN_SIMILARITY,
+                             SEARCH_SYNONYMS)
+
+_WORD = re.compile(r"[^\W_]+")
+# Which posting set a word is in: supplier name/id or item name
+NAME, ITEM = 0, 1
+# Score of a word reached through SEARCH_SYNONYMS rather than typed as is
+SYNONYM_SCORE = 0.95
+
+
+def words(text):
+    """Lower-case words (runs of letters/digits) of text."""
+    return _WORD.findall(str(text).lower())
+
+
+def trigrams(word):
+    """Padded trigrams of a word, as pg_trgm builds them ("  t", " to", "tom", ...)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Word index over supplier names, ids and item names for ranked, typo-tolerant search.
+
+    Each query word matches indexed words exactly, through SEARCH_SYNONYMS,
+    as a prefix, or by trigram similarity (non-numeric words only). The
+    same trigrams answer substring_matches(), the plain substring search. A
+    supplier matches when every query word does; its score adds up the best
+    match per query word, item-name matches weighted by SEARCH_ITEM_WEIGHT.
+    Like ItemIndex, a supplier is only "covered" while the index holds the
+    name and items list object it is given.
+    """
+
+    def __init__(self, suppliers=(), synonyms=SEARCH_SYNONYMS, min_similarity=SEARCH_MIN_SIMILARITY,
+                 max_prefix_expansions=SEARCH_MAX_PREFIX_EXPANSIONS):
+        self._synonyms = synonyms
+        self._min_similarity = min_similarity
+        self._max_prefix_expansions = max_prefix_expansions
+        self._postings = {}        # word -> ({supplier_id} by NAME, {supplier_id} by ITEM)
+        self._trigrams = {}        # trigram -> {word}
+        self._trigram_counts = {}  # word -> number of trigrams
+        self._vocabulary = []      # sorted words, for prefix lookups
+        self._supplier_words = {}  # supplier_id -> {word: NAME or ITEM}
+        self._indexed = {}         # supplier_id -> (name, items) as indexed
+        self._lock = RLock()
+        for supplier in suppliers:
+            self._add(supplier, sort=False)
+        self._vocabulary.sort()
+
+    def __len__(self):
+        return len(self._indexed)
+
+    def covers(self, supplier):
+        indexed = self._indexed.get(supplier.get("id"))
+        return indexed is not None and indexed[0] == supplier.get("name") and indexed[1] is supplier.get("items")
+
+    def add_supplier(self, supplier):
+        with self._lock:
+            self.remove_supplier(supplier.get("id"))
+            self._add(supplier, sort=True)
+
+    def _fields(self, supplier):
+        """{word: NAME or ITEM} for a supplier; a word in both counts as NAME."""
+        fields = dict.fromkeys(words(supplier.get("name") or "") + words(supplier.get("id")), NAME)
+        for item in supplier.get("items") or ():
+            for word in words(item.get("name") or ""):
+                fields.setdefault(word, ITEM)
+        # Index Hindi spellings under the catalog name too, so either finds the supplier
+        for word, field in list(fields.items()):
+            alias = self._synonyms.get(word)
+            if alias:
+                fields.setdefault(alias, field)
+        return fields
+
+    def _add(self, supplier, sort):
+        supplier_id = supplier.get("id")
+        if supplier_id is None:
+            return
+        fields = self._fields(supplier)
+        for word, field in fields.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = (set(), set())
+                if sort:
+                    insort(self._vocabulary, word)
+                else:
+                    self._vocabulary.append(word)
+                word_trigrams = trigrams(word)
+                self._trigram_counts[word] = len(word_trigrams)
+                for trigram in word_trigrams:
+                    self._trigrams.setdefault(trigram, set()).add(word)
+            postings[field].add(supplier_id)
+        self._supplier_words[supplier_id] = fields
+        self._indexed[supplier_id] = (supplier.get("name"), supplier.get("items"))
+
+    def remove_supplier(self, supplier_id):
+        with self._lock:
+            if self._indexed.pop(supplier_id, None) is None:
+                return
+            for word, field in self._supplier_words.pop(supplier_id).items():
+                postings = self._postings[word]
+                postings[field].discard(supplier_id)
+                if postings[NAME] or postings[ITEM]:
+                    continue
+                del self._postings[word]
+                del self._vocabulary[bisect_left(self._vocabulary, word)]
+                del self._trigram_counts[word]
+                for trigram in trigrams(word):
+                    trigram_words = self._trigrams[trigram]
+                    trigram_words.discard(word)
+                    if not trigram_words:
+                        del self._trigrams[trigram]
+
+    def _word_matches(self, query_word):
+        """Indexed word -> similarity (0..1] for one query word."""
+        matches = {}
+        if query_word in self._postings:
+            matches[query_word] = 1.0
+        alias = self._synonyms.get(query_word)
+        if alias in self._postings:
+            matches.setdefault(alias, SYNONYM_SCORE)
+
+        start = bisect_left(self._vocabulary, query_word)
+        for word in self._vocabulary[start:start + self._max_prefix_expansions]:
+            if not word.startswith(query_word):
+                break
+            score = 0.5 + 0.5 * len(query_word) / len(word)
+            if score > matches.get(word, 0):
+                matches[word] = score
+
+        if len(query_word) >= 3 and not query_word.isdigit():
+            query_trigrams = trigrams(query_word)
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigrams.get(trigram, ()))
+            for word, count in shared.items():
+                if word.isdigit():
+                    continue
+                similarity = count / (len(query_trigrams) + self._trigram_counts[word] - count)
+                if similarity >= self._min_similarity and similarity > matches.get(word, 0):
+                    matches[word] = similarity
+        return matches
+
+    def _words_containing(self, fragment):
+        """Indexed words that contain fragment, found through their trigrams."""
+        if len(fragment) >= 3:
+            # Every word containing fragment has each of its trigrams; start from the rarest
+            candidates = min((self._trigrams.get(fragment[i:i + 3], ()) for i in range(len(fragment) - 2)), key=len)
+        else:
+            candidates = set().union(*(trigram_words for trigram, trigram_words in self._trigrams.items()
+                                       if fragment in trigram))
+        return [word for word in candidates if fragment in word]
+
+    def substring_matches(self, term):
+        """Ids of suppliers whose lower-cased name or id contains term, as the plain search finds them.
+
+        Candidates come from the indexed name/id words containing the
+        longest word of term, so only those suppliers are checked. None
+        when term has no letters or digits to look up.
+        """
+        fragments = words(term)
+        if not fragments:
+            return None
+        fragment = max(fragments, key=len)
+        matches = set()
+        with self._lock:
+            checked = set()
+            for word in self._words_containing(fragment):
+                for supplier_id in self._postings[word][NAME] - checked:
+                    checked.add(supplier_id)
+                    if term in str(self._indexed[supplier_id][0] or "").lower() or term in str(supplier_id).lower():
+                        matches.add(supplier_id)
+        return matches
+
+    def _contributions(self, word_matches):
+        """(score, supplier ids) pairs for one query word's matches, best first."""
+        contributions = []
+        for word, similarity in word_matches.items():
+            by_name, by_item = self._postings[word]
+            contributions.append((similarity, by_name))
+            contributions.append((similarity * SEARCH_ITEM_WEIGHT, by_item))
+        contributions.sort(key=itemgetter(0), reverse=True)
+        return contributions
+
+    def search(self, term):
+        """Map supplier_id -> relevance score for suppliers matching every word of term."""
+        query = list(dict.fromkeys(words(term)))
+        if not query:
+            return {}
+
+        with self._lock:
+            per_word = [self._contributions(self._word_matches(query_word)) for query_word in query]
+            # Start from the query word with the fewest candidate suppliers
+            per_word.sort(key=lambda contributions: sum(len(ids) for _, ids in contributions))
+
+            scores = {}
+            for score, supplier_ids in reversed(per_word[0]):
+                # Lowest first, so each supplier ends up with its best score
+                scores.update(dict.fromkeys(supplier_ids, score))
+
+            for contributions in per_word[1:]:
+                narrowed = {}
+                for supplier_id, score in scores.items():
+                    for word_score, supplier_ids in contributions:
+                        if supplier_id in supplier_ids:
+                            narrowed[supplier_id] = score + word_score
+                            break
+                scores = narrowed
+        return scores
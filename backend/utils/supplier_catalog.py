@@ -0,0 +1,252 @@
+import time
+from bisect import bisect_right
+from threading import RLock
+
+from firebase_config import db
+from utils.cache import TTLCache
+from utils.conditional import bump_version
+from utils.geo_index import GeoIndex
+from utils.item_index import ItemIndex
+from utils.search_index import SearchIndex
+from utils.constants import SUPPLIER_CACHE_TTL_SECONDS, SUPPLIER_CACHE_MAX_SIZE
+from utils.supplier_records import SupplierRecord
+
+def index_location(index, record):
+    """Place (or move) a supplier in a GeoIndex; one without a usable location is left out."""
+    location = record.get("location")
+    if location and "lat" in location and "lon" in location:
+        index.add(record["id"], location["lat"], location["lon"])
+    else:
+        index.remove(record["id"])
+
+
+# Sort keys for ordered iteration; each ends with the id so keys are unique
+SORT_KEYS = {
+    "id": lambda record: (record["id"],),
+    "rating": lambda record: (-float(record.get("rating") or 0), record["id"]),
+}
+
+
+class SupplierCatalog:
+    """Process-level cache of supplier records ({...doc, "id": doc.id}).
+
+    The full listing is cached as one snapshot (when it fits in max_size);
+    individual records sit in a TTL/LRU cache for id lookups. Writes made
+    through this process go through put()/invalidate(); writes from other
+    processes become visible once the TTL runs out.
+
+    Records are held as read-only SupplierRecords. records()/get_records()
+    hand those out without copying; all()/get_many() return plain dicts.
+    """
+
+    def __init__(self, db, ttl=SUPPLIER_CACHE_TTL_SECONDS, max_size=SUPPLIER_CACHE_MAX_SIZE, clock=time.monotonic):
+        self._db = db
+        self._clock = clock
+        self._records = TTLCache(maxsize=max_size, ttl=ttl, clock=clock)
+        self._listing = None
+        self._listing_expires_at = 0.0
+        self._item_index = None
+        self._search_index = None
+        self._geo_index = None
+        self._orders = {}
+        self._lock = RLock()
+        self._generation = 0
+        self._version = None  # stored data version the cached listing is known to include
+
+    @property
+    def ttl(self):
+        return self._records.ttl
+
+    @property
+    def max_size(self):
+        return self._records.maxsize
+
+    @staticmethod
+    def _record(doc):
+        data = doc.to_dict()
+        data["id"] = doc.id
+        return SupplierRecord.from_dict(data)
+
+    def _valid_listing(self):
+        if self._listing is not None and self._listing_expires_at > self._clock():
+            return self._listing
+        self._listing = None
+        self._item_index = None
+        self._search_index = None
+        self._geo_index = None
+        self._orders = {}
+        return None
+
+    def all(self):
+        """Every supplier as a plain dict, in document id order."""
+        return [record.to_dict() for record in self.records()]
+
+    def records(self):
+        """Every SupplierRecord, in document id order (shared, do not mutate)."""
+        with self._lock:
+            listing = self._valid_listing()
+            if listing is not None:
+                self._records.hits += 1
+                return list(listing.values())
+            self._records.misses += 1
+            generation = self._generation
+
+        listing = {doc.id: self._record(doc) for doc in self._db.collection("suppliers").stream()}
+        with self._lock:
+            # Skip caching if a write landed while the listing was streaming
+            if self.ttl > 0 and len(listing) <= self.max_size and generation == self._generation:
+                self._listing = listing
+                self._listing_expires_at = self._clock() + self.ttl
+                self._item_index = None
+                self._search_index = None
+                self._geo_index = None
+                self._orders = {}
+        return list(listing.values())
+
+    def get_many(self, supplier_ids):
+        """Plain dicts for the given ids (missing suppliers are left out), in input order."""
+        return [record.to_dict() for record in self.get_records(supplier_ids)]
+
+    def get_records(self, supplier_ids):
+        """SupplierRecords for the given ids (missing suppliers are left out), in input order."""
+        found = {}
+        missing = []
+        with self._lock:
+            listing = self._valid_listing()
+            for supplier_id in supplier_ids:
+                if listing is not None:
+                    record = listing.get(supplier_id)
+                    if record is not None:
+                        self._records.hits += 1
+                        found[supplier_id] = record
+                        continue
+                record = self._records.get(supplier_id)
+                if record is not None:
+                    found[supplier_id] = record
+                else:
+                    missing.append(supplier_id)
+
+        if missing:
+            refs = [self._db.collection("suppliers").document(supplier_id) for supplier_id in missing]
+            for doc in self._db.get_all(refs):
+                if doc.exists:
+                    record = self._record(doc)
+                    self._records.set(doc.id, record)
+                    found[doc.id] = record
+
+        return [found[supplier_id] for supplier_id in supplier_ids if supplier_id in found]
+
+    def get(self, supplier_id):
+        records = self.get_many([supplier_id])
+        return records[0] if records else None
+
+    def item_index(self):
+        """ItemIndex over the cached listing, or None when nothing is cached."""
+        with self._lock:
+            listing = self._valid_listing()
+            if listing is None:
+                return None
+            if self._item_index is None:
+                self._item_index = ItemIndex(listing.values())
+            return self._item_index
+
+    def search_index(self):
+        """SearchIndex over the cached listing, or None when nothing is cached."""
+        with self._lock:
+            listing = self._valid_listing()
+            if listing is None:
+                return None
+            if self._search_index is None:
+                self._search_index = SearchIndex(listing.values())
+            return self._search_index
+
+    def geo_index(self):
+        """GeoIndex of the cached listing's locations, or None when nothing is cached.
+
+        Like the other indexes it is rebuilt with the listing, so suppliers
+        added by other processes show up within one TTL.
+        """
+        with self._lock:
+            listing = self._valid_listing()
+            if listing is None:
+                return None
+            if self._geo_index is None:
+                self._geo_index = GeoIndex()
+                for record in listing.values():
+                    index_location(self._geo_index, record)
+            return self._geo_index
+
+    def iter_ordered(self, order, after=None):
+        """Cached records in SORT_KEYS[order] order, starting after key `after`.
+
+        Returns None when the listing is not cached.
+        """
+        with self._lock:
+            listing = self._valid_listing()
+            if listing is None:
+                return None
+            keys = self._orders.get(order)
+            if keys is None:
+                keys = self._orders[order] = sorted(SORT_KEYS[order](record) for record in listing.values())
+            start = bisect_right(keys, tuple(after)) if after else 0
+            ids = [key[-1] for key in keys[start:]]
+        return (listing[supplier_id] for supplier_id in ids if supplier_id in listing)
+
+    def sync_version(self, token):
+        """Drop the cached listing unless it is known to include the catalog's
+        stored version `token`, so responses match their ETag even after a
+        write made by another process."""
+        with self._lock:
+            if token != self._version:
+                self._drop_listing()
+                self._version = token
+
+    def _drop_listing(self):
+        self._generation += 1
+        self._listing = None
+        self._item_index = None
+        self._search_index = None
+        self._geo_index = None
+        self._orders = {}
+
+    def put(self, supplier_id, data):
+        """Write-through after a supplier document was written."""
+        record = SupplierRecord.from_dict({**data, "id": supplier_id})
+        token = bump_version("suppliers", self._db)
+        with self._lock:
+            self._version = token
+            self._generation += 1
+            self._records.set(supplier_id, record)
+            listing = self._valid_listing()
+            if listing is not None:
+                previous = listing.get(supplier_id)
+                listing[supplier_id] = record
+                if previous is None:
+                    self._listing = dict(sorted(listing.items()))
+                if previous is None or previous.get("rating") != record.get("rating"):
+                    self._orders = {}
+                if self._item_index is not None:
+                    self._item_index.add_supplier(record)
+                if self._search_index is not None:
+                    self._search_index.add_supplier(record)
+                if self._geo_index is not None:
+                    index_location(self._geo_index, record)
+
+    def invalidate(self, supplier_id=None):
+        token = bump_version("suppliers", self._db)
+        with self._lock:
+            self._drop_listing()
+            self._version = token
+            if supplier_id is None:
+                self._records.clear()
+            else:
+                self._records.pop(supplier_id)
+
+    def stats(self):
+        with self._lock:
+            stats = self._records.stats()
+            stats["listing_cached"] = self._valid_listing() is not None
+            return stats
+
+
+supplier_catalog = SupplierCatalog(db)
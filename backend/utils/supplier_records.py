@@ -0,0 +1,129 @@
+import sys
+
+_MISSING = object()
+SUPPLIER_FIELDS = ("name", "location", "rating", "items")
+ITEM_FIELDS = ("name", "price", "quantity")
+# Fields read straight from their slot (location may need rebuilding into a dict)
+_PLAIN_FIELDS = frozenset(("id", "name", "rating", "items"))
+
+
+class ItemRecord:
+    """Compact, read-only supplier item: name/price/quantity plus any other keys in `extra`."""
+
+    __slots__ = ("name", "price", "quantity", "extra")
+
+    def __init__(self, item):
+        name = item.get("name", _MISSING)
+        self.name = sys.intern(name) if isinstance(name, str) else name
+        self.price = item.get("price", _MISSING)
+        self.quantity = item.get("quantity", _MISSING)
+        extra = {key: value for key, value in item.items() if key not in ITEM_FIELDS}
+        self.extra = extra or None
+
+    def get(self, key, default=None):
+        if key in ITEM_FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self):
+        data = {key: getattr(self, key) for key in ITEM_FIELDS if getattr(self, key) is not _MISSING}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class SupplierRecord:
+    """Compact, read-only cached supplier ({...doc, "id": doc.id}).
+
+    Items become ItemRecords in a tuple, a plain {"lat", "lon"} location is
+    kept as a (lat, lon) tuple and item names are interned. Supports the
+    dict reads filter_suppliers does (get / []); use replace() to derive a
+    filtered copy and to_dict() to serialize.
+    """
+
+    __slots__ = ("id", "name", "location", "rating", "items", "extra")
+
+    def __init__(self, supplier_id, name, location, rating, items, extra):
+        self.id = supplier_id
+        self.name = name
+        self.location = location
+        self.rating = rating
+        self.items = items
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        location = data.get("location", _MISSING)
+        if isinstance(location, dict) and location.keys() == {"lat", "lon"}:
+            location = (location["lat"], location["lon"])
+        items = data.get("items", _MISSING)
+        if isinstance(items, list) and all(isinstance(item, dict) for item in items):
+            items = tuple(ItemRecord(item) for item in items)
+        extra = {key: value for key, value in data.items() if key not in SUPPLIER_FIELDS and key != "id"}
+        return cls(data["id"], data.get("name", _MISSING), location, data.get("rating", _MISSING), items,
+                   extra or None)
+
+    def _field(self, key):
+        value = getattr(self, key)
+        if key == "location" and isinstance(value, tuple):
+            return {"lat": value[0], "lon": value[1]}
+        return value
+
+    def get(self, key, default=None):
+        if key in _PLAIN_FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if key == "location":
+            value = self._field(key)
+            return default if value is _MISSING else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def replace(self, **fields):
+        """Copy with some fields changed; unknown keys (e.g. distance_km) go to extra."""
+        record = SupplierRecord(self.id, self.name, self.location, self.rating, self.items, self.extra)
+        for key, value in fields.items():
+            if key in SUPPLIER_FIELDS:
+                setattr(record, key, tuple(value) if key == "items" else value)
+            else:
+                record.extra = {**(record.extra or {}), key: value}
+        return record
+
+    def to_dict(self):
+        data = {}
+        for key in SUPPLIER_FIELDS:
+            value = self._field(key)
+            if value is _MISSING:
+                continue
+            if key == "items" and isinstance(value, (list, tuple)):
+                value = [item.to_dict() if isinstance(item, ItemRecord) else item for item in value]
+            data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        data["id"] = self.id
+        return data
+
+
+def as_dict(supplier):
+    """Plain dict for a SupplierRecord or an already-plain supplier dict."""
+    return supplier.to_dict() if isinstance(supplier, SupplierRecord) else supplier
+
+
+def with_items(supplier, items):
+    """Supplier with its items replaced: dicts in place, records as a copy."""
+    if isinstance(supplier, SupplierRecord):
+        return supplier.replace(items=items)
+    supplier["items"] = items
+    return supplier
@@ -0,0 +1,152 @@
+import random
+from datetime import datetime, timedelta
+
+from utils.constants import COMMON_ITEMS, BULK_IMPORT_BATCH_SIZE, VENDOR_INVENTORY_COLLECTION
+
+# Market clusters (lat, lon) that suppliers and vendors are spread around
+CITY_CENTERS = [
+    (28.6139, 77.2090),  # Delhi
+    (19.0760, 72.8777),  # Mumbai
+    (12.9716, 77.5946),  # Bengaluru
+    (22.5726, 88.3639),  # Kolkata
+    (13.0827, 80.2707),  # Chennai
+    (17.3850, 78.4867),  # Hyderabad
+    (26.9124, 75.7873),  # Jaipur
+    (30.3165, 78.0322),  # Dehradun
+]
+
+ITEM_NAMES = COMMON_ITEMS + [
+    "sugar", "salt", "flour", "butter", "milk", "curd", "ginger", "garlic",
+    "chilli", "coriander", "lemon", "cabbage", "carrot", "peas", "besan",
+    "ghee", "tea", "coffee", "eggs", "chicken", "noodles", "ketchup",
+]
+
+# Spread of each cluster in degrees (~15 km)
+CLUSTER_SPREAD_DEG = 0.15
+
+
+def item_names(count):
+    """ITEM_NAMES, padded with numbered variants when a bigger catalog is asked for."""
+    names = list(ITEM_NAMES[:count])
+    variant = 1
+    while len(names) < count:
+        names.extend(f"{name} {variant}" for name in ITEM_NAMES[:count - len(names)])
+        variant += 1
+    return names
+
+
+class MarketplaceGenerator:
+    """Deterministic synthetic suppliers, vendor inventories and orders.
+
+    The same seed and sizes always produce the same documents, so benchmark
+    runs on different commits work on identical data.
+    """
+
+    def __init__(self, seed=0, suppliers=1000, vendors=100, orders_per_vendor=20,
+                 items_per_supplier=12, items_per_vendor=10):
+        self.seed = seed
+        self.suppliers = suppliers
+        self.vendors = vendors
+        self.orders_per_vendor = orders_per_vendor
+        self.items_per_supplier = items_per_supplier
+        self.supplier_item_names = item_names(max(items_per_supplier, len(ITEM_NAMES)))
+        self.items_per_vendor = min(items_per_vendor, len(ITEM_NAMES))
+
+    def _rng(self, stream):
+        # Independent stream per collection so resizing one leaves the others unchanged
+        return random.Random(f"{self.seed}:{stream}")
+
+    @staticmethod
+    def location(rng):
+        lat, lon = rng.choice(CITY_CENTERS)
+        return {
+            "lat": round(rng.gauss(lat, CLUSTER_SPREAD_DEG), 6),
+            "lon": round(rng.gauss(lon, CLUSTER_SPREAD_DEG), 6),
+        }
+
+    @staticmethod
+    def supplier_id(index):
+        return f"supplier_{index:07d}"
+
+    @staticmethod
+    def vendor_id(index):
+        return f"vendor_{index:06d}"
+
+    def iter_suppliers(self):
+        """Yield (supplier_id, supplier_data)."""
+        rng = self._rng("suppliers")
+        for index in range(self.suppliers):
+            items = [
+                {
+                    "name": name,
+                    "price": round(rng.uniform(5, 500), 2),
+                    "quantity": rng.randint(0, 1000),
+                }
+                for name in rng.sample(self.supplier_item_names, self.items_per_supplier)
+            ]
+            yield self.supplier_id(index), {
+                "name": f"Supplier {index}",
+                "location": self.location(rng),
+                "items": items,
+                "rating": round(rng.uniform(1, 5), 1),
+            }
+
+    def iter_inventory(self):
+        """Yield (vendor_id, vendor_inventory_doc) for every vendor's stock."""
+        rng = self._rng("inventory")
+        for vendor in range(self.vendors):
+            vendor_id = self.vendor_id(vendor)
+            items = {}
+            for name in rng.sample(ITEM_NAMES, self.items_per_vendor):
+                items[name] = {
+                    "id": f"{vendor_id}_{name}",
+                    "vendor_id": vendor_id,
+                    "name": name,
+                    "price": round(rng.uniform(5, 500), 2),
+                    "quantity": rng.randint(0, 200),
+                    "threshold": rng.randint(0, 20),
+                }
+            yield vendor_id, {"vendor_id": vendor_id, "items": items}
+
+    def iter_orders(self, now=datetime(2025, 1, 1)):
+        """Yield (order_id, order_data) spread over the 180 days before `now`."""
+        if not self.suppliers:
+            return
+        rng = self._rng("orders")
+        for vendor in range(self.vendors):
+            vendor_id = self.vendor_id(vendor)
+            for number in range(self.orders_per_vendor):
+                items = [
+                    {"name": name, "quantity": rng.randint(1, 20), "price": round(rng.uniform(5, 500), 2)}
+                    for name in rng.sample(ITEM_NAMES, rng.randint(1, 4))
+                ]
+                timestamp = now - timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+                yield f"{vendor_id}_order_{number:05d}", {
+                    "vendor_id": vendor_id,
+                    "supplier_id": self.supplier_id(rng.randrange(self.suppliers)),
+                    "items": items,
+                    "total_cost": round(sum(i["price"] * i["quantity"] for i in items), 2),
+                    "status": rng.choice(["pending", "accepted"]),
+                    "timestamp": timestamp.isoformat(),
+                }
+
+    def populate(self, db, batch_size=BULK_IMPORT_BATCH_SIZE):
+        """Write every generated document to db; returns counts per collection."""
+        counts = {}
+        for collection, docs in (("suppliers", self.iter_suppliers()),
+                                 (VENDOR_INVENTORY_COLLECTION, self.iter_inventory()),
+                                 ("orders", self.iter_orders())):
+            batch = db.batch()
+            pending = 0
+            counts[collection] = 0
+            for doc_id, data in docs:
+                batch.set(db.collection(collection).document(doc_id), data)
+                pending += 1
+                counts[collection] += 1
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+            if pending:
+                batch.commit()
+        return counts
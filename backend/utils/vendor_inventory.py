@@ -0,0 +1,104 @@
+"""Shared accessor for vendor inventories.
+
+Each vendor's inventory is one document, vendor_inventory/<vendor_id>:
+
+    {"vendor_id": ..., "version", "updated_at",
+     "items": {name: {"id", "vendor_id", "name", "price", "quantity", "threshold"}}}
+
+keyed by the normalized (stripped, lower-case) item name, so the whole
+inventory is a single read and an item change is a merge write of one map
+entry. Every route reads and writes inventory through here; writes also
+keep the low-stock view in step, and inventory_committed() announces them
+once committed.
+"""
+import uuid
+from datetime import datetime
+
+from firebase_config import db
+from utils.conditional import new_version, versions
+from utils.constants import VENDOR_INVENTORY_COLLECTION
+from utils.events import event_bus, vendor_channel
+from utils.low_stock import is_low, update_low_stock
+from utils.reorder import track_usage
+
+
+def item_key(name):
+    return str(name).strip().lower()
+
+
+def inventory_ref(vendor_id):
+    return db.collection(VENDOR_INVENTORY_COLLECTION).document(vendor_id)
+
+
+def items_from_doc(doc):
+    """{name: item} from a vendor_inventory snapshot (empty if it does not exist)."""
+    if not doc.exists:
+        return {}
+    return dict((doc.to_dict() or {}).get("items") or {})
+
+
+def read_inventory(vendor_id, transaction=None):
+    """{name: item} for a vendor, in one document read."""
+    return items_from_doc(inventory_ref(vendor_id).get(transaction=transaction))
+
+
+def version_keys(vendor_id):
+    """Shared version-table keys of the GETs served from a vendor's inventory and low-stock documents."""
+    return f"inventory:{vendor_id}", f"low_stock:{vendor_id}"
+
+
+def list_items(items):
+    """Items of a {name: item} map as a list, ordered by name, without their internal usage."""
+    return [{key: value for key, value in items[name].items() if key != "usage"} for name in sorted(items)]
+
+
+def new_item(vendor_id, item):
+    """A new inventory entry with its own id, as the per-item documents used to have."""
+    return {"id": uuid.uuid4().hex[:20], "vendor_id": vendor_id, **item}
+
+
+def save_items(vendor_id, before, after, writer=None):
+    """Write changed items and the low-stock view for one vendor.
+
+    before/after are {name: item} for the touched items only: names in
+    `after` are written whole, names only in `before` are removed. Quantity
+    changes also update the item's rolling usage (see utils/reorder.py).
+    Each write stamps a new version for conditional GETs. Pass the
+    batch/transaction as `writer` so both commit together.
+    Returns `after` as written.
+    """
+    now = datetime.utcnow()
+    after = {name: track_usage(before.get(name), item, now) for name, item in after.items()}
+    changes = dict(after)
+    changes.update({name: db.DELETE_FIELD for name in before if name not in after})
+    if changes:
+        data = {"vendor_id": vendor_id, "items": changes, **new_version(now)}
+        if writer is not None:
+            writer.set(inventory_ref(vendor_id), data, merge=True)
+        else:
+            inventory_ref(vendor_id).set(data, merge=True)
+    update_low_stock(vendor_id, before, after, transaction=writer)
+    return after
+
+
+def inventory_committed(vendor_id, before, after):
+    """Call once a save_items() write has committed, with the same before/after.
+
+    Drops the vendor's versions from the shared table, so conditional GETs
+    read the new ones, then publishes an "inventory_changed" event, plus a
+    "low_stock" event for items that just dropped to their threshold, to
+    the vendor's event stream.
+    """
+    versions.forget(*version_keys(vendor_id))
+    channel = vendor_channel(vendor_id)
+    event_bus.publish(channel, "inventory_changed", {
+        "vendor_id": vendor_id,
+        "updated": sorted(after),
+        "removed": sorted(name for name in before if name not in after),
+    })
+    low = [
+        {"name": name, "quantity": item["quantity"], "threshold": item["threshold"]}
+        for name, item in sorted(after.items()) if is_low(item) and not is_low(before.get(name))
+    ]
+    if low:
+        event_bus.publish(channel, "low_stock", {"vendor_id": vendor_id, "items": low})
@@ -0,0 +1,156 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from firebase_config import db
+from utils.constants import (WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_LINGER_SECONDS, WRITE_BEHIND_MAX_QUEUE,
+                             WRITE_BEHIND_RETRIES, WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS)
+from utils.metrics import write_behind_batch_writes, write_behind_dropped, write_behind_queue_depth, write_behind_rejected
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """The write-behind queue stayed full for the whole submit timeout, or is shut down."""
+
+
+class WriteBehindQueue:
+    """Group-commits acknowledged writes on a background thread.
+
+    submit() queues one request's writes ([(ref, data, merge), ...], always
+    committed in the same batch) and returns at once; refs carry their
+    client-side ids, so callers can answer with them straight away. The
+    worker drains the queue into batches of up to batch_size writes,
+    waiting at most `linger` seconds for a batch to fill, so a burst costs
+    one commit per batch instead of one round trip per request.
+
+    The queue holds at most max_size requests: submit() waits up to
+    `timeout` for room and then raises QueueFull. A failed commit is
+    retried `retries` times with backoff, then its writes are logged and
+    dropped. flush() waits for everything queued so far; close() also
+    stops the worker and runs at interpreter exit.
+    """
+
+    def __init__(self, db, name, max_size=WRITE_BEHIND_MAX_QUEUE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 linger=WRITE_BEHIND_LINGER_SECONDS, timeout=WRITE_BEHIND_SUBMIT_TIMEOUT_SECONDS,
+                 retries=WRITE_BEHIND_RETRIES, backoff=0.1):
+        self._db = db
+        self.name = name
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.linger = linger
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; neither may the queue's locks
+                self._queue = queue.Queue(maxsize=self.max_size)
+                self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, writes):
+        """Queue writes to be committed together; raises QueueFull when there is no room."""
+        if self._closed:
+            raise QueueFull(f"write-behind queue '{self.name}' is shut down")
+        self._ensure_worker()
+        try:
+            self._queue.put(list(writes), timeout=self.timeout)
+        except queue.Full:
+            write_behind_rejected.inc((self.name,))
+            raise QueueFull(f"write-behind queue '{self.name}' is full") from None
+        write_behind_queue_depth.set(self._queue.qsize(), (self.name,))
+
+    def _run(self):
+        carry = None
+        while True:
+            entry = carry if carry is not None else self._queue.get()
+            carry = None
+            if entry is _STOP:
+                self._queue.task_done()
+                return
+
+            entries = [entry]
+            size = len(entry)
+            deadline = time.monotonic() + self.linger
+            while size < self.batch_size:
+                try:
+                    entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if entry is _STOP or size + len(entry) > self.batch_size:
+                    carry = entry
+                    break
+                entries.append(entry)
+                size += len(entry)
+
+            self._commit(entries, size)
+            for _ in entries:
+                self._queue.task_done()
+            write_behind_queue_depth.set(self._queue.qsize(), (self.name,))
+
+    def _commit(self, entries, size):
+        for attempt in range(self.retries + 1):
+            batch = self._db.batch()
+            for writes in entries:
+                for ref, data, merge in writes:
+                    batch.set(ref, data, merge=merge)
+            try:
+                batch.commit()
+            except Exception:
+                logger.warning("write-behind '%s' commit of %d writes failed (attempt %d)",
+                               self.name, size, attempt + 1, exc_info=True)
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            write_behind_batch_writes.observe((self.name,), size)
+            return
+
+        write_behind_dropped.inc((self.name,), size)
+        logger.error("write-behind '%s' dropped %d writes: %s", self.name, size,
+                     ", ".join(ref.path for writes in entries for ref, _, _ in writes))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed (or dropped); False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Stop accepting writes, commit what is queued and stop the worker."""
+        self._closed = True
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+
+# Orders from /api/orders/place when write-behind is enabled
+order_writes = WriteBehindQueue(db, "orders")
+atexit.register(order_writes.close)
@@ -15,6 +15,12 @@ export const getSuppliers = async () => {
   return handleResponse(res).then(data => data.suppliers);
 };
 
+// Suppliers, one page at a time (pass back next_cursor to get the next page)
+export const getSuppliersPage = async (cursor = "", limit = 20) => {
+  const res = await fetch(`${API_BASE_URL}/suppliers/all?cursor=${encodeURIComponent(cursor)}&limit=${limit}`);
+  return handleResponse(res);
+};
+
 // Orders
 export const getOrders = async (vendorId = "vendor1") => {
   const res = await fetch(`${API_BASE_URL}/orders/history?vendor_id=${vendorId}`);